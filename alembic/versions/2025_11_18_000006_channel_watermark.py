@@ -0,0 +1,31 @@
+"""recompute channels.last_message_id as ingest watermark
+
+Revision ID: watermark_0006
+Revises: projects_0005
+Create Date: 2025-11-18
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "watermark_0006"
+down_revision = "projects_0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # last_message_id used to hold Telegram's max_read_msg_id; it is now the highest
+    # msg_id actually stored, which incremental ingest uses as min_id
+    op.execute(
+        """
+        UPDATE channels c
+        SET last_message_id = (SELECT max(m.msg_id) FROM messages_raw m WHERE m.channel_id = c.id)
+        """
+    )
+
+
+def downgrade() -> None:
+    # the previous value (max_read_msg_id) cannot be reconstructed offline
+    pass
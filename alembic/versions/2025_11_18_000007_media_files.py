@@ -0,0 +1,56 @@
+"""add media_files manifest
+
+Revision ID: media_files_0007
+Revises: watermark_0006
+Create Date: 2025-11-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "media_files_0007"
+down_revision = "watermark_0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "media_files",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "channel_id",
+            sa.Integer(),
+            sa.ForeignKey("channels.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("msg_id", sa.BigInteger(), nullable=False),
+        sa.Column("path", sa.Text(), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("mime", sa.String(length=128), nullable=True),
+        sa.Column("size", sa.BigInteger(), nullable=True),
+        sa.Column("checksum", sa.String(length=64), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.UniqueConstraint("channel_id", "msg_id", "path", name="uq_media_files_channel_msg_path"),
+    )
+    op.create_index(
+        "ix_media_files_channel_msg", "media_files", ["channel_id", "msg_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_media_files_channel_msg", table_name="media_files")
+    op.drop_table("media_files")
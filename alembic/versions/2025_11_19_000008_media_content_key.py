@@ -0,0 +1,26 @@
+"""add media_files.content_key for content-addressed media
+
+Revision ID: media_content_key_0008
+Revises: media_files_0007
+Create Date: 2025-11-19
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "media_content_key_0008"
+down_revision = "media_files_0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("media_files", sa.Column("content_key", sa.String(length=64), nullable=True))
+    op.create_index("ix_media_files_content_key", "media_files", ["content_key"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_media_files_content_key", table_name="media_files")
+    op.drop_column("media_files", "content_key")
@@ -0,0 +1,50 @@
+"""add ingest_jobs for background ingest
+
+Revision ID: ingest_jobs_0009
+Revises: media_content_key_0008
+Create Date: 2025-11-20
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "ingest_jobs_0009"
+down_revision = "media_content_key_0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ingest_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="queued"),
+        sa.Column("channels", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("params", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("progress", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("result", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("started_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_ingest_jobs_status", "ingest_jobs", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ingest_jobs_status", table_name="ingest_jobs")
+    op.drop_table("ingest_jobs")
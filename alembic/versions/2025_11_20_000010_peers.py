@@ -0,0 +1,49 @@
+"""add peers cache (tg_id, access_hash, username) for entity resolution
+
+Revision ID: peers_0010
+Revises: ingest_jobs_0009
+Create Date: 2025-11-20
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "peers_0010"
+down_revision = "ingest_jobs_0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "peers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("peer_type", sa.String(length=16), nullable=False),
+        sa.Column("tg_id", sa.BigInteger(), nullable=False),
+        sa.Column("access_hash", sa.BigInteger(), nullable=True),
+        sa.Column("username", sa.String(length=255), nullable=True),
+        sa.Column("title", sa.Text(), nullable=True),
+        sa.Column("is_broadcast", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("resolved_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.UniqueConstraint("peer_type", "tg_id", name="uq_peers_type_tg_id"),
+    )
+    op.create_index("ix_peers_username", "peers", ["username"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_peers_username", table_name="peers")
+    op.drop_table("peers")
@@ -0,0 +1,34 @@
+"""add scheduler state columns to channels
+
+Revision ID: channel_schedule_0011
+Revises: peers_0010
+Create Date: 2025-11-21
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "channel_schedule_0011"
+down_revision = "peers_0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("channels", sa.Column("next_poll_at", sa.TIMESTAMP(timezone=True), nullable=True))
+    op.add_column(
+        "channels", sa.Column("last_polled_at", sa.TIMESTAMP(timezone=True), nullable=True)
+    )
+    op.add_column("channels", sa.Column("post_rate", sa.Float(), nullable=True))
+    op.add_column("channels", sa.Column("ingest_rate", sa.Float(), nullable=True))
+    op.create_index("ix_channels_next_poll_at", "channels", ["next_poll_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_channels_next_poll_at", table_name="channels")
+    op.drop_column("channels", "ingest_rate")
+    op.drop_column("channels", "post_rate")
+    op.drop_column("channels", "last_polled_at")
+    op.drop_column("channels", "next_poll_at")
@@ -0,0 +1,49 @@
+"""add ingest_checkpoints for resumable history walks and backfills
+
+Revision ID: ingest_checkpoints_0012
+Revises: channel_schedule_0011
+Create Date: 2025-11-21
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "ingest_checkpoints_0012"
+down_revision = "channel_schedule_0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ingest_checkpoints",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "channel_id",
+            sa.Integer(),
+            sa.ForeignKey("channels.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("scope", sa.String(length=128), nullable=False),
+        sa.Column("offset_id", sa.BigInteger(), nullable=False),
+        sa.Column("scanned", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.UniqueConstraint("channel_id", "scope", name="uq_ingest_checkpoints_channel_scope"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ingest_checkpoints")
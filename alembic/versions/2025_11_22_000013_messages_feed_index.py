@@ -0,0 +1,45 @@
+"""add (date, id) indexes on messages_raw for keyset feed pagination
+
+Revision ID: messages_feed_index_0013
+Revises: ingest_checkpoints_0012
+Create Date: 2025-11-22
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "messages_feed_index_0013"
+down_revision = "ingest_checkpoints_0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # built concurrently: messages_raw is large and written by ingest while migrating
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_messages_raw_channel_date_id",
+            "messages_raw",
+            ["channel_id", sa.text("date DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_messages_raw_date_id",
+            "messages_raw",
+            [sa.text("date DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_messages_raw_date_id", table_name="messages_raw", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_messages_raw_channel_date_id",
+            table_name="messages_raw",
+            postgresql_concurrently=True,
+        )
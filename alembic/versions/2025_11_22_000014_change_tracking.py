@@ -0,0 +1,111 @@
+"""track changed/deleted posts and AI comments for the miniapp delta sync
+
+Revision ID: change_tracking_0014
+Revises: messages_feed_index_0013
+Create Date: 2025-11-22
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "change_tracking_0014"
+down_revision = "messages_feed_index_0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing rows get 0: older than any sync token
+    op.add_column(
+        "messages_raw",
+        sa.Column("change_txid", sa.BigInteger(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "ai_comments", sa.Column("change_txid", sa.BigInteger(), server_default="0", nullable=False)
+    )
+    op.create_table(
+        "change_tombstones",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("message_id", sa.BigInteger(), nullable=False),
+        sa.Column("model", sa.String(length=64), nullable=True),
+        sa.Column("change_txid", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_change_tombstones_change_txid", "change_tombstones", ["change_txid"])
+    op.execute(
+        """
+        CREATE FUNCTION stamp_change_txid() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_txid := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION record_change_tombstone() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'ai_comments' THEN
+                INSERT INTO change_tombstones (kind, message_id, model, change_txid)
+                VALUES (
+                    'ai_comment', OLD.message_id, OLD.model, pg_current_xact_id()::text::bigint
+                );
+            ELSE
+                INSERT INTO change_tombstones (kind, message_id, change_txid)
+                VALUES ('message', OLD.id, pg_current_xact_id()::text::bigint);
+            END IF;
+            RETURN OLD;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in ("messages_raw", "ai_comments"):
+        op.execute(
+            f"CREATE TRIGGER trg_{table}_change_txid BEFORE INSERT OR UPDATE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION stamp_change_txid()"
+        )
+        op.execute(
+            f"CREATE TRIGGER trg_{table}_tombstone AFTER DELETE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION record_change_tombstone()"
+        )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_messages_raw_change_txid",
+            "messages_raw",
+            ["change_txid"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_ai_comments_change_txid",
+            "ai_comments",
+            ["change_txid"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_ai_comments_change_txid", table_name="ai_comments", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_messages_raw_change_txid", table_name="messages_raw", postgresql_concurrently=True
+        )
+    for table in ("messages_raw", "ai_comments"):
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_tombstone ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_change_txid ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS record_change_tombstone()")
+    op.execute("DROP FUNCTION IF EXISTS stamp_change_txid()")
+    op.drop_index("ix_change_tombstones_change_txid", table_name="change_tombstones")
+    op.drop_table("change_tombstones")
+    op.drop_column("ai_comments", "change_txid")
+    op.drop_column("messages_raw", "change_txid")
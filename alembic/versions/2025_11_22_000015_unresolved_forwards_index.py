@@ -0,0 +1,45 @@
+"""add a partial index on messages_raw for forwards with an unresolved source
+
+Revision ID: unresolved_forwards_index_0015
+Revises: change_tracking_0014
+Create Date: 2025-11-22
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "unresolved_forwards_index_0015"
+down_revision = "change_tracking_0014"
+branch_labels = None
+depends_on = None
+
+# must stay identical to tg_events.models.models.UNRESOLVED_FORWARD
+_UNRESOLVED_FORWARD = (
+    "(features -> 'forward' ->> 'from_peer_id') IS NOT NULL"
+    " AND (features -> 'forward' ->> 'from_type') IN ('channel', 'user')"
+    " AND (features -> 'forward' ->> 'from_title') IS NULL"
+    " AND (features -> 'forward' ->> 'resolve_attempted') IS NULL"
+)
+
+
+def upgrade() -> None:
+    # built concurrently: messages_raw is large and written by ingest while migrating
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_messages_raw_unresolved_forwards",
+            "messages_raw",
+            ["channel_id", "id"],
+            postgresql_where=sa.text(_UNRESOLVED_FORWARD),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_messages_raw_unresolved_forwards",
+            table_name="messages_raw",
+            postgresql_concurrently=True,
+        )
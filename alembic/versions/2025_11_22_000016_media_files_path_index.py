@@ -0,0 +1,28 @@
+"""index media_files.path for the reference check before deleting files
+
+Revision ID: media_files_path_index_0016
+Revises: unresolved_forwards_index_0015
+Create Date: 2025-11-22
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "media_files_path_index_0016"
+down_revision = "unresolved_forwards_index_0015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # built concurrently: media_files grows with every download and ingest keeps writing
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_media_files_path", "media_files", ["path"], postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_media_files_path", table_name="media_files", postgresql_concurrently=True)
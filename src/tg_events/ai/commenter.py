@@ -1,18 +1,20 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Optional
+import time
+from typing import Any, AsyncIterator, Optional
 
 import logging
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from tg_events.ai.limiter import call_limited, estimate_tokens, get_limiter
 from tg_events.config import get_settings
+from tg_events.db import SessionLocal
 from tg_events.models import AiComment, MessageRaw
 
 
-_sem = asyncio.Semaphore(get_settings().ai_max_concurrency)
 logger = logging.getLogger("tg_events.ai.commenter")
 
 def _preview(text: str, limit: int = 400) -> str:
@@ -71,7 +73,39 @@ def _build_client() -> OpenAI:
     s = get_settings()
     if not s.openai_api_key:
         raise RuntimeError("OPENAI_API_KEY is not configured")
-    return OpenAI(api_key=s.openai_api_key)
+    # retries and backoff happen in call_limited, against the shared quota
+    return OpenAI(api_key=s.openai_api_key, base_url=s.openai_base_url, max_retries=0)
+
+
+def _build_async_client() -> AsyncOpenAI:
+    s = get_settings()
+    if not s.openai_api_key:
+        raise RuntimeError("OPENAI_API_KEY is not configured")
+    # retries and backoff happen in call_limited, against the shared quota
+    return AsyncOpenAI(api_key=s.openai_api_key, base_url=s.openai_base_url, max_retries=0)
+
+
+def _responses_params(prompt: str, model: str) -> dict:
+    # Use legacy-compatible shape for installed SDK (no 'messages' arg), plus explicit text format
+    return {
+        "model": model,
+        "input": prompt,
+        "instructions": "Summarize and briefly comment in 1-2 sentences. No emojis, no hashtags.",
+        "max_output_tokens": 400,
+        "reasoning": {"effort": "low"},
+    }
+
+
+def _chat_params(prompt: str, model: str) -> dict:
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You summarize and comment briefly."},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.2,
+        "max_tokens": 400,
+    }
 
 def _extract_responses_output_text(resp: object) -> str:
     # Preferred property
@@ -118,7 +152,14 @@ def _extract_responses_output_text(resp: object) -> str:
         pass
     return ""
 
-def generate_comment_sync(text: str, *, model: Optional[str] = None, max_chars: int = 800) -> str:
+def generate_comment_sync(
+    text: str,
+    *,
+    model: Optional[str] = None,
+    max_chars: int = 800,
+    usage: Optional[dict[str, int]] = None,
+) -> str:
+    """Comment on ``text``; token counts of the call are added to ``usage`` when given."""
     s = get_settings()
     client = _build_client()
     template = get_prompt_template()
@@ -137,14 +178,7 @@ def generate_comment_sync(text: str, *, model: Optional[str] = None, max_chars:
     )
     # Use Responses API for GPT‑5 family per latest docs; keep Chat Completions for older models
     if is_gpt5:
-        # Use legacy-compatible shape for installed SDK (no 'messages' arg), plus explicit text format
-        resp = client.responses.create(
-            model=m,
-            input=prompt,
-            instructions="Summarize and briefly comment in 1-2 sentences. No emojis, no hashtags.",
-            max_output_tokens=400,
-            reasoning={"effort": "low"},
-        )
+        resp = client.responses.create(**_responses_params(prompt, m))
         # diagnostics about shape for debugging empties
         try:
             has_out_text = bool(getattr(resp, "output_text", None))
@@ -163,6 +197,8 @@ def generate_comment_sync(text: str, *, model: Optional[str] = None, max_chars:
         except Exception:
             logger.warning("responses.shape:inspect_failed")
         out_text = _extract_responses_output_text(resp)
+        if usage is not None:
+            usage.update(_usage_tokens(resp))
         logger.warning(
             "responses.output len=%s preview=%s usage=%s",
             len(out_text or ""),
@@ -170,19 +206,12 @@ def generate_comment_sync(text: str, *, model: Optional[str] = None, max_chars:
             _usage_tokens(resp),
         )
     else:
-        params = {
-            "model": m,
-            "messages": [
-                {"role": "system", "content": "You summarize and comment briefly."},
-                {"role": "user", "content": prompt},
-            ],
-            "temperature": 0.2,
-            "max_tokens": 400,
-        }
-        resp = client.chat.completions.create(**params)
+        resp = client.chat.completions.create(**_chat_params(prompt, m))
         choice0 = resp.choices[0] if getattr(resp, "choices", None) else None
         finish = getattr(choice0, "finish_reason", None)
         out_text = (choice0.message.content or "") if choice0 else ""
+        if usage is not None:
+            usage.update(_usage_tokens(resp))
         logger.warning(
             "chat.output finish=%s len=%s preview=%s usage=%s",
             str(finish),
@@ -206,16 +235,123 @@ def generate_comment_sync(text: str, *, model: Optional[str] = None, max_chars:
     return _truncate_text(out, limit)
 
 
-async def comment_message(session: AsyncSession, message_id: int, *, model: Optional[str] = None) -> AiComment:
+async def generate_comment(
+    text: str,
+    *,
+    model: Optional[str] = None,
+    usage: Optional[dict[str, int]] = None,
+) -> str:
+    """:func:`generate_comment_sync` in a worker thread, within the shared OpenAI quota."""
+    loop = asyncio.get_running_loop()
+    prompt = get_prompt_template().replace("{post}", text)
+    return await call_limited(
+        prompt,
+        lambda u: loop.run_in_executor(
+            None, lambda: generate_comment_sync(text, model=model, usage=u)
+        ),
+        usage=usage,
+    )
+
+
+async def stream_comment(
+    text: str,
+    *,
+    model: Optional[str] = None,
+    usage: Optional[dict[str, int]] = None,
+) -> AsyncIterator[str]:
+    """Like :func:`generate_comment_sync`, but yields text deltas as the model produces them.
+
+    The caller joins the deltas and applies ``ai_comment_max_chars``; token counts of the
+    call are added to ``usage`` once the stream completes.
+    """
+    s = get_settings()
+    client = _build_async_client()
+    prompt = get_prompt_template().replace("{post}", text)
+    m = model or s.ai_model
+    started = time.monotonic()
+    chars = 0
+    gpt5 = str(m).startswith("gpt-5")
+
+    async def _open(_usage: dict[str, int]) -> Any:
+        # 429s and 5xx before the first event back off and retry like non-streamed calls
+        if gpt5:
+            return await client.responses.create(**_responses_params(prompt, m), stream=True)
+        return await client.chat.completions.create(
+            **_chat_params(prompt, m), stream=True, stream_options={"include_usage": True}
+        )
+
+    limiter = get_limiter()
+    reserved = estimate_tokens(prompt)
+    used: dict[str, int] = {}
+    opened = False
+    logger.warning("stream_comment:start", extra={"model": m, "input_chars": len(prompt)})
+    try:
+        stream = await call_limited(prompt, _open, finish=False)
+        opened = True
+        if gpt5:
+            async for event in stream:
+                etype = getattr(event, "type", "")
+                if etype == "response.output_text.delta":
+                    delta = getattr(event, "delta", "") or ""
+                    if delta:
+                        chars += len(delta)
+                        yield delta
+                elif etype == "response.completed":
+                    used.update(_usage_tokens(getattr(event, "response", None)))
+        else:
+            async for chunk in stream:
+                # the final chunk carries usage and no choices
+                if getattr(chunk, "usage", None) is not None:
+                    used.update(_usage_tokens(chunk))
+                for choice in getattr(chunk, "choices", None) or []:
+                    delta = getattr(choice.delta, "content", None) or ""
+                    if delta:
+                        chars += len(delta)
+                        yield delta
+        limiter.success()
+    finally:
+        await client.close()
+        if opened:
+            # failed attempts were settled by call_limited
+            limiter.settle(reserved, used.get("total_tokens", reserved))
+        if usage is not None:
+            usage.update(used)
+        logger.warning(
+            "stream_comment:done",
+            extra={
+                "model": m,
+                "output_chars": chars,
+                "seconds": round(time.monotonic() - started, 2),
+                "usage": used,
+            },
+        )
+
+
+async def _existing_comment(
+    session: AsyncSession, message_id: int, model: str
+) -> Optional[AiComment]:
+    res = await session.execute(
+        select(AiComment).where(AiComment.message_id == message_id, AiComment.model == model)
+    )
+    return res.scalar_one_or_none()
+
+
+async def comment_message(
+    message_id: int,
+    *,
+    model: Optional[str] = None,
+    usage: Optional[dict[str, int]] = None,
+) -> AiComment:
+    """Generate and store the comment of one message (or return the stored one).
+
+    No DB connection is held during the OpenAI call: the message is read in one session
+    and the comment written in another.
+    """
     s = get_settings()
     mdl = model or s.ai_model
     logger.warning("comment_message:start", extra={"message_id": message_id, "model": mdl})
-    async with _sem:
-        # Check existing
-        existing = await session.execute(
-            select(AiComment).where(AiComment.message_id == message_id, AiComment.model == mdl)
-        )
-        found = existing.scalar_one_or_none()
+    async with SessionLocal() as session:
+        found = await _existing_comment(session, message_id, mdl)
         if found:
             logger.warning("comment_message:exists", extra={"message_id": message_id, "model": mdl})
             return found
@@ -225,25 +361,30 @@ async def comment_message(session: AsyncSession, message_id: int, *, model: Opti
         if not msg:
             raise ValueError(f"MessageRaw {message_id} not found")
         text = (msg.text or "").strip()
-        if not text:
-            text = "(no text)"
-        logger.warning(
-            "comment_message:invoke",
-            extra={"message_id": message_id, "model": mdl, "text_chars": len(text)},
-        )
+    if not text:
+        text = "(no text)"
+    logger.warning(
+        "comment_message:invoke",
+        extra={"message_id": message_id, "model": mdl, "text_chars": len(text)},
+    )
 
-        comment = await asyncio.get_event_loop().run_in_executor(
-            None, lambda: generate_comment_sync(_truncate_text(text, s.ai_comment_max_chars), model=mdl)
-        )
+    comment = await generate_comment(
+        _truncate_text(text, s.ai_comment_max_chars), model=mdl, usage=usage
+    )
 
+    async with SessionLocal() as session:
+        # another run may have stored it while the model was answering
+        found = await _existing_comment(session, message_id, mdl)
+        if found:
+            return found
         rec = AiComment(message_id=message_id, model=mdl, comment_text=comment)
         session.add(rec)
         await session.commit()
         await session.refresh(rec)
-        logger.warning(
-            "comment_message:stored",
-            extra={"message_id": message_id, "model": mdl, "comment_chars": len(comment or "")},
-        )
-        return rec
+    logger.warning(
+        "comment_message:stored",
+        extra={"message_id": message_id, "model": mdl, "comment_chars": len(comment or "")},
+    )
+    return rec
 
 
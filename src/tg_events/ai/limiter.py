@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import openai
+
+from tg_events.config import get_settings
+from tg_events.ratelimit import TokenBucket
+
+
+logger = logging.getLogger("tg_events.ai.limiter")
+
+T = TypeVar("T")
+
+# seconds of quota a burst may use at once (the API enforces per-minute windows)
+_BURST_S = 10.0
+# completion budget per request (max_output_tokens/max_tokens in the commenter)
+_OUTPUT_TOKENS = 400
+# on every 429 the effective rates drop by this factor, then recover per success
+_DECREASE = 0.7
+_RECOVER = 1.05
+_MIN_SHARE = 0.1
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Upper estimate for one call: ~3 chars per input token plus the output budget."""
+    return len(prompt) // 3 + _OUTPUT_TOKENS
+
+
+def _retry_after(e: openai.APIStatusError) -> Optional[float]:
+    headers = getattr(e.response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class OpenAILimiter:
+    """Process-wide OpenAI budget: requests/min and tokens/min token buckets.
+
+    Calls reserve their estimated tokens up front and settle the difference with the
+    reported usage. A 429 pauses every caller (``Retry-After`` or exponential backoff)
+    and lowers both rates; successes bring them back to the configured quota.
+    """
+
+    def __init__(self, rpm: float, tpm: float) -> None:
+        self.rpm_rate = rpm / 60.0
+        self.tpm_rate = tpm / 60.0
+        self.requests = TokenBucket(self.rpm_rate, max(1.0, self.rpm_rate * _BURST_S))
+        self.tokens = TokenBucket(
+            self.tpm_rate, max(float(_OUTPUT_TOKENS), self.tpm_rate * _BURST_S)
+        )
+        self.rate_limited = 0
+        self.retries = 0
+        self.tokens_used = 0
+        self._streak = 0
+        self.last_backoff: Optional[dict[str, Any]] = None
+
+    async def reserve(self, tokens: int) -> float:
+        waited = await self.requests.acquire()
+        return waited + await self.tokens.acquire(tokens)
+
+    def settle(self, reserved: int, used: Optional[int]) -> None:
+        if used is None:
+            return
+        self.tokens_used += used
+        if used < reserved:
+            self.tokens.refund(reserved - used)
+        else:
+            self.tokens.debit(used - reserved)
+
+    def success(self) -> None:
+        self._streak = 0
+        for bucket, base in ((self.requests, self.rpm_rate), (self.tokens, self.tpm_rate)):
+            if bucket.rate > 0:
+                bucket.rate = min(base, bucket.rate * _RECOVER)
+
+    def backoff(self, retry_after: Optional[float], *, throttled: bool) -> float:
+        """Pause all callers; returns the delay. ``throttled`` (a 429) also lowers the rates."""
+        s = get_settings()
+        self._streak += 1
+        delay = retry_after
+        if delay is None:
+            delay = min(s.ai_backoff_max_s, 2.0 ** self._streak) * random.uniform(0.8, 1.2)
+        delay = min(float(delay), s.ai_backoff_max_s)
+        if throttled:
+            self.rate_limited += 1
+            for bucket, base in ((self.requests, self.rpm_rate), (self.tokens, self.tpm_rate)):
+                if bucket.rate > 0:
+                    bucket.rate = max(base * _MIN_SHARE, bucket.rate * _DECREASE)
+        self.requests.pause(delay)
+        self.tokens.pause(delay)
+        self.last_backoff = {"seconds": round(delay, 2), "throttled": throttled, "at": time.time()}
+        logger.warning("ai.limiter:backoff", extra=self.last_backoff)
+        return delay
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "tokens_used": self.tokens_used,
+            "last_backoff": self.last_backoff,
+            "requests": self.requests.snapshot(),
+            "tokens": self.tokens.snapshot(),
+        }
+
+
+_limiter: Optional[OpenAILimiter] = None
+
+
+def get_limiter() -> OpenAILimiter:
+    global _limiter
+    if _limiter is None:
+        s = get_settings()
+        _limiter = OpenAILimiter(s.ai_rpm, s.ai_tpm)
+    return _limiter
+
+
+def _used_tokens(usage: dict[str, int]) -> Optional[int]:
+    if "total_tokens" in usage:
+        return usage["total_tokens"]
+    parts = [usage.get(k) for k in ("input_tokens", "output_tokens", "prompt_tokens")]
+    parts.append(usage.get("completion_tokens"))
+    known = [p for p in parts if isinstance(p, int)]
+    return sum(known) if known else None
+
+
+async def call_limited(
+    prompt: str,
+    call: Callable[[dict[str, int]], Awaitable[T]],
+    *,
+    usage: Optional[dict[str, int]] = None,
+    finish: bool = True,
+) -> T:
+    """Run ``call(usage)`` inside the shared quota, retrying 429s, 5xx and timeouts.
+
+    ``call`` fills the usage dict it is given; the final attempt's counts are copied
+    into ``usage``. Out-of-quota (``insufficient_quota``) and other errors are raised.
+    With ``finish=False`` (streams, whose usage is known only at the end) a successful
+    call is not settled: the caller settles ``estimate_tokens(prompt)`` and reports
+    ``success()`` itself.
+    """
+    limiter = get_limiter()
+    retries = max(0, int(get_settings().ai_max_retries))
+    reserved = estimate_tokens(prompt)
+    for attempt in range(retries + 1):
+        await limiter.reserve(reserved)
+        attempt_usage: dict[str, int] = {}
+        try:
+            result = await call(attempt_usage)
+        except openai.RateLimitError as e:
+            limiter.settle(reserved, 0)
+            if getattr(e, "code", None) == "insufficient_quota" or attempt == retries:
+                raise
+            limiter.retries += 1
+            limiter.backoff(_retry_after(e), throttled=True)
+            continue
+        except (openai.InternalServerError, openai.APITimeoutError, openai.APIConnectionError) as e:
+            limiter.settle(reserved, 0)
+            if attempt == retries:
+                raise
+            limiter.retries += 1
+            retry_after = _retry_after(e) if isinstance(e, openai.APIStatusError) else None
+            limiter.backoff(retry_after, throttled=False)
+            continue
+        if finish:
+            limiter.settle(reserved, _used_tokens(attempt_usage) or reserved)
+            limiter.success()
+        if usage is not None:
+            usage.update(attempt_usage)
+        return result
+    raise AssertionError("unreachable")
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterable, Optional
+
+
+# In-process registry of comment generation runs. Each run keeps its event history so a
+# subscriber that connects late (or reconnects with Last-Event-ID) replays what it missed.
+
+# finished runs kept for late subscribers
+_KEEP_JOBS = 20
+# per-item states that end an item
+TERMINAL = frozenset({"stored", "failed", "skipped", "cancelled"})
+
+_ids = itertools.count(1)
+_jobs: "OrderedDict[int, GenerationJob]" = OrderedDict()
+
+
+class GenerationJob:
+    """Per-item events of one generation run: queued, started, stored/failed/skipped/cancelled.
+
+    Every event carries a sequence number ``seq``; the run ends with one ``done`` event.
+    """
+
+    def __init__(self, job_id: int, message_ids: Iterable[int], *, model: Optional[str]) -> None:
+        self.id = job_id
+        self.model = model
+        self.items: dict[int, str] = {}
+        self.events: list[dict[str, Any]] = []
+        self.finished = False
+        self._started: dict[int, float] = {}
+        self._changed = asyncio.Condition()
+        for mid in message_ids:
+            self.items[mid] = "queued"
+            self._append({"event": "queued", "message_id": mid})
+
+    def _append(self, event: dict[str, Any]) -> None:
+        self.events.append({"seq": len(self.events) + 1, "ts": time.time(), **event})
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _publish(self, event: dict[str, Any]) -> None:
+        self._append(event)
+        asyncio.get_running_loop().create_task(self._notify())
+
+    def started(self, message_id: int) -> None:
+        self.items[message_id] = "started"
+        self._started[message_id] = time.monotonic()
+        self._publish({"event": "started", "message_id": message_id})
+
+    def _latency_ms(self, message_id: int) -> Optional[int]:
+        t0 = self._started.pop(message_id, None)
+        return None if t0 is None else int((time.monotonic() - t0) * 1000)
+
+    def stored(
+        self,
+        message_id: int,
+        *,
+        model: str,
+        comment: str,
+        usage: Optional[dict[str, int]] = None,
+    ) -> None:
+        self.items[message_id] = "stored"
+        self._publish(
+            {
+                "event": "stored",
+                "message_id": message_id,
+                "model": model,
+                "comment": comment,
+                "latency_ms": self._latency_ms(message_id),
+                "usage": usage or {},
+            }
+        )
+
+    def failed(self, message_id: int, error: str) -> None:
+        self.items[message_id] = "failed"
+        self._publish(
+            {
+                "event": "failed",
+                "message_id": message_id,
+                "error": error,
+                "latency_ms": self._latency_ms(message_id),
+            }
+        )
+
+    def skipped(self, message_id: int, reason: str) -> None:
+        self.items[message_id] = "skipped"
+        self._publish({"event": "skipped", "message_id": message_id, "reason": reason})
+
+    def finish(self) -> None:
+        """Cancel whatever did not end and close the run (idempotent)."""
+        if self.finished:
+            return
+        for mid, state in self.items.items():
+            if state not in TERMINAL:
+                self.items[mid] = "cancelled"
+                self._started.pop(mid, None)
+                self._append({"event": "cancelled", "message_id": mid})
+        counts: dict[str, int] = {}
+        for state in self.items.values():
+            counts[state] = counts.get(state, 0) + 1
+        self.finished = True
+        self._publish({"event": "done", "counts": counts})
+
+    def attach(self, task: asyncio.Task) -> None:
+        """Finish the run when ``task`` ends, including when it is cancelled before starting."""
+        task.add_done_callback(lambda _t: self.finish())
+
+    async def follow(self, *, after: int = 0, heartbeat_s: float = 15.0) -> AsyncIterator[dict]:
+        """Events with ``seq > after``, then live ones until ``done``.
+
+        Yields ``{}`` when nothing happened for ``heartbeat_s`` (keep-alive for proxies).
+        """
+        pos = max(0, after)
+        while True:
+            while pos < len(self.events):
+                pos += 1
+                yield self.events[pos - 1]
+            if self.finished:
+                return
+            idle = False
+            async with self._changed:
+                try:
+                    await asyncio.wait_for(
+                        self._changed.wait_for(lambda: pos < len(self.events)), heartbeat_s
+                    )
+                except asyncio.TimeoutError:
+                    idle = True
+            if idle:
+                yield {}
+
+
+def create_job(message_ids: Iterable[int], *, model: Optional[str] = None) -> GenerationJob:
+    job = GenerationJob(next(_ids), list(dict.fromkeys(message_ids)), model=model)
+    _jobs[job.id] = job
+    while len(_jobs) > _KEEP_JOBS:
+        _jobs.popitem(last=False)
+    return job
+
+
+def get_job(job_id: int) -> Optional[GenerationJob]:
+    return _jobs.get(job_id)
@@ -1,68 +1,220 @@
 import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
 from pathlib import Path
 import logging
-from typing import List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
 
-from fastapi import BackgroundTasks, Depends, FastAPI
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.staticfiles import StaticFiles
 
-from tg_events.db import SessionLocal, get_session
+from tg_events.db import SessionLocal, engine, get_session, pool_stats
 from tg_events.config import get_settings
-from tg_events.ingest.service import ingest_channels
-from tg_events.repositories.miniapp_queries import list_recent_messages, list_forward_usernames
-from tg_events.ingest.telethon_client import build_client, open_client
+from tg_events.ingest.jobs import job_view, notify_worker, worker_loop
+from tg_events.ingest.media import pipeline_stats
+from tg_events.ingest.peers import remember_entities
+from tg_events.ingest.scheduler import IngestScheduler, schedule_view
+from tg_events.media_store import unlink_media
+from tg_events.repositories.changes import list_tombstones, prune_tombstones, sync_token
+from tg_events.repositories.ingest_jobs import create_job, get_job, list_jobs
+from tg_events.repositories.messages import delete_messages
+from tg_events.repositories.miniapp_queries import (
+    decode_cursor,
+    encode_cursor,
+    list_forward_usernames,
+    list_recent_messages,
+)
+from tg_events.ingest.telethon_client import build_client, get_pool, open_client
 from telethon.utils import get_display_name
 from telethon.tl.types import Channel as TlChannel, User as TlUser
-from tg_events.ai.commenter import comment_message, get_prompt_template, set_prompt_template
+from tg_events.ai.commenter import (
+    comment_message,
+    generate_comment,
+    get_prompt_template,
+    set_prompt_template,
+    stream_comment,
+)
+from tg_events.ai.limiter import get_limiter as get_ai_limiter
+from tg_events.ai.progress import create_job as create_generation_job
+from tg_events.ai.progress import get_job as get_generation_job
 from sqlalchemy import delete, select, and_, or_
-from tg_events.models import AiComment, Channel, MessageRaw, Event, Topic, TopicItem, Project, ProjectIdea
+from tg_events.models import AiComment, Channel, MessageRaw, Topic, TopicItem, Project, ProjectIdea
 
 
 settings = get_settings()
-app = FastAPI(title=settings.app_name)
 logger = logging.getLogger("tg_events.api")
 cancel_generation: bool = False
 current_generation_task: asyncio.Task | None = None
 
 
+async def _prune_tombstones_loop() -> None:
+    while True:
+        try:
+            async with SessionLocal() as ses:
+                await prune_tombstones(
+                    ses, older_than_s=float(settings.change_tombstone_retention_s)
+                )
+                await ses.commit()
+        except Exception as e:
+            logger.warning("api:prune_tombstones_failed", extra={"error": str(e)})
+        await asyncio.sleep(3600)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Connect the Telegram client pool once and keep it (and the DB pool) for the app lifetime."""
+    pool = get_pool()
+    if settings.telegram_api_id is not None and settings.telegram_api_hash is not None:
+        try:
+            await pool.start()
+        except Exception as e:
+            # the API stays usable without Telegram; leases retry the connection
+            logger.warning("api.lifespan:telegram_start_failed", extra={"error": str(e)})
+    tasks: list[asyncio.Task] = [asyncio.create_task(_prune_tombstones_loop())]
+    if settings.ingest_worker_enabled:
+        tasks.append(asyncio.create_task(worker_loop()))
+    if settings.scheduler_enabled:
+        tasks.append(asyncio.create_task(IngestScheduler().run()))
+    try:
+        yield
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await pool.close()
+        await engine.dispose()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
+
+
 @app.get("/health")
-def health() -> dict[str, str]:
-    return {"status": "ok"}
+def health() -> dict[str, Any]:
+    return {
+        "status": "ok",
+        "telegram": get_pool().stats(),
+        "db": pool_stats(),
+        "openai": get_ai_limiter().stats(),
+    }
 
 
 class IngestRequest(BaseModel):
     """Request to trigger ingestion."""
 
     channels: List[str]
-    limit: Optional[int] = 1000
+    limit: Optional[int] = 1000  # null: no cap (e.g. a whole date-range backfill)
     force_media: Optional[bool] = False
+    # re-walk the newest `limit` messages instead of fetching above the stored watermark
+    full: Optional[bool] = False
+    # backfill: walk history older than date_to down to date_from (resumable)
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+
+async def _submit_ingest(
+    session: AsyncSession,
+    channels: List[str],
+    *,
+    limit: Optional[int],
+    force_media: bool,
+    full: bool,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> dict[str, object]:
+    params: dict[str, object] = {"limit": limit, "update_existing_media": force_media, "full": full}
+    if date_from is not None or date_to is not None:
+        params["date_from"] = date_from.isoformat() if date_from else None
+        params["date_to"] = date_to.isoformat() if date_to else None
+    job = await create_job(session, channels=channels, params=params)
+    await session.commit()
+    notify_worker()
+    return {"job_id": job.id, "status": job.status}
 
 
 @app.post("/ingest")
-async def ingest(req: IngestRequest, session: AsyncSession = Depends(get_session)) -> dict[str, str]:
-    return await ingest_channels(
+async def ingest(
+    req: IngestRequest, session: AsyncSession = Depends(get_session)
+) -> dict[str, object]:
+    """Queue an ingest job; poll ``GET /ingest/jobs/{job_id}`` for progress and the result."""
+    return await _submit_ingest(
         session,
         req.channels,
-        limit=req.limit or 1000,
-        update_existing_media=bool(req.force_media),
+        limit=req.limit,
+        force_media=bool(req.force_media),
+        full=bool(req.full),
+        date_from=req.date_from,
+        date_to=req.date_to,
     )
 
 
+@app.get("/ingest/jobs")
+async def ingest_jobs(
+    session: AsyncSession = Depends(get_session), limit: int = 20
+) -> dict[str, list[dict]]:
+    return {"items": [job_view(j) for j in await list_jobs(session, limit=limit)]}
+
+
+@app.get("/ingest/jobs/{job_id}")
+async def ingest_job(job_id: int, session: AsyncSession = Depends(get_session)) -> dict:
+    job = await get_job(session, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job_view(job)
+
+
+@app.get("/ingest/schedule")
+async def ingest_schedule() -> dict:
+    """Per-channel next poll time, posting rate and achieved msgs/sec; limiter state."""
+    return await schedule_view()
+
+
+@app.get("/ingest/media/stats")
+def ingest_media_stats() -> dict[str, list[dict]]:
+    """Queue depth and throughput of running media download pipelines."""
+    return {"pipelines": pipeline_stats()}
+
+
+@app.post("/telegram/reload")
+async def telegram_reload() -> dict[str, Any]:
+    """Pick up a new Telegram session (run after tg_auth) without restarting the API."""
+    pool = get_pool()
+    try:
+        await pool.reload()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"telegram reconnect failed: {e}")
+    return pool.stats()
+
+
 class MiniappPostsResponse(BaseModel):
     items: List[dict]
+    # pass back as ?cursor= for the next (older) page; null on the last page
+    next_cursor: Optional[str] = None
+    # first page only: start /miniapp/api/changes polling from here
+    sync_token: Optional[str] = None
 
 
 @app.get("/miniapp/api/posts", response_model=MiniappPostsResponse)
 async def miniapp_posts(
     session: AsyncSession = Depends(get_session),
-    limit: int = 500,
+    limit: int = 50,
     username: Optional[str] = None,
     channel_id: Optional[int] = None,
     fwd_username: Optional[str] = None,
     model: Optional[str] = None,
+    cursor: Optional[str] = None,
 ) -> MiniappPostsResponse:
+    limit = max(1, min(limit, 500))
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # read before the posts, so nothing committed in between is missed by the next delta
+    token = await sync_token(session) if before is None else None
     items = await list_recent_messages(
         session,
         limit=limit,
@@ -70,8 +222,73 @@ async def miniapp_posts(
         channel_tg_id=channel_id,
         fwd_username=fwd_username,
         model=model,
+        before=before,
+    )
+    next_cursor = None
+    if len(items) == limit:
+        last = items[-1]
+        next_cursor = encode_cursor(datetime.fromisoformat(last["date"]), last["id"])
+    return MiniappPostsResponse(
+        items=items,
+        next_cursor=next_cursor,
+        sync_token=str(token) if token is not None else None,
+    )
+
+
+class MiniappChangesResponse(BaseModel):
+    # pass back as ?since= on the next poll
+    sync_token: str
+    # new or edited posts, or posts whose comment (for `model`) changed; newest first
+    items: List[dict] = []
+    deleted_messages: List[int] = []
+    deleted_comments: List[int] = []  # message ids whose `model` comment was deleted
+    # too many changes: reload the feed instead of applying them
+    reset: bool = False
+
+
+@app.get("/miniapp/api/changes", response_model=MiniappChangesResponse)
+async def miniapp_changes(
+    since: str,
+    session: AsyncSession = Depends(get_session),
+    username: Optional[str] = None,
+    channel_id: Optional[int] = None,
+    fwd_username: Optional[str] = None,
+    model: Optional[str] = None,
+) -> MiniappChangesResponse:
+    """Posts, comments and deletions since ``since`` (a ``sync_token``), filtered like the feed.
+
+    A change may be reported twice (transactions still running at the previous poll are
+    read again); applying it is idempotent on the client.
+    """
+    try:
+        since_txid = int(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid sync token")
+    token = await sync_token(session)
+    limit = max(1, int(settings.changes_max_posts))
+    items = await list_recent_messages(
+        session,
+        limit=limit + 1,
+        channel_username=username,
+        channel_tg_id=channel_id,
+        fwd_username=fwd_username,
+        model=model,
+        changed_since=since_txid,
+    )
+    tombstones = await list_tombstones(session, since=since_txid, limit=limit * 10 + 1)
+    if len(items) > limit or len(tombstones) > limit * 10:
+        return MiniappChangesResponse(sync_token=str(token), reset=True)
+    mdl = model or settings.ai_model
+    return MiniappChangesResponse(
+        sync_token=str(token),
+        items=items,
+        deleted_messages=sorted({t.message_id for t in tombstones if t.kind == "message"}),
+        deleted_comments=sorted(
+            {t.message_id for t in tombstones if t.kind == "ai_comment" and t.model == mdl}
+        ),
     )
-    return MiniappPostsResponse(items=items)
+
+
 class ForwardsResponse(BaseModel):
     items: List[dict]
 
@@ -128,10 +345,12 @@ class ChannelsResponse(BaseModel):
 @app.get("/miniapp/api/channels", response_model=ChannelsResponse)
 async def miniapp_channels(limit: int = 300) -> ChannelsResponse:
     items: list[ChannelItem] = []
+    entities: list = []
     async with open_client() as client:
         try:
             async for d in client.iter_dialogs(limit=limit):
                 e = d.entity
+                entities.append(e)
                 if isinstance(e, TlChannel):
                     kind = "channel" if getattr(e, "broadcast", False) else "supergroup"
                     items.append(
@@ -153,6 +372,10 @@ async def miniapp_channels(limit: int = 300) -> ChannelsResponse:
                     )
         finally:
             pass
+    # dialogs come with access hashes: cache them so ingest needs no resolution calls
+    async with SessionLocal() as ses:
+        await remember_entities(ses, entities)
+        await ses.commit()
     # sort by name
     items.sort(key=lambda x: (x.username is None, (x.username or x.name or "").lower()))
     return ChannelsResponse(items=items)
@@ -162,16 +385,46 @@ class MiniIngestRequest(BaseModel):
     channel: str
     limit: Optional[int] = 500
     force_media: Optional[bool] = True
+    full: Optional[bool] = False
 
 
 @app.post("/miniapp/api/ingest")
 async def miniapp_ingest(
     req: MiniIngestRequest, session: AsyncSession = Depends(get_session)
-) -> dict[str, str]:
-    return await ingest_channels(
-        session, [req.channel], limit=req.limit or 500, update_existing_media=bool(req.force_media)
+) -> dict[str, object]:
+    return await _submit_ingest(
+        session,
+        [req.channel],
+        limit=req.limit or 500,
+        force_media=bool(req.force_media),
+        full=bool(req.full),
     )
 
+
+@app.get("/miniapp/api/ingest/{job_id}")
+async def miniapp_ingest_status(job_id: int, session: AsyncSession = Depends(get_session)) -> dict:
+    return await ingest_job(job_id, session)
+
+
+async def _run_concurrently(items: List[Any], handle: Callable[[Any], Awaitable[None]]) -> None:
+    """``handle`` every item with ``ai_max_concurrency`` workers, paced by the OpenAI limiter.
+
+    Workers stop taking items once ``/comments/stop`` sets ``cancel_generation``.
+    """
+    pending = iter(items)
+
+    async def worker() -> None:
+        # shared iterator: every item is taken by exactly one worker
+        for item in pending:
+            if cancel_generation:
+                logger.warning("generation cancelled by user")
+                return
+            await handle(item)
+
+    n = max(1, min(int(settings.ai_max_concurrency), len(items)))
+    await asyncio.gather(*(worker() for _ in range(n)))
+
+
 class GenerateCommentsRequest(BaseModel):
     message_ids: List[int]
     model: Optional[str] = None
@@ -181,14 +434,14 @@ class GenerateCommentsRequest(BaseModel):
 
 
 @app.post("/miniapp/api/comments/generate")
-async def generate_comments(req: GenerateCommentsRequest) -> dict[str, int]:
+async def generate_comments(req: GenerateCommentsRequest) -> dict[str, Optional[int]]:
     # Process in background to keep UI responsive
     s = get_settings()
     # cap batch size to avoid overload
     ids = list(dict.fromkeys(req.message_ids))
     if not s.openai_api_key:
         logger.warning("OPENAI_API_KEY missing; skip generation", requested=len(req.message_ids))
-        return {"accepted": 0}
+        return {"accepted": 0, "job_id": None}
 
     # If scope provided, filter message_ids to the chosen channel/user
     if req.username or req.channel_id is not None:
@@ -212,24 +465,32 @@ async def generate_comments(req: GenerateCommentsRequest) -> dict[str, int]:
             rows = (await ses.execute(q)).scalars().all()
             ids = list(dict.fromkeys(rows))
 
-    logger.warning("comments.generate:schedule", extra={"requested": len(req.message_ids or []), "resolved_ids": len(ids)})
+    logger.warning(
+        "comments.generate:schedule",
+        extra={"requested": len(req.message_ids or []), "resolved_ids": len(ids)},
+    )
+    mdl = req.model or s.ai_model
+    job = create_generation_job(ids, model=mdl)
+
+    async def _one(mid: int) -> None:
+        try:
+            logger.warning("comments.generate:item:start", extra={"message_id": mid})
+            job.started(mid)
+            usage: dict[str, int] = {}
+            rec = await comment_message(mid, model=mdl, usage=usage)
+            job.stored(mid, model=mdl, comment=rec.comment_text, usage=usage)
+            logger.warning("comments.generate:item:done", extra={"message_id": mid})
+        except Exception as e:
+            job.failed(mid, str(e))
+            logger.exception(
+                "generate_comment failed", extra={"message_id": mid, "error": str(e)}
+            )
+
     async def _run() -> None:
         global cancel_generation
-        # Sequential processing with ~1s delay between items
         # Reset cancel flag at the beginning of a new run
         cancel_generation = False
-        for mid in ids:
-            if cancel_generation:
-                logger.warning("generation cancelled by user")
-                break
-            async with SessionLocal() as ses:
-                try:
-                    logger.warning("comments.generate:item:start", extra={"message_id": mid})
-                    await comment_message(ses, mid, model=req.model or s.ai_model)
-                    logger.warning("comments.generate:item:done", extra={"message_id": mid})
-                except Exception as e:
-                    logger.exception("generate_comment failed", extra={"message_id": mid, "error": str(e)})
-            await asyncio.sleep(1.0)
+        await _run_concurrently(ids, _one)
 
     # Start as a cancellable asyncio task (not BackgroundTasks)
     global current_generation_task
@@ -239,7 +500,8 @@ async def generate_comments(req: GenerateCommentsRequest) -> dict[str, int]:
     except Exception:
         pass
     current_generation_task = asyncio.create_task(_run())
-    return {"accepted": len(ids)}
+    job.attach(current_generation_task)
+    return {"accepted": len(ids), "job_id": job.id}
 
 
 class StopResponse(BaseModel):
@@ -270,12 +532,12 @@ class GenerateOverrideRequest(BaseModel):
 
 
 @app.post("/miniapp/api/comments/generate_override")
-async def generate_comments_override(req: GenerateOverrideRequest) -> dict[str, int]:
+async def generate_comments_override(req: GenerateOverrideRequest) -> dict[str, Optional[int]]:
     """Generate comments using provided text overrides for specific message_ids."""
     s = get_settings()
     if not s.openai_api_key:
         logger.warning("OPENAI_API_KEY missing; skip override generation", requested=len(req.items))
-        return {"accepted": 0}
+        return {"accepted": 0, "job_id": None}
 
     global cancel_generation, current_generation_task
     try:
@@ -286,51 +548,97 @@ async def generate_comments_override(req: GenerateOverrideRequest) -> dict[str,
     cancel_generation = False
 
     logger.warning("comments.generate_override:schedule", extra={"requested": len(req.items or [])})
-    async def _run_override() -> None:
+    job = create_generation_job([it.message_id for it in req.items], model=req.model or s.ai_model)
+
+    async def _one_override(it: GenerateOverrideItem) -> None:
         from sqlalchemy import update as sa_update
         from tg_events.models import AiComment
-        for it in req.items:
-            if cancel_generation:
-                break
-            text = (it.text or "").strip()
-            if not text:
-                logger.warning("comments.generate_override:skip_empty", extra={"message_id": it.message_id})
-                continue
-            # run sync generator in executor
-            loop = asyncio.get_running_loop()
-            from tg_events.ai.commenter import generate_comment_sync
-
-            try:
-                mdl = it.model or req.model or s.ai_model
-                logger.warning("comments.generate_override:item:start", extra={"message_id": it.message_id, "model": mdl})
-                comment = await loop.run_in_executor(
-                    None, lambda: generate_comment_sync(text, model=mdl)
+        text = (it.text or "").strip()
+        if not text:
+            job.skipped(it.message_id, "empty_text")
+            logger.warning(
+                "comments.generate_override:skip_empty", extra={"message_id": it.message_id}
+            )
+            return
+        try:
+            mdl = it.model or req.model or s.ai_model
+            logger.warning(
+                "comments.generate_override:item:start",
+                extra={"message_id": it.message_id, "model": mdl},
+            )
+            job.started(it.message_id)
+            usage: dict[str, int] = {}
+            comment = await generate_comment(text, model=mdl, usage=usage)
+            async with SessionLocal() as ses:
+                # upsert: try update, if 0 rows affected → insert
+                res = await ses.execute(
+                    sa_update(AiComment)
+                    .where(
+                        AiComment.message_id == it.message_id,
+                        AiComment.model == mdl,
+                    )
+                    .values(comment_text=comment)
                 )
-                async with SessionLocal() as ses:
-                    # upsert: try update, if 0 rows affected → insert
-                    res = await ses.execute(
-                        sa_update(AiComment)
-                        .where(
-                            AiComment.message_id == it.message_id,
-                            AiComment.model == mdl,
-                        )
-                        .values(comment_text=comment)
+                if (res.rowcount or 0) == 0:
+                    rec = AiComment(
+                        message_id=it.message_id,
+                        model=mdl,
+                        comment_text=comment,
                     )
-                    if (res.rowcount or 0) == 0:
-                        rec = AiComment(
-                            message_id=it.message_id,
-                            model=mdl,
-                            comment_text=comment,
-                        )
-                        ses.add(rec)
-                    await ses.commit()
-                logger.warning("comments.generate_override:item:stored", extra={"message_id": it.message_id, "chars": len(comment or "")})
-            except Exception as e:
-                logger.exception("generate_override failed", extra={"message_id": it.message_id, "error": str(e)})
-            await asyncio.sleep(0)  # yield control
+                    ses.add(rec)
+                await ses.commit()
+            job.stored(it.message_id, model=mdl, comment=comment, usage=usage)
+            logger.warning(
+                "comments.generate_override:item:stored",
+                extra={"message_id": it.message_id, "chars": len(comment or "")},
+            )
+        except Exception as e:
+            job.failed(it.message_id, str(e))
+            logger.exception(
+                "generate_override failed", extra={"message_id": it.message_id, "error": str(e)}
+            )
+
+    async def _run_override() -> None:
+        await _run_concurrently(req.items, _one_override)
 
     current_generation_task = asyncio.create_task(_run_override())
-    return {"accepted": len(req.items)}
+    job.attach(current_generation_task)
+    return {"accepted": len(req.items), "job_id": job.id}
+
+
+def _sse(event: dict[str, Any]) -> str:
+    if not event:
+        return ": keep-alive\n\n"
+    return f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+@app.get("/miniapp/api/comments/jobs/{job_id}/events")
+async def generation_events(
+    job_id: int,
+    request: Request,
+    last_event_id: Optional[str] = Header(default=None),
+) -> StreamingResponse:
+    """Server-Sent Events of a generation run (``job_id`` from the generate endpoints).
+
+    Replays the run from the start (or after ``Last-Event-ID`` on reconnect) and closes
+    after the final ``done`` event.
+    """
+    job = get_generation_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="generation job not found")
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def stream() -> AsyncIterator[str]:
+        async for event in job.follow(after=after):
+            if await request.is_disconnected():
+                return
+            yield _sse(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 class DeleteCommentsRequest(BaseModel):
@@ -382,34 +690,11 @@ async def delete_posts(req: DeletePostsRequest) -> dict[str, int]:
     ids = list(dict.fromkeys(req.message_ids))
     if not ids:
         return {"deleted": 0}
-    media_deleted = 0
     async with SessionLocal() as ses:
-        # delete dependent events first to avoid FK restriction
-        await ses.execute(delete(Event).where(Event.source_message_id.in_(ids)))
-        if req.delete_media:
-            rows = await ses.execute(select(MessageRaw.id, MessageRaw.attachments).where(MessageRaw.id.in_(ids)))
-            for _mid, atts in rows.all():
-                media = None
-                if isinstance(atts, dict):
-                    media = atts.get("media")
-                if isinstance(media, list) and media:
-                    for it in media:
-                        p = None
-                        if isinstance(it, dict):
-                            p = it.get("path")
-                        elif isinstance(it, str):
-                            p = it
-                        if p:
-                            try:
-                                f = Path(settings.media_root) / p
-                                if f.is_file():
-                                    f.unlink(missing_ok=True)
-                                    media_deleted += 1
-                            except Exception:
-                                pass
-        res = await ses.execute(delete(MessageRaw).where(MessageRaw.id.in_(ids)))
+        deleted, orphaned = await delete_messages(ses, ids, with_media=bool(req.delete_media))
         await ses.commit()
-        return {"deleted": int(res.rowcount or 0), "media_deleted": int(media_deleted)}
+    media_deleted = unlink_media(orphaned)
+    return {"deleted": deleted, "media_deleted": int(media_deleted)}
 
 
 class UpdateCommentRequest(BaseModel):
@@ -440,6 +725,84 @@ async def update_comment(req: UpdateCommentRequest) -> dict[str, int]:
         await ses.commit()
         return {"updated": int(updated)}
 
+class StreamCommentRequest(BaseModel):
+    message_id: int
+    # comment this text instead of the stored post text (e.g. post + its 👆 child)
+    text: Optional[str] = None
+    model: Optional[str] = None
+
+
+@app.post("/miniapp/api/comments/stream")
+async def stream_comment_endpoint(req: StreamCommentRequest) -> StreamingResponse:
+    """Regenerate one comment, streaming it as Server-Sent Events.
+
+    Emits ``delta`` events (``{"text": ...}``) while the model writes, then stores the
+    comment and emits ``stored``; ``error`` ends the stream without storing anything.
+    """
+    s = get_settings()
+    if not s.openai_api_key:
+        raise HTTPException(status_code=503, detail="OPENAI_API_KEY is not configured")
+    mdl = req.model or s.ai_model
+    text = (req.text or "").strip()
+    if not text:
+        async with SessionLocal() as ses:
+            msg = await ses.get(MessageRaw, req.message_id)
+        if msg is None:
+            raise HTTPException(status_code=404, detail="message not found")
+        text = (msg.text or "").strip() or "(no text)"
+    text = text[: s.ai_comment_max_chars]
+
+    def event(name: str, data: dict[str, Any]) -> str:
+        return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def stream() -> AsyncIterator[str]:
+        started = time.monotonic()
+        usage: dict[str, int] = {}
+        parts: list[str] = []
+        try:
+            async for delta in stream_comment(text, model=mdl, usage=usage):
+                parts.append(delta)
+                yield event("delta", {"text": delta})
+        except Exception as e:
+            logger.exception("comments.stream:failed", extra={"message_id": req.message_id})
+            yield event("error", {"error": str(e)})
+            return
+        comment = "".join(parts).strip()[: s.ai_comment_max_chars]
+        if not comment:
+            yield event("error", {"error": "empty completion"})
+            return
+        async with SessionLocal() as ses:
+            from sqlalchemy import update as sa_update
+            res = await ses.execute(
+                sa_update(AiComment)
+                .where(AiComment.message_id == req.message_id, AiComment.model == mdl)
+                .values(comment_text=comment)
+            )
+            if not res.rowcount:
+                ses.add(AiComment(message_id=req.message_id, model=mdl, comment_text=comment))
+            await ses.commit()
+        logger.warning(
+            "comments.stream:stored",
+            extra={"message_id": req.message_id, "model": mdl, "chars": len(comment)},
+        )
+        yield event(
+            "stored",
+            {
+                "message_id": req.message_id,
+                "model": mdl,
+                "comment": comment,
+                "usage": usage,
+                "latency_ms": int((time.monotonic() - started) * 1000),
+            },
+        )
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Topics API
 class TopicItemOut(BaseModel):
     id: int
@@ -524,7 +887,14 @@ async def list_topics(session: AsyncSession = Depends(get_session)) -> TopicsRes
                 )
                 for r in snap_rows
             ]
-            items.append(TopicOut(id=int(tid), name=name, message_ids=[int(x) for x in msg_ids], items=item_objs))
+            items.append(
+                TopicOut(
+                    id=int(tid),
+                    name=name,
+                    message_ids=[int(x) for x in msg_ids],
+                    items=item_objs,
+                )
+            )
     return TopicsResponse(items=items)
 
 
@@ -541,7 +911,9 @@ async def create_topic(req: TopicCreate, session: AsyncSession = Depends(get_ses
         await session.commit()
         await session.refresh(row)
     # load items
-    ids = (await session.execute(select(TopicItem.message_id).where(TopicItem.topic_id == row.id))).scalars().all()
+    ids = (
+        await session.execute(select(TopicItem.message_id).where(TopicItem.topic_id == row.id))
+    ).scalars().all()
     return TopicOut(id=int(row.id), name=row.name, message_ids=[int(x) for x in ids])
 
 
@@ -554,7 +926,9 @@ class TopicItemRemove(BaseModel):
 
 
 @app.delete("/miniapp/api/topics/remove")
-async def remove_topic_item(req: TopicItemRemove, session: AsyncSession = Depends(get_session)) -> dict[str, int]:
+async def remove_topic_item(
+    req: TopicItemRemove, session: AsyncSession = Depends(get_session)
+) -> dict[str, int]:
     logger.info(
         "topics_remove request",
         extra={
@@ -576,7 +950,8 @@ async def remove_topic_item(req: TopicItemRemove, session: AsyncSession = Depend
         return {"deleted": deleted}
     if req.topic_id is None:
         raise ValueError("topic_id required when topic_item_id not provided")
-    if req.topic_item_id is None and req.message_id is None and (req.msg_id is None or req.channel_tg_id is None):
+    no_stable_key = req.msg_id is None or req.channel_tg_id is None
+    if req.topic_item_id is None and req.message_id is None and no_stable_key:
         raise ValueError("topic_item_id or message_id/stable key required")
     msg_id_val = req.msg_id
     tg_id_val = req.channel_tg_id
@@ -616,15 +991,20 @@ async def remove_topic_item(req: TopicItemRemove, session: AsyncSession = Depend
 
 
 @app.delete("/miniapp/api/topics/{topic_id}")
-async def delete_topic(topic_id: int, session: AsyncSession = Depends(get_session)) -> dict[str, int]:
+async def delete_topic(
+    topic_id: int, session: AsyncSession = Depends(get_session)
+) -> dict[str, int]:
     res = await session.execute(delete(Topic).where(Topic.id == topic_id))
     await session.commit()
     return {"deleted": int(res.rowcount or 0)}
 
 
 @app.post("/miniapp/api/topics/add")
-async def add_topic_item(req: TopicItemAdd, session: AsyncSession = Depends(get_session)) -> dict[str, int]:
-    # idempotent upsert by (topic_id, channel_tg_id, msg_id). If those are not provided, fall back to message_id.
+async def add_topic_item(
+    req: TopicItemAdd, session: AsyncSession = Depends(get_session)
+) -> dict[str, int]:
+    # idempotent upsert by (topic_id, channel_tg_id, msg_id). If those are not provided,
+    # fall back to message_id.
     if req.channel_tg_id is not None and req.msg_id is not None:
         exists = (
             await session.execute(
@@ -665,12 +1045,16 @@ async def add_topic_item(req: TopicItemAdd, session: AsyncSession = Depends(get_
         await session.commit()
         return {"added": 1}
     # fallback using message_id only
-    m = (await session.execute(select(MessageRaw.id).where(MessageRaw.id == req.message_id))).scalar_one_or_none()
+    m = (
+        await session.execute(select(MessageRaw.id).where(MessageRaw.id == req.message_id))
+    ).scalar_one_or_none()
     if m is None:
         return {"added": 0}
     exists = (
         await session.execute(
-            select(TopicItem.id).where(TopicItem.topic_id == req.topic_id, TopicItem.message_id == req.message_id)
+            select(TopicItem.id).where(
+                TopicItem.topic_id == req.topic_id, TopicItem.message_id == req.message_id
+            )
         )
     ).scalar_one_or_none()
     if exists is None:
@@ -712,16 +1096,28 @@ class ProjectCreate(BaseModel):
 
 @app.get("/miniapp/api/projects", response_model=ProjectsResponse)
 async def list_projects(session: AsyncSession = Depends(get_session)) -> ProjectsResponse:
-    rows = (await session.execute(select(Project.id, Project.name, Project.description, Project.status))).all()
+    rows = (
+        await session.execute(
+            select(Project.id, Project.name, Project.description, Project.status)
+        )
+    ).all()
     out: list[ProjectOut] = []
     for pid, name, desc, status in rows:
-        ids = (await session.execute(select(ProjectIdea.id).where(ProjectIdea.project_id == pid))).scalars().all()
-        out.append(ProjectOut(id=int(pid), name=name, description=desc, status=status, ideas_count=len(ids)))
+        ids = (
+            await session.execute(select(ProjectIdea.id).where(ProjectIdea.project_id == pid))
+        ).scalars().all()
+        out.append(
+            ProjectOut(
+                id=int(pid), name=name, description=desc, status=status, ideas_count=len(ids)
+            )
+        )
     return ProjectsResponse(items=out)
 
 
 @app.post("/miniapp/api/projects", response_model=ProjectOut)
-async def create_project(req: ProjectCreate, session: AsyncSession = Depends(get_session)) -> ProjectOut:
+async def create_project(
+    req: ProjectCreate, session: AsyncSession = Depends(get_session)
+) -> ProjectOut:
     name = (req.name or "").strip()
     if not name:
         raise ValueError("name required")
@@ -731,8 +1127,16 @@ async def create_project(req: ProjectCreate, session: AsyncSession = Depends(get
         session.add(row)
         await session.commit()
         await session.refresh(row)
-    ids = (await session.execute(select(ProjectIdea.id).where(ProjectIdea.project_id == row.id))).scalars().all()
-    return ProjectOut(id=int(row.id), name=row.name, description=row.description, status=row.status, ideas_count=len(ids))
+    ids = (
+        await session.execute(select(ProjectIdea.id).where(ProjectIdea.project_id == row.id))
+    ).scalars().all()
+    return ProjectOut(
+        id=int(row.id),
+        name=row.name,
+        description=row.description,
+        status=row.status,
+        ideas_count=len(ids),
+    )
 
 
 class ProjectIdeaAdd(BaseModel):
@@ -749,7 +1153,9 @@ class ProjectIdeaAdd(BaseModel):
 
 
 @app.post("/miniapp/api/projects/ideas")
-async def add_project_idea(req: ProjectIdeaAdd, session: AsyncSession = Depends(get_session)) -> dict[str, int]:
+async def add_project_idea(
+    req: ProjectIdeaAdd, session: AsyncSession = Depends(get_session)
+) -> dict[str, int]:
     idea = ProjectIdea(
         project_id=req.project_id,
         topic_id=req.topic_id,
@@ -774,7 +1180,10 @@ class ProjectIdeaUpdate(BaseModel):
 
 @app.put("/miniapp/api/projects/{project_id}/ideas/{idea_id}")
 async def update_project_idea(
-    project_id: int, idea_id: int, req: ProjectIdeaUpdate, session: AsyncSession = Depends(get_session)
+    project_id: int,
+    idea_id: int,
+    req: ProjectIdeaUpdate,
+    session: AsyncSession = Depends(get_session),
 ) -> dict[str, int]:
     from sqlalchemy import update as sa_update
     res = await session.execute(
@@ -790,8 +1199,12 @@ async def update_project_idea(
 
 
 @app.delete("/miniapp/api/projects/{project_id}/ideas/{idea_id}")
-async def delete_project_idea(project_id: int, idea_id: int, session: AsyncSession = Depends(get_session)) -> dict[str, int]:
-    res = await session.execute(delete(ProjectIdea).where(ProjectIdea.id == idea_id, ProjectIdea.project_id == project_id))
+async def delete_project_idea(
+    project_id: int, idea_id: int, session: AsyncSession = Depends(get_session)
+) -> dict[str, int]:
+    res = await session.execute(
+        delete(ProjectIdea).where(ProjectIdea.id == idea_id, ProjectIdea.project_id == project_id)
+    )
     await session.commit()
     return {"deleted": int(res.rowcount or 0)}
 
@@ -14,17 +14,75 @@ class Settings(BaseSettings):
     db_name: str = "tg_events"
     db_user: str = "tg"
     db_password: str = "tg"
+    db_pool_mode: str = "queue"  # queue (pooled connections) | null (connect per session)
+    db_pool_size: int = 10
+    db_max_overflow: int = 10  # extra connections beyond pool_size under bursts
+    db_pool_timeout_s: float = 30.0  # wait for a free connection before erroring
+    db_pool_recycle_s: int = 1800  # reconnect connections older than this
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100  # asyncpg prepared statements per connection (0 = off)
     # Telegram
     telegram_api_id: int | None = None
     telegram_api_hash: str | None = None
     telegram_session_path: str = "sessions/user.session"
+    telegram_pool_size: int = 4  # concurrent Telegram clients (in-memory session copies)
+    peer_cache_ttl_s: int = 86400  # re-resolve cached peers (username/title) after this long
+    # request budget shared by pooled clients, per method class (requests/second)
+    telegram_rps_history: float = 1.0
+    telegram_rps_resolve: float = 0.2
+    telegram_rps_file: float = 10.0
+    telegram_rps_default: float = 5.0
+    telegram_burst: float = 5.0
+    telegram_flood_sleep_max_s: int = 120  # longer FloodWaits are raised instead of slept out
+    telegram_connect_attempts: int = 5
+    telegram_reconnect_max_delay_s: float = 30.0
+    telegram_watchdog_interval_s: float = 15.0
     media_root: str = "media"
+    # media_layout names per-message files: media without a Telegram file id, every file
+    # when media_dedupe is off, and Desktop-export imports. With media_dedupe on (default)
+    # live downloads go to by-id/{hash2}/{file id}, which is always sharded.
+    media_layout: str = "sharded"  # sharded ({channel}/{hash2}/file) | flat (legacy)
+    media_dedupe: bool = True  # store by Telegram file id under by-id/, shared across posts
+    # Ingest
+    ingest_page_size: int = 200  # messages per lookup/upsert/commit round
+    ingest_concurrency: int = 2  # channels ingested in parallel per call (<= telegram_pool_size)
+    forward_enrich_on_ingest: bool = True  # resolve forward sources after each channel ingest
+    forward_enrich_batch: int = 500  # forwarded messages per enrichment round
+    ingest_worker_enabled: bool = True  # run queued ingest jobs inside the API process
+    ingest_job_poll_s: float = 5.0
+    ingest_job_progress_interval_s: float = 1.0  # min delay between progress writes
+    ingest_job_heartbeat_s: float = 10.0
+    ingest_job_stale_s: float = 120.0  # running jobs without a heartbeat this long are requeued
+    scheduler_enabled: bool = False  # poll all channels continuously from the API process
+    scheduler_slice_limit: int = 200  # max messages per channel per turn (fair interleaving)
+    scheduler_min_interval_s: float = 60.0
+    scheduler_max_interval_s: float = 3600.0
+    scheduler_target_batch: float = 5.0  # aim for this many new posts per poll
+    scheduler_idle_s: float = 30.0
+    listener_batch_size: int = 100  # buffered updates that trigger a flush
+    listener_flush_interval_s: float = 1.0
+    listener_refresh_s: float = 60.0  # reload the channels table this often
+    media_download_workers: int = 4
+    media_queue_size: int = 256
+    # per-kind download caps in MB (0 = unlimited)
+    media_max_photo_mb: int = 20
+    media_max_gif_mb: int = 50
+    media_max_video_mb: int = 200
+    # Miniapp delta sync
+    changes_max_posts: int = 200  # bigger deltas tell the client to reload instead
+    change_tombstone_retention_s: int = 7 * 86400  # how long deletions stay syncable
     # AI / OpenAI
     openai_api_key: str | None = None  # from env: OPENAI_API_KEY
+    openai_base_url: str | None = None  # e.g. scripts/fake_openai.py; default: api.openai.com
     ai_model: str = "gpt-5-nano"
     ai_fallback_model: str = "gpt-4o-mini"
     ai_timeout_s: int = 20
-    ai_max_concurrency: int = 4
+    ai_max_concurrency: int = 4  # comments generated in parallel by bulk runs
+    # OpenAI quota shared by all generations in this process (0 = unlimited)
+    ai_rpm: int = 500  # requests per minute
+    ai_tpm: int = 200_000  # tokens per minute (input + output)
+    ai_max_retries: int = 5  # per comment, on 429 / 5xx / timeouts
+    ai_backoff_max_s: float = 60.0
     ai_comment_max_chars: int = 2000
 
     model_config = SettingsConfigDict(
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from typing import AsyncIterator
+import time
+from typing import Any, AsyncIterator
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import NullPool
 
@@ -17,21 +19,104 @@ def _make_database_url() -> str:
 
 
 def create_engine() -> AsyncEngine:
+    """Async engine; pooled unless ``DB_POOL_MODE=null`` (e.g. behind pgbouncer).
+
+    In transaction-pooling pgbouncer setups also set ``DB_STATEMENT_CACHE_SIZE=0``:
+    asyncpg's prepared statements do not survive a server connection switch.
+    """
+    s = get_settings()
+    connect_args = {"statement_cache_size": max(0, int(s.db_statement_cache_size))}
+    if s.db_pool_mode == "null":
+        return create_async_engine(
+            _make_database_url(), poolclass=NullPool, connect_args=connect_args, future=True
+        )
     return create_async_engine(
         _make_database_url(),
-        poolclass=NullPool,
+        pool_size=max(1, int(s.db_pool_size)),
+        max_overflow=max(0, int(s.db_max_overflow)),
+        pool_timeout=float(s.db_pool_timeout_s),
+        pool_recycle=int(s.db_pool_recycle_s),
+        pool_pre_ping=bool(s.db_pool_pre_ping),
+        connect_args=connect_args,
         future=True,
     )
 
 
+class PoolMetrics:
+    """Counters fed by pool events: connections opened vs. checkouts served, hold times."""
+
+    def __init__(self) -> None:
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidated = 0
+        self.held_s = 0.0
+        self.max_held_s = 0.0
+        self.peak_checked_out = 0
+        self._checked_out = 0
+
+    def attach(self, engine: AsyncEngine) -> None:
+        target = engine.sync_engine
+        event.listen(target, "connect", self._on_connect)
+        event.listen(target, "checkout", self._on_checkout)
+        event.listen(target, "checkin", self._on_checkin)
+        event.listen(target, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_conn: Any, record: Any) -> None:
+        self.connects += 1
+
+    def _on_checkout(self, dbapi_conn: Any, record: Any, proxy: Any) -> None:
+        self.checkouts += 1
+        self._checked_out += 1
+        self.peak_checked_out = max(self.peak_checked_out, self._checked_out)
+        record.info["checked_out_at"] = time.monotonic()
+
+    def _on_checkin(self, dbapi_conn: Any, record: Any) -> None:
+        self.checkins += 1
+        self._checked_out = max(0, self._checked_out - 1)
+        started = record.info.pop("checked_out_at", None)
+        if started is not None:
+            held = time.monotonic() - started
+            self.held_s += held
+            self.max_held_s = max(self.max_held_s, held)
+
+    def _on_invalidate(self, dbapi_conn: Any, record: Any, exception: Any) -> None:
+        self.invalidated += 1
+
+    def snapshot(self, engine: AsyncEngine) -> dict[str, Any]:
+        pool = engine.pool
+        out: dict[str, Any] = {
+            "mode": type(pool).__name__,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            # share of checkouts served by an already open connection
+            "reuse_ratio": round(1 - self.connects / self.checkouts, 3) if self.checkouts else None,
+            "checked_out": self._checked_out,
+            "peak_checked_out": self.peak_checked_out,
+            "invalidated": self.invalidated,
+            "avg_held_ms": round(self.held_s / self.checkins * 1000, 1) if self.checkins else None,
+            "max_held_ms": round(self.max_held_s * 1000, 1),
+        }
+        for name in ("size", "checkedin", "overflow"):
+            fn = getattr(pool, name, None)
+            if callable(fn):
+                out[name] = fn()
+        return out
+
+
 engine: AsyncEngine = create_engine()
+pool_metrics = PoolMetrics()
+pool_metrics.attach(engine)
 SessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
     bind=engine, expire_on_commit=False, autoflush=False, autocommit=False
 )
 
 
+def pool_stats() -> dict[str, Any]:
+    """Pool utilisation for /health."""
+    return pool_metrics.snapshot(engine)
+
+
 async def get_session() -> AsyncIterator[AsyncSession]:
     async with SessionLocal() as session:
         yield session
-
-
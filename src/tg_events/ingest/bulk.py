@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import csv
+import itertools
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+logger = logging.getLogger("tg_events.ingest.bulk")
+
+# staging rows per COPY + merge + commit; bounds the transaction size of huge archives
+DEFAULT_BATCH_ROWS = 500_000
+
+_STAGE = "messages_stage"
+_STAGE_COLUMNS = (
+    "chan_tg_id",
+    "chan_username",
+    "chan_title",
+    "msg_id",
+    "date",
+    "text",
+    "attachments",
+    "features",
+    "media_path",
+    "media_kind",
+    "media_mime",
+    "media_size",
+    "media_checksum",
+    "media_content_key",
+)
+
+_CREATE_STAGE = f"""
+CREATE TEMP TABLE IF NOT EXISTS {_STAGE} (
+    chan_tg_id bigint,
+    chan_username text,
+    chan_title text,
+    msg_id bigint NOT NULL,
+    date timestamptz NOT NULL,
+    text text,
+    attachments jsonb,
+    features jsonb,
+    media_path text,
+    media_kind text,
+    media_mime text,
+    media_size bigint,
+    media_checksum text,
+    media_content_key text
+) ON COMMIT DELETE ROWS
+"""
+
+# channels first: adopt rows known only by username, then insert/refresh by tg_id
+_MERGE_CHANNELS = [
+    f"""
+    UPDATE channels c SET tg_id = s.chan_tg_id, updated_at = now()
+    FROM (SELECT DISTINCT ON (chan_tg_id) chan_tg_id, chan_username FROM {_STAGE}
+          WHERE chan_tg_id IS NOT NULL AND chan_username IS NOT NULL) s
+    WHERE c.tg_id IS NULL AND lower(c.username) = lower(s.chan_username)
+      AND NOT EXISTS (SELECT 1 FROM channels o WHERE o.tg_id = s.chan_tg_id)
+    """,
+    f"""
+    INSERT INTO channels (tg_id, username, title, is_private, created_at, updated_at)
+    SELECT DISTINCT ON (chan_tg_id) chan_tg_id, chan_username, chan_title, false, now(), now()
+    FROM {_STAGE} WHERE chan_tg_id IS NOT NULL
+    ORDER BY chan_tg_id
+    ON CONFLICT ON CONSTRAINT uq_channels_tg_id DO UPDATE SET
+        username = coalesce(excluded.username, channels.username),
+        title = coalesce(excluded.title, channels.title),
+        updated_at = now()
+    """,
+    f"""
+    INSERT INTO channels (username, title, is_private, created_at, updated_at)
+    SELECT DISTINCT ON (lower(chan_username)) chan_username, chan_title, false, now(), now()
+    FROM {_STAGE} s WHERE s.chan_tg_id IS NULL AND s.chan_username IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM channels c WHERE lower(c.username) = lower(s.chan_username))
+    ORDER BY lower(chan_username)
+    """,
+]
+
+# stage rows -> channels.id through the few distinct channel keys of the batch (hash joins)
+_CHANNEL_KEY = "coalesce({t}.chan_tg_id::text, '@' || lower({t}.chan_username))"
+_CHANNEL_MAP = f"""
+chan_map AS (
+    SELECT DISTINCT ON (k.key) k.key, c.id
+    FROM (SELECT DISTINCT {_CHANNEL_KEY.format(t=_STAGE)} AS key, chan_tg_id,
+                 lower(chan_username) AS uname
+          FROM {_STAGE}) k
+    JOIN channels c ON (k.chan_tg_id IS NOT NULL AND c.tg_id = k.chan_tg_id)
+        OR (k.chan_tg_id IS NULL AND lower(c.username) = k.uname)
+    ORDER BY k.key, c.id
+)
+"""
+
+# one row per (channel, msg_id); existing rows keep text/date like upsert_messages
+_MERGE_MESSAGES = f"""
+WITH {_CHANNEL_MAP}
+INSERT INTO messages_raw
+    (channel_id, msg_id, date, text, attachments, features, created_at, updated_at)
+SELECT DISTINCT ON (m.id, s.msg_id)
+    m.id, s.msg_id, s.date, s.text, s.attachments, s.features, now(), now()
+FROM {_STAGE} s JOIN chan_map m ON m.key = {_CHANNEL_KEY.format(t="s")}
+ORDER BY m.id, s.msg_id
+ON CONFLICT ON CONSTRAINT uq_messages_channel_msg DO UPDATE SET
+    attachments = coalesce(excluded.attachments, messages_raw.attachments),
+    features = coalesce(excluded.features, messages_raw.features),
+    updated_at = now()
+"""
+
+# media_files manifest rows for files the caller already placed under media_root
+_MERGE_MEDIA = f"""
+WITH {_CHANNEL_MAP}
+INSERT INTO media_files
+    (channel_id, msg_id, path, kind, mime, size, checksum, content_key, created_at, updated_at)
+SELECT DISTINCT ON (m.id, s.msg_id, s.media_path)
+    m.id, s.msg_id, s.media_path, s.media_kind, s.media_mime, s.media_size, s.media_checksum,
+    s.media_content_key, now(), now()
+FROM {_STAGE} s JOIN chan_map m ON m.key = {_CHANNEL_KEY.format(t="s")}
+WHERE s.media_path IS NOT NULL
+ORDER BY m.id, s.msg_id, s.media_path
+ON CONFLICT ON CONSTRAINT uq_media_files_channel_msg_path DO UPDATE SET
+    kind = excluded.kind,
+    mime = excluded.mime,
+    size = excluded.size,
+    checksum = excluded.checksum,
+    content_key = coalesce(excluded.content_key, media_files.content_key),
+    updated_at = now()
+"""
+
+_ADVANCE_WATERMARKS = f"""
+WITH {_CHANNEL_MAP}
+UPDATE channels c SET last_message_id = greatest(coalesce(c.last_message_id, 0), w.max_id)
+FROM (
+    SELECT m.id, max(s.msg_id) AS max_id
+    FROM {_STAGE} s JOIN chan_map m ON m.key = {_CHANNEL_KEY.format(t="s")}
+    GROUP BY m.id
+) w
+WHERE c.id = w.id
+"""
+
+
+def _int(value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _date(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, str) and value:
+        try:
+            dt = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    else:
+        return None
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def _features(post: dict[str, Any]) -> Optional[str]:
+    """``features.forward`` in the shape ingest stores (see service._forward_features)."""
+    f_type = post.get("fwd_from_type") or None
+    f_name = post.get("fwd_from_name") or None
+    if f_type is None and f_name is None:
+        return None
+    f_username = None
+    if f_type is None and isinstance(f_name, str) and f_name.startswith("@"):
+        f_type, f_username = "user", f_name.lstrip("@")
+    forward = {
+        "from_name": f_name,
+        "from_title": None,
+        "from_username": f_username,
+        "from_type": f_type,
+        "from_peer_id": _int(post.get("fwd_from_id")),
+    }
+    return json.dumps({"forward": forward}, ensure_ascii=False)
+
+
+def post_record(post: dict[str, Any]) -> Optional[tuple]:
+    """Staging row for a ``dump_channel.Post`` dict; None when it cannot be keyed.
+
+    Importers that place media themselves may add ``attachments`` (stored as is) and
+    ``media_file`` (``path``/``kind``/``mime``/``size``/``checksum``/``content_key`` for
+    ``media_files``); ``content_key`` defaults to the post's Telegram ``media_id``.
+    """
+    msg_id = _int(post.get("id"))
+    date = _date(post.get("date"))
+    tg_id = _int(post.get("channel_id"))
+    username = (post.get("username") or "").lstrip("@") or None
+    if msg_id is None or date is None or (tg_id is None and username is None):
+        return None
+    attachments = post.get("attachments")
+    media = post.get("media_file") or {}
+    return (
+        tg_id,
+        username,
+        post.get("channel_title") or None,
+        msg_id,
+        date,
+        post.get("text") or None,
+        json.dumps(attachments, ensure_ascii=False) if isinstance(attachments, dict) else None,
+        _features(post),
+        media.get("path"),
+        media.get("kind"),
+        media.get("mime"),
+        _int(media.get("size")),
+        media.get("checksum"),
+        (media.get("content_key") or post.get("media_id") or None) if media else None,
+    )
+
+
+def read_posts(path: Path) -> Iterator[dict[str, Any]]:
+    """Stream post dicts from a ``dump_channel.py`` JSONL or CSV export."""
+    with path.open(encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+async def load_posts(
+    session: AsyncSession,
+    posts: Iterable[dict[str, Any]],
+    *,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> dict[str, int]:
+    """Bulk-load posts into ``channels``/``messages_raw``.
+
+    Each batch is streamed with ``COPY`` (asyncpg ``copy_records_to_table``) into a
+    temporary staging table and merged in one statement on ``uq_messages_channel_msg``,
+    then committed. Channels are created or refreshed from the posts' channel id,
+    username and title, and their ``last_message_id`` watermark is advanced. Existing
+    messages keep their text/date. Files are not copied here: rows only reference media
+    the caller already stored under ``media_root`` (see :func:`post_record`).
+    """
+    stats = {"read": 0, "skipped": 0, "merged": 0, "batches": 0}
+
+    def records() -> Iterator[tuple]:
+        for post in posts:
+            stats["read"] += 1
+            rec = post_record(post)
+            if rec is None:
+                stats["skipped"] += 1
+                continue
+            yield rec
+
+    it = records()
+    size = max(1, int(batch_rows))
+    while (first := next(it, None)) is not None:
+        started = time.monotonic()
+        conn = await session.connection()
+        raw = (await conn.get_raw_connection()).driver_connection
+        await conn.execute(text(_CREATE_STAGE))
+        # streamed straight into COPY: a batch is never materialized in memory
+        await raw.copy_records_to_table(
+            _STAGE,
+            records=itertools.chain([first], itertools.islice(it, size - 1)),
+            columns=_STAGE_COLUMNS,
+        )
+        for stmt in _MERGE_CHANNELS:
+            await conn.execute(text(stmt))
+        res = await conn.execute(text(_MERGE_MESSAGES))
+        await conn.execute(text(_MERGE_MEDIA))
+        await conn.execute(text(_ADVANCE_WATERMARKS))
+        await session.commit()
+        stats["merged"] += int(res.rowcount or 0)
+        stats["batches"] += 1
+        logger.info(
+            "bulk:batch_loaded",
+            extra={"read": stats["read"], "seconds": round(time.monotonic() - started, 2)},
+        )
+    return stats
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import json
+import re
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from tg_events.ingest.media import file_checksum, size_cap
+from tg_events.media_store import channel_key, media_base
+
+
+# Telegram Desktop "Export chat history" (JSON) of a single channel: result.json is
+# {"name", "type", "id", "messages": [...]} with media paths relative to the export dir.
+
+_MESSAGES_KEY = re.compile(r'"messages"\s*:\s*\[')
+_SEPARATOR = re.compile(r"[\s,]*")
+_CHUNK = 1 << 20  # characters read per refill
+
+# Desktop writes a parenthesized note instead of a path for files it did not export
+_NOT_EXPORTED = "("
+
+
+def read_header(path: Path) -> dict[str, Any]:
+    """``name``/``type``/``id`` of the exported chat (the part before ``messages``)."""
+    with path.open(encoding="utf-8") as f:
+        head = ""
+        while (m := _MESSAGES_KEY.search(head)) is None:
+            chunk = f.read(_CHUNK)
+            if not chunk:
+                raise ValueError(f"{path}: no messages array")
+            head += chunk
+    try:
+        header = json.loads(head[: m.start()].rstrip().rstrip(",") + "}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path}: not a single-chat export") from e
+    if not isinstance(header, dict) or "id" not in header:
+        raise ValueError(f"{path}: not a single-chat export")
+    return header
+
+
+def iter_messages(path: Path, *, chunk_size: int = _CHUNK) -> Iterator[dict[str, Any]]:
+    """Stream the ``messages`` array one object at a time (memory ~ one chunk)."""
+    decoder = json.JSONDecoder()
+    with path.open(encoding="utf-8") as f:
+        buf = ""
+        while (m := _MESSAGES_KEY.search(buf)) is None:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buf += chunk
+        buf, pos, eof = buf[m.end() :], 0, False
+        while True:
+            pos = _SEPARATOR.match(buf, pos).end()  # type: ignore[union-attr]
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                if pos >= len(buf):
+                    raise json.JSONDecodeError("need more data", buf, pos)
+                obj, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # incomplete object at the end of the buffer: refill and retry
+                if eof:
+                    raise ValueError(f"{path}: truncated messages array") from None
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield obj
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+def _text(value: Any) -> str:
+    """Plain text of a message: ``text`` is a string or a list of strings/entity dicts."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "".join(p if isinstance(p, str) else str(p.get("text", "")) for p in value)
+    return ""
+
+
+def _date(msg: dict[str, Any]) -> Optional[datetime]:
+    # "date" is in the exporting machine's local time; the unix time is exact
+    unix = msg.get("date_unixtime")
+    if unix:
+        return datetime.fromtimestamp(int(unix), tz=timezone.utc)
+    raw = msg.get("date")
+    if not raw:
+        return None
+    dt = datetime.fromisoformat(raw)
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def _peer(value: Any) -> tuple[Optional[str], Optional[int]]:
+    """``"channel123"``/``"user123"`` ids of newer exports -> (type, id)."""
+    if isinstance(value, str):
+        for prefix in ("channel", "user"):
+            if value.startswith(prefix) and value[len(prefix) :].isdigit():
+                return prefix, int(value[len(prefix) :])
+    return None, None
+
+
+def _media(msg: dict[str, Any]) -> Optional[tuple[str, str, Optional[str]]]:
+    """``(kind, mime, relative file)`` for photos/videos/GIFs, like ``classify_media``."""
+    if msg.get("photo"):
+        return "photo", "image/jpeg", msg["photo"]
+    file = msg.get("file")
+    mime = msg.get("mime_type")
+    if not file or not isinstance(mime, str):
+        return None
+    if mime.startswith("image/") and msg.get("media_type") != "sticker":
+        return "photo", mime, file
+    if mime.startswith("video/"):
+        return ("gif" if msg.get("media_type") == "animation" else "video"), mime, file
+    return None
+
+
+class DesktopExportImporter:
+    """Maps a ``result.json`` export onto :func:`tg_events.ingest.bulk.load_posts` rows.
+
+    Attachments use the ingest shapes: ``{"media": [{path, kind, mime}]}`` for files
+    copied into ``media_root`` (same relative layout as :func:`media_base`), and
+    ``{"media_skipped": [...]}`` for files over the size caps or left out of the export.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        media_root: Path,
+        *,
+        username: Optional[str] = None,
+        copy_media: bool = True,
+    ) -> None:
+        self.path = path
+        self.export_dir = path.parent
+        self.media_root = media_root
+        self.copy_media = copy_media
+        self.header = read_header(path)
+        self.tg_id = int(self.header["id"])
+        self.title = self.header.get("name")
+        # exports carry no username; without it the channel is matched by tg_id only
+        self.username = username.lstrip("@") if username else None
+        self.stats = {"messages": 0, "service": 0, "media_copied": 0, "media_skipped": 0}
+
+    def _place(self, msg_id: int, kind: str, mime: str, rel: str) -> tuple[dict, Optional[dict]]:
+        """Copy one file into media_root; returns attachments and its media_files row."""
+        skipped = {"kind": kind, "mime": mime, "size": None, "reason": "not_exported"}
+        src = self.export_dir / rel
+        if rel.startswith(_NOT_EXPORTED) or not src.is_file():
+            self.stats["media_skipped"] += 1
+            return {"media_skipped": [skipped]}, None
+        size = src.stat().st_size
+        cap = size_cap(kind)
+        if cap is not None and size > cap:
+            self.stats["media_skipped"] += 1
+            return {"media_skipped": [{**skipped, "size": size, "reason": "too_large"}]}, None
+        base = media_base(channel_key(self.username, self.tg_id), msg_id)
+        target = self.media_root / f"{base}{src.suffix.lower()}"
+        if not (target.is_file() and target.stat().st_size == size):
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(src, target)
+            self.stats["media_copied"] += 1
+        relpath = target.relative_to(self.media_root).as_posix()
+        row = {
+            "path": relpath,
+            "kind": kind,
+            "mime": mime,
+            "size": size,
+            "checksum": file_checksum(target),
+        }
+        return {"media": [{"path": relpath, "kind": kind, "mime": mime}]}, row
+
+    def posts(self) -> Iterator[dict[str, Any]]:
+        for msg in iter_messages(self.path):
+            if msg.get("type") != "message" or not isinstance(msg.get("id"), int):
+                self.stats["service"] += 1
+                continue
+            self.stats["messages"] += 1
+            fwd_type, fwd_id = _peer(msg.get("forwarded_from_id"))
+            post: dict[str, Any] = {
+                "id": msg["id"],
+                "date": _date(msg),
+                "text": _text(msg.get("text")),
+                "channel_id": self.tg_id,
+                "username": self.username,
+                "channel_title": self.title,
+                "fwd_from_type": fwd_type,
+                "fwd_from_id": fwd_id,
+                "fwd_from_name": msg.get("forwarded_from"),
+            }
+            media = _media(msg)
+            if media is not None and self.copy_media:
+                post["attachments"], post["media_file"] = self._place(msg["id"], *media)
+            yield post
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Iterable, Optional
+
+from telethon.errors import FloodWaitError
+from telethon.tl.functions.channels import GetChannelsRequest
+from telethon.tl.functions.users import GetUsersRequest
+from telethon.tl.types import InputChannel, InputUser, PeerChannel, PeerUser
+from telethon.utils import get_input_channel, get_input_user
+
+from tg_events.config import get_settings
+from tg_events.db import SessionLocal
+from tg_events.ingest.peers import _fresh, peer_from_entity
+from tg_events.models import Peer
+from tg_events.repositories.messages import (
+    backfill_forward_sources,
+    list_unresolved_forwards,
+    mark_forwards_attempted,
+)
+from tg_events.repositories.peers import get_peers, upsert_peers
+
+
+logger = logging.getLogger("tg_events.ingest.forwards")
+
+PeerKey = tuple[str, int]
+
+# GetChannels/GetUsers accept up to 100 ids per call
+_RESOLVE_CHUNK = 100
+
+
+def _input_for(client: Any, key: PeerKey, cached: Optional[Peer]) -> Any:
+    """Input entity from the persistent cache or the client's in-memory cache (no calls)."""
+    peer_type, tg_id = key
+    if cached is not None and cached.access_hash is not None:
+        if peer_type == "channel":
+            return InputChannel(tg_id, int(cached.access_hash))
+        return InputUser(tg_id, int(cached.access_hash))
+    try:
+        peer = PeerChannel(tg_id) if peer_type == "channel" else PeerUser(tg_id)
+        inp = client.session.get_input_entity(peer)
+        return get_input_channel(inp) if peer_type == "channel" else get_input_user(inp)
+    except (ValueError, TypeError):
+        return None
+
+
+async def _resolve(
+    client: Any, keys: list[PeerKey], cached: dict[PeerKey, Peer]
+) -> list[dict[str, Any]]:
+    """Resolve peers with batched GetChannels/GetUsers; unresolvable ones get an empty row."""
+    rows: dict[PeerKey, dict[str, Any]] = {
+        key: {"peer_type": key[0], "tg_id": key[1]} for key in keys
+    }
+    for peer_type, request in (("channel", GetChannelsRequest), ("user", GetUsersRequest)):
+        inputs = [
+            inp
+            for key in keys
+            if key[0] == peer_type and (inp := _input_for(client, key, cached.get(key)))
+        ]
+        for i in range(0, len(inputs), _RESOLVE_CHUNK):
+            try:
+                res = await client(request(inputs[i : i + _RESOLVE_CHUNK]))
+            except FloodWaitError as e:
+                logger.warning("forwards:flood_wait", extra={"seconds": e.seconds})
+                return list(rows.values())
+            except Exception as e:
+                logger.warning("forwards:resolve_failed", extra={"error": str(e)})
+                continue
+            entities = getattr(res, "chats", None) if peer_type == "channel" else res
+            for info in map(peer_from_entity, entities or []):
+                if info is not None:
+                    rows[(info.peer_type, info.id)] = info.row()
+    return list(rows.values())
+
+
+async def enrich_forwards(
+    client: Any,
+    *,
+    channel_ids: Optional[Iterable[int]] = None,
+    batch_size: Optional[int] = None,
+    retry_attempted: bool = False,
+) -> dict[str, int]:
+    """Fill ``features.forward.from_title/from_username`` of stored forwards in bulk.
+
+    Walks unresolved forwards in id order, collects the distinct source peers of each
+    batch, answers them from the ``peers`` cache, resolves the misses with batched
+    GetChannels/GetUsers calls (misses are cached too, so they are not retried before
+    ``peer_cache_ttl_s``) and writes the results with one executemany UPDATE per batch.
+    Forwards still unresolved afterwards are marked and skipped by later runs unless
+    ``retry_attempted``.
+    """
+    batch_size = max(1, int(batch_size or get_settings().forward_enrich_batch))
+    ids = list(channel_ids) if channel_ids is not None else None
+    stats = {"scanned": 0, "peers": 0, "resolved": 0, "updated": 0, "unresolved": 0}
+    last_id = 0
+    while True:
+        async with SessionLocal() as ses:
+            pending = await list_unresolved_forwards(
+                ses,
+                after_id=last_id,
+                limit=batch_size,
+                channel_ids=ids,
+                retry_attempted=retry_attempted,
+            )
+            if not pending:
+                break
+            last_id = pending[-1][0]
+            stats["scanned"] += len(pending)
+            keys = list(dict.fromkeys((t, p) for _, t, p in pending))
+            stats["peers"] += len(keys)
+            cached = await get_peers(ses, keys)
+            known = {k: (p.title, p.username) for k, p in cached.items()}
+            misses = [k for k in keys if k not in cached or not _fresh(cached[k])]
+            if misses:
+                resolved = await _resolve(client, misses, cached)
+                await upsert_peers(ses, resolved)
+                for r in resolved:
+                    if r.get("access_hash") is not None:
+                        stats["resolved"] += 1
+                        known[(r["peer_type"], r["tg_id"])] = (r.get("title"), r.get("username"))
+            updates = []
+            unresolved = []
+            for msg_id, peer_type, peer_id in pending:
+                title, username = known.get((peer_type, peer_id), (None, None))
+                if title or username:
+                    updates.append({"id": msg_id, "title": title, "username": username})
+                else:
+                    unresolved.append(msg_id)
+            await backfill_forward_sources(ses, updates)
+            await mark_forwards_attempted(ses, unresolved)
+            await ses.commit()
+            stats["updated"] += len(updates)
+            stats["unresolved"] += len(unresolved)
+    logger.info("forwards:enriched", extra=stats)
+    return stats
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from tg_events.config import get_settings
+from tg_events.db import SessionLocal
+from tg_events.ingest.service import ingest_channels
+from tg_events.models import IngestJob
+from tg_events.repositories.ingest_jobs import (
+    claim_next_job,
+    finish_job,
+    requeue_stale,
+    set_progress,
+)
+
+
+logger = logging.getLogger("tg_events.ingest.jobs")
+
+# set by submitters in this process so the worker does not wait for the next poll
+_wakeup: Optional[asyncio.Event] = None
+
+
+def notify_worker() -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def _parse_dt(value: Optional[str]) -> Optional[datetime]:
+    """ISO date/datetime from job params as UTC-aware (Telegram message dates are aware)."""
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def job_view(job: IngestJob) -> dict[str, Any]:
+    """JSON shape of a job for the status endpoints."""
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "channels": job.channels,
+        "params": job.params,
+        "progress": job.progress or {},
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+async def run_job(job: IngestJob) -> dict[str, str]:
+    """Run one claimed job, persisting per-channel progress every ``ingest_job_heartbeat_s``."""
+    s = get_settings()
+    params = job.params or {}
+    state: dict[str, dict[str, Any]] = {ch: {"status": "queued"} for ch in job.channels}
+    dirty = asyncio.Event()
+
+    def on_progress(ch: str, counters: dict[str, Any]) -> None:
+        state[ch] = {**state.get(ch, {}), **counters}
+        dirty.set()
+
+    async def heartbeat() -> None:
+        # also keeps updated_at fresh so the job is not requeued as stale
+        while True:
+            try:
+                await asyncio.wait_for(dirty.wait(), timeout=float(s.ingest_job_heartbeat_s))
+            except asyncio.TimeoutError:
+                pass
+            dirty.clear()
+            try:
+                async with SessionLocal() as ses:
+                    await set_progress(ses, job.id, state)
+                    await ses.commit()
+            except Exception as e:
+                # keep beating: a dead heartbeat lets requeue_stale hand out a running job
+                logger.warning("jobs:heartbeat_failed", extra={"job_id": job.id, "error": str(e)})
+            await asyncio.sleep(float(s.ingest_job_progress_interval_s))
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        async with SessionLocal() as ses:
+            result = await ingest_channels(
+                ses,
+                job.channels,
+                limit=None if params.get("limit") is None else int(params["limit"]),
+                update_existing_media=bool(params.get("update_existing_media")),
+                full=bool(params.get("full")),
+                date_from=_parse_dt(params.get("date_from")),
+                date_to=_parse_dt(params.get("date_to")),
+                progress=on_progress,
+            )
+    except Exception as e:
+        error: Optional[str] = f"{type(e).__name__}: {e}"
+        result = {}
+    else:
+        error = None
+    finally:
+        # on cancellation (shutdown) the job stays running and is requeued once stale
+        beat.cancel()
+        (beat_result,) = await asyncio.gather(beat, return_exceptions=True)
+        if isinstance(beat_result, Exception):
+            logger.error(
+                "jobs:heartbeat_died", extra={"job_id": job.id, "error": repr(beat_result)}
+            )
+    async with SessionLocal() as ses:
+        await finish_job(ses, job.id, result=result or None, progress=state, error=error)
+        await ses.commit()
+    if error:
+        raise RuntimeError(error)
+    return result
+
+
+async def worker_loop() -> None:
+    """Claim and run queued ingest jobs one at a time until cancelled."""
+    global _wakeup
+    s = get_settings()
+    _wakeup = asyncio.Event()
+    while True:
+        try:
+            async with SessionLocal() as ses:
+                # jobs of a worker that died mid-run (any process) go back to the queue
+                requeued = await requeue_stale(ses, older_than_s=float(s.ingest_job_stale_s))
+                await ses.commit()
+                if requeued:
+                    logger.info("ingest.jobs:requeued", extra={"jobs": requeued})
+                job = await claim_next_job(ses)
+        except Exception:
+            logger.exception("ingest.jobs:claim_failed")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=float(s.ingest_job_poll_s))
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+        logger.info("ingest.jobs:start", extra={"job_id": job.id, "channels": job.channels})
+        try:
+            result = await run_job(job)
+            logger.info("ingest.jobs:done", extra={"job_id": job.id, "result": result})
+        except Exception:
+            logger.exception("ingest.jobs:failed", extra={"job_id": job.id})
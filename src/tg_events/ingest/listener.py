@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import select
+from telethon import events
+
+from tg_events.config import get_settings
+from tg_events.db import SessionLocal
+from tg_events.ingest.forwards import enrich_forwards
+from tg_events.ingest.media import MediaPipeline
+from tg_events.ingest.peers import PeerInfo
+from tg_events.ingest.service import _store_page
+from tg_events.media_store import unlink_media
+from tg_events.models import Channel, MessageRaw
+from tg_events.repositories.messages import delete_messages, update_message_texts
+
+
+logger = logging.getLogger("tg_events.ingest.listener")
+
+
+def _peer_tg_id(peer: Any) -> Optional[int]:
+    """``channel_id``/``user_id`` of a Telethon peer, matching ``Channel.tg_id``."""
+    tg_id = getattr(peer, "channel_id", None) or getattr(peer, "user_id", None)
+    return int(tg_id) if tg_id is not None else None
+
+
+class ChannelListener:
+    """Live ingest from Telegram update handlers for the channels in the ``channels`` table.
+
+    New, edited and deleted messages are buffered and written in micro-batches (every
+    ``listener_batch_size`` updates or ``listener_flush_interval_s`` seconds) through the
+    same normalization as :func:`ingest_channels`: one lookup, one upsert and one commit
+    per channel per flush, media handed to a long-lived :class:`MediaPipeline`.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        batch_size: Optional[int] = None,
+        flush_interval_s: Optional[float] = None,
+    ) -> None:
+        s = get_settings()
+        self.client = client
+        self.batch_size = max(1, int(batch_size or s.listener_batch_size))
+        self.flush_interval_s = float(flush_interval_s or s.listener_flush_interval_s)
+        self.media_root = Path(s.media_root)
+        self.media: MediaPipeline | None = None
+        self._channels: dict[int, Channel] = {}
+        # channel.id -> msg_id -> latest Telegram message
+        self._new: dict[int, dict[int, Any]] = {}
+        self._edited: dict[int, dict[int, Any]] = {}
+        self._deleted: dict[int, set[int]] = {}
+        self._pending = 0
+        self._wakeup = asyncio.Event()
+        self.stats = {"new": 0, "edited": 0, "deleted": 0, "flushes": 0}
+
+    async def refresh_channels(self) -> int:
+        """(Re)load the set of channels to listen to; returns how many there are."""
+        async with SessionLocal() as ses:
+            rows = (await ses.execute(select(Channel).where(Channel.tg_id.isnot(None)))).scalars()
+            self._channels = {int(ch.tg_id): ch for ch in rows.all()}  # type: ignore[arg-type]
+        return len(self._channels)
+
+    def _buffer(self, bucket: dict[int, dict[int, Any]], event: Any) -> None:
+        msg = event.message
+        ch = self._channels.get(_peer_tg_id(msg.peer_id) or 0)
+        if ch is None or msg.id is None or msg.date is None:
+            return
+        bucket.setdefault(ch.id, {})[int(msg.id)] = msg
+        self._bump()
+
+    def _bump(self) -> None:
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._wakeup.set()
+
+    async def _on_new(self, event: Any) -> None:
+        self._buffer(self._new, event)
+
+    async def _on_edit(self, event: Any) -> None:
+        self._buffer(self._edited, event)
+
+    async def _on_delete(self, event: Any) -> None:
+        # only channel deletions carry the peer; private-chat deletes cannot be attributed
+        tg_id = getattr(event.original_update, "channel_id", None)
+        ch = self._channels.get(int(tg_id)) if tg_id is not None else None
+        if ch is None:
+            return
+        self._deleted.setdefault(ch.id, set()).update(int(i) for i in event.deleted_ids)
+        self._bump()
+
+    @staticmethod
+    def _entity(ch: Channel) -> PeerInfo:
+        # only username/id are used (media file naming); no Telegram call needed
+        return PeerInfo("channel", int(ch.tg_id), None, ch.username, ch.title)  # type: ignore[arg-type]
+
+    def _restore(
+        self,
+        new: dict[int, dict[int, Any]],
+        edited: dict[int, dict[int, Any]],
+        deleted: dict[int, set[int]],
+    ) -> None:
+        """Merge a batch that failed to write back into the buffers (newer updates win)."""
+        for batch, bucket in ((new, self._new), (edited, self._edited)):
+            for channel_id, msgs in batch.items():
+                bucket[channel_id] = {**msgs, **bucket.get(channel_id, {})}
+                self._pending += len(msgs)
+        for channel_id, msg_ids in deleted.items():
+            self._deleted.setdefault(channel_id, set()).update(msg_ids)
+            self._pending += len(msg_ids)
+
+    async def flush(self) -> None:
+        """Write everything buffered so far; a batch that fails to write stays buffered."""
+        new, self._new = self._new, {}
+        edited, self._edited = self._edited, {}
+        deleted, self._deleted = self._deleted, {}
+        self._pending = 0
+        if not (new or edited or deleted):
+            return
+        assert self.media is not None
+        try:
+            removed, orphaned = await self._write(new, edited, deleted)
+        except Exception:
+            # incremental ingest never revisits edited or deleted ids: retry them next flush
+            self._restore(new, edited, deleted)
+            raise
+        unlink_media(orphaned)
+        await self.media.flush()
+        self.stats["new"] += sum(len(v) for v in new.values())
+        self.stats["edited"] += sum(len(v) for v in edited.values())
+        self.stats["deleted"] += removed
+        self.stats["flushes"] += 1
+        logger.info("listener:flushed", extra=dict(self.stats))
+
+    async def _write(
+        self,
+        new: dict[int, dict[int, Any]],
+        edited: dict[int, dict[int, Any]],
+        deleted: dict[int, set[int]],
+    ) -> tuple[int, list[str]]:
+        """Store one batch; returns the deleted row count and media paths left orphaned."""
+        assert self.media is not None
+        by_id = {ch.id: ch for ch in self._channels.values()}
+        async with SessionLocal() as ses:
+            for channel_id in set(new) | set(edited):
+                ch = by_id.get(channel_id)
+                if ch is None:
+                    continue
+                entity = self._entity(ch)
+                fresh = new.get(channel_id, {})
+                changed = edited.get(channel_id, {})
+                if fresh:
+                    await _store_page(
+                        ses,
+                        entity,
+                        ch,
+                        list(fresh.values()),
+                        media=self.media,
+                        update_existing_media=False,
+                        # live posts may be above a gap not fetched yet; incremental
+                        # ingest owns the watermark and skips these rows as existing
+                        advance=False,
+                    )
+                if changed:
+                    # edits of messages we never stored are ingested like new ones
+                    await _store_page(
+                        ses,
+                        entity,
+                        ch,
+                        list(changed.values()),
+                        media=self.media,
+                        update_existing_media=True,
+                        advance=False,
+                    )
+                    await update_message_texts(
+                        ses,
+                        [
+                            {"channel_id": channel_id, "msg_id": mid, "text": m.message or None}
+                            for mid, m in changed.items()
+                        ],
+                    )
+                    await ses.commit()
+            orphaned: list[str] = []
+            removed = 0
+            for channel_id, msg_ids in deleted.items():
+                ids = (
+                    await ses.execute(
+                        select(MessageRaw.id).where(
+                            MessageRaw.channel_id == channel_id, MessageRaw.msg_id.in_(msg_ids)
+                        )
+                    )
+                ).scalars().all()
+                count, paths = await delete_messages(ses, ids)
+                removed += count
+                orphaned.extend(paths)
+            if deleted:
+                await ses.commit()
+        return removed, orphaned
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # keep listening; flush() put the failed batch back for the next round
+                logger.exception("listener:flush_failed")
+
+    async def _refresh_loop(self) -> None:
+        interval = float(get_settings().listener_refresh_s)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_channels()
+                ids = [ch.id for ch in self._channels.values()]
+                await enrich_forwards(self.client, channel_ids=ids)
+            except Exception:
+                logger.exception("listener:refresh_failed")
+
+    async def run(self) -> None:
+        """Listen until the client disconnects (or the task is cancelled)."""
+        count = await self.refresh_channels()
+        handlers = [
+            (self._on_new, events.NewMessage()),
+            (self._on_edit, events.MessageEdited()),
+            (self._on_delete, events.MessageDeleted()),
+        ]
+        for cb, ev in handlers:
+            self.client.add_event_handler(cb, ev)
+        logger.info("listener:started", extra={"channels": count})
+        async with MediaPipeline(self.client, self.media_root) as media:
+            self.media = media
+            tasks = [
+                asyncio.create_task(self._flush_loop()),
+                asyncio.create_task(self._refresh_loop()),
+            ]
+            try:
+                await self.client.run_until_disconnected()
+            finally:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for cb, _ in handlers:
+                    self.client.remove_event_handler(cb)
+                await self.flush()
+                self.media = None
@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import bindparam, update
+from telethon.tl.types import DocumentAttributeAnimated
+
+from tg_events.config import get_settings
+from tg_events.db import SessionLocal
+from tg_events.models import MessageRaw
+from tg_events.repositories.media import record_media
+
+
+logger = logging.getLogger("tg_events.ingest.media")
+
+# Pipelines currently running in this process (for the stats readout)
+_active: set["MediaPipeline"] = set()
+
+# failed downloads (FloodWait, timeout, dropped connection) stay pending and are
+# requeued by later ingests; after this many the message is marked skipped
+MAX_FETCH_ATTEMPTS = 5
+
+
+@dataclass
+class MediaJob:
+    """One message whose media has to be downloaded and patched into ``attachments``."""
+
+    channel_id: int
+    msg_id: int
+    message: Any
+    base: str  # path relative to media_root, without extension (see media_store.media_base)
+    kind: str
+    mime: Optional[str]
+    size: Optional[int] = None
+    content_key: Optional[str] = None
+    # failed downloads of this message so far (from its media_pending marker)
+    attempts: int = 0
+
+
+@dataclass
+class PipelineStats:
+    started_at: float = field(default_factory=time.monotonic)
+    submitted: int = 0
+    downloaded: int = 0
+    skipped: int = 0
+    failed: int = 0
+    reused: int = 0
+    bytes: int = 0
+    in_flight: int = 0
+
+
+def classify_media(msg: Any) -> tuple[str, Optional[str]] | None:
+    """Return ``(kind, mime)`` for photos/videos/GIFs we store, ``None`` otherwise."""
+    if getattr(msg, "photo", None) is not None:
+        return "photo", "image/jpeg"
+    doc = getattr(msg, "document", None)
+    mime = getattr(doc, "mime_type", None) if doc is not None else None
+    if not isinstance(mime, str):
+        return None
+    if mime.startswith("image/"):
+        return "photo", mime
+    if mime.startswith("video/"):
+        # detect animated gif-as-video
+        attrs = getattr(doc, "attributes", []) or []
+        is_gif = any(isinstance(a, DocumentAttributeAnimated) for a in attrs)
+        return ("gif" if is_gif else "video"), mime
+    return None
+
+
+def media_size(msg: Any) -> Optional[int]:
+    size = getattr(getattr(msg, "file", None), "size", None)
+    return int(size) if isinstance(size, int) else None
+
+
+def size_cap(kind: str) -> Optional[int]:
+    """Per-kind download cap in bytes from settings (0 disables the cap)."""
+    s = get_settings()
+    mb = {
+        "photo": s.media_max_photo_mb,
+        "video": s.media_max_video_mb,
+        "gif": s.media_max_gif_mb,
+    }.get(kind, 0)
+    return int(mb) * 1024 * 1024 if mb else None
+
+
+def file_checksum(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def has_media(attachments: Any) -> bool:
+    """True when attachments carry finished media (pending markers do not count)."""
+    if not isinstance(attachments, dict):
+        return False
+    return bool(attachments.get("media"))
+
+
+def pending_attachments(job: MediaJob, attempts: int = 0) -> dict:
+    item: dict[str, Any] = {"kind": job.kind, "mime": job.mime}
+    if attempts:
+        item["attempts"] = attempts
+    return {"media_pending": [item]}
+
+
+class MediaPipeline:
+    """Bounded producer/consumer downloader for message media.
+
+    Ingest stores each message right away with a ``media_pending`` marker and submits a
+    :class:`MediaJob`; ``workers`` tasks download in parallel and the results are written
+    back to ``MessageRaw.attachments`` (and the ``media_files`` manifest) in batches
+    through a separate session.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        media_root: Path,
+        *,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        patch_batch: int = 50,
+    ) -> None:
+        s = get_settings()
+        self.client = client
+        self.media_root = media_root
+        self.workers = max(1, int(workers or s.media_download_workers))
+        self.queue: asyncio.Queue[MediaJob | None] = asyncio.Queue(
+            maxsize=max(1, int(queue_size or s.media_queue_size))
+        )
+        self.patch_batch = patch_batch
+        self.stats = PipelineStats()
+        self._patches: list[dict[str, Any]] = []
+        self._manifest: list[dict[str, Any]] = []
+        # content_key -> result of the download that fetched it in this run
+        self._by_key: dict[str, asyncio.Future] = {}
+        self._patch_lock = asyncio.Lock()
+        self._tasks: list[asyncio.Task] = []
+        # (channel_id, msg_id) submitted and not yet written back
+        self._open: set[tuple[int, int]] = set()
+
+    async def __aenter__(self) -> "MediaPipeline":
+        self.stats = PipelineStats()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        _active.add(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                await self.queue.join()
+            for _ in self._tasks:
+                await self.queue.put(None)
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._flush_patches()
+        finally:
+            _active.discard(self)
+            logger.info("media.pipeline:done", extra=self.snapshot())
+
+    async def submit(self, job: MediaJob) -> None:
+        """Enqueue a job; waits when the queue is full (backpressure on ingest)."""
+        self.stats.submitted += 1
+        self._open.add((job.channel_id, job.msg_id))
+        await self.queue.put(job)
+
+    def is_open(self, channel_id: int, msg_id: int) -> bool:
+        """True while a submitted job for this message is not written back yet."""
+        return (channel_id, msg_id) in self._open
+
+    async def flush(self) -> None:
+        """Write finished downloads now instead of waiting for a full patch batch."""
+        await self._flush_patches()
+
+    def snapshot(self) -> dict[str, Any]:
+        st = self.stats
+        elapsed = max(time.monotonic() - st.started_at, 1e-6)
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "in_flight": st.in_flight,
+            "submitted": st.submitted,
+            "downloaded": st.downloaded,
+            "skipped": st.skipped,
+            "failed": st.failed,
+            "reused": st.reused,
+            "bytes": st.bytes,
+            "elapsed_s": round(elapsed, 3),
+            "files_per_s": round(st.downloaded / elapsed, 3),
+            "bytes_per_s": round(st.bytes / elapsed, 1),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                if job is None:
+                    return
+                self.stats.in_flight += 1
+                try:
+                    attachments, manifest = await self._download(job)
+                finally:
+                    self.stats.in_flight -= 1
+                await self._add_patch(job, attachments, manifest)
+            except Exception as e:
+                self._open.discard((job.channel_id, job.msg_id))
+                # keep the worker alive: a dead pool would block submit() and join() forever;
+                # the row keeps its media_pending marker and a later ingest requeues it
+                logger.exception(
+                    "media.pipeline:job_failed",
+                    extra={"channel_id": job.channel_id, "msg_id": job.msg_id, "error": str(e)},
+                )
+            finally:
+                self.queue.task_done()
+
+    def _relative(self, path: Path) -> str:
+        """Path stored in attachments/manifest: relative to ``media_root``."""
+        try:
+            return path.resolve().relative_to(self.media_root.resolve()).as_posix()
+        except ValueError:
+            return path.name
+
+    @staticmethod
+    def _skipped(job: MediaJob, reason: str) -> dict:
+        item = {"kind": job.kind, "mime": job.mime, "size": job.size, "reason": reason}
+        return {"media_skipped": [item]}
+
+    def _failed(self, job: MediaJob) -> dict:
+        """Keep the message pending after a failed download, up to ``MAX_FETCH_ATTEMPTS``."""
+        attempts = job.attempts + 1
+        if attempts >= MAX_FETCH_ATTEMPTS:
+            return self._skipped(job, "error")
+        return pending_attachments(job, attempts)
+
+    async def _download(self, job: MediaJob) -> tuple[dict, dict | None]:
+        """Fetch one file; returns patched attachments and its manifest row (if stored)."""
+        cap = size_cap(job.kind)
+        if cap is not None and job.size is not None and job.size > cap:
+            self.stats.skipped += 1
+            return self._skipped(job, "too_large"), None
+        stored: tuple[str, int | None, str | None] | None = None
+        owner: asyncio.Future | None = None
+        if job.content_key:
+            shared = self._by_key.get(job.content_key)
+            if shared is not None:
+                # same file already downloaded (or downloading) in this run
+                stored = await shared
+                if isinstance(stored, tuple):
+                    self.stats.reused += 1
+            else:
+                owner = asyncio.get_running_loop().create_future()
+                self._by_key[job.content_key] = owner
+        if stored is None:
+            try:
+                stored = await self._fetch(job)
+            finally:
+                if owner is not None and not owner.done():
+                    owner.set_result(stored)
+        if stored is None or stored == "error":
+            return self._failed(job), None
+        if isinstance(stored, str):
+            return self._skipped(job, stored), None
+        rel, size, checksum = stored
+        manifest = {
+            "channel_id": job.channel_id,
+            "msg_id": job.msg_id,
+            "path": rel,
+            "kind": job.kind,
+            "mime": job.mime,
+            "size": size,
+            "checksum": checksum,
+            "content_key": job.content_key,
+        }
+        return {"media": [{"path": rel, "kind": job.kind, "mime": job.mime}]}, manifest
+
+    async def _fetch(self, job: MediaJob) -> Any:
+        """Download to ``job.base``; ``(path, size, checksum)`` or a skip reason string."""
+        target = self.media_root / job.base
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            out = await self.client.download_media(job.message, file=str(target))
+        except Exception as e:
+            self.stats.failed += 1
+            logger.warning(
+                "media.pipeline:download_failed",
+                extra={"channel_id": job.channel_id, "msg_id": job.msg_id, "error": str(e)},
+            )
+            return "error"
+        if not out:
+            self.stats.failed += 1
+            return "empty"
+        path = Path(out)
+        size: int | None = None
+        checksum: str | None = None
+        try:
+            size = path.stat().st_size
+            checksum = await asyncio.to_thread(file_checksum, path)
+        except OSError:
+            pass
+        self.stats.downloaded += 1
+        self.stats.bytes += size or 0
+        return self._relative(path), size, checksum
+
+    async def _add_patch(self, job: MediaJob, attachments: dict, manifest: dict | None) -> None:
+        async with self._patch_lock:
+            self._patches.append({"c_id": job.channel_id, "m_id": job.msg_id, "att": attachments})
+            if manifest is not None:
+                self._manifest.append(manifest)
+            if len(self._patches) < self.patch_batch:
+                return
+        await self._flush_patches()
+
+    async def _flush_patches(self) -> None:
+        async with self._patch_lock:
+            batch, self._patches = self._patches, []
+            manifest, self._manifest = self._manifest, []
+            if not batch:
+                return
+            table = MessageRaw.__table__
+            stmt = (
+                update(table)
+                .where(table.c.channel_id == bindparam("c_id"), table.c.msg_id == bindparam("m_id"))
+                .values(attachments=bindparam("att"))
+            )
+            try:
+                async with SessionLocal() as ses:
+                    # Core executemany: one prepared statement for the whole batch
+                    conn = await ses.connection()
+                    await conn.execute(stmt, batch)
+                    await record_media(conn, manifest)
+                    await ses.commit()
+            finally:
+                # written or not, these rows are no longer in flight (see requeue_pending)
+                self._open.difference_update((p["c_id"], p["m_id"]) for p in batch)
+            logger.info("media.pipeline:patched", extra={"rows": len(batch), **self.snapshot()})
+
+
+def pipeline_stats() -> list[dict[str, Any]]:
+    """Live readout of every running media pipeline."""
+    return [p.snapshot() for p in list(_active)]
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from telethon.errors import FloodWaitError
+from telethon.tl.types import (
+    Channel as TlChannel,
+    ChannelForbidden,
+    InputPeerChannel,
+    InputPeerUser,
+    PeerChannel,
+    PeerUser,
+    User as TlUser,
+)
+from telethon.utils import get_display_name
+
+from tg_events.config import get_settings
+from tg_events.models import Peer
+from tg_events.repositories.peers import get_peer_by_tg_id, get_peer_by_username, upsert_peers
+
+
+logger = logging.getLogger("tg_events.ingest.peers")
+
+
+class PeerUnavailable(Exception):
+    """The target resolved to something we cannot ingest; ``reason`` is the result string."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+@dataclass
+class PeerInfo:
+    """What ingest needs to address a channel/user without asking Telegram again."""
+
+    peer_type: str  # channel | user
+    id: int
+    access_hash: Optional[int]
+    username: Optional[str]
+    title: Optional[str]
+    is_broadcast: bool = False
+
+    def input_peer(self) -> Any:
+        if self.access_hash is None:
+            # only resolvable through the client's in-memory entity cache
+            return PeerChannel(self.id) if self.peer_type == "channel" else PeerUser(self.id)
+        if self.peer_type == "channel":
+            return InputPeerChannel(self.id, self.access_hash)
+        return InputPeerUser(self.id, self.access_hash)
+
+    def row(self) -> dict[str, Any]:
+        return {
+            "peer_type": self.peer_type,
+            "tg_id": self.id,
+            "access_hash": self.access_hash,
+            "username": self.username,
+            "title": self.title,
+            "is_broadcast": self.is_broadcast,
+        }
+
+
+def peer_from_entity(entity: Any) -> Optional[PeerInfo]:
+    """PeerInfo for a Telethon Channel/User; ``None`` for anything else."""
+    if isinstance(entity, TlChannel):
+        return PeerInfo(
+            peer_type="channel",
+            id=int(entity.id),
+            access_hash=getattr(entity, "access_hash", None),
+            username=getattr(entity, "username", None),
+            title=getattr(entity, "title", None),
+            is_broadcast=bool(getattr(entity, "broadcast", False)),
+        )
+    if isinstance(entity, TlUser):
+        return PeerInfo(
+            peer_type="user",
+            id=int(entity.id),
+            access_hash=getattr(entity, "access_hash", None),
+            username=getattr(entity, "username", None),
+            title=get_display_name(entity) or None,
+        )
+    return None
+
+
+def _from_row(peer: Peer) -> PeerInfo:
+    return PeerInfo(
+        peer_type=peer.peer_type,
+        id=int(peer.tg_id),
+        access_hash=int(peer.access_hash) if peer.access_hash is not None else None,
+        username=peer.username,
+        title=peer.title,
+        is_broadcast=bool(peer.is_broadcast),
+    )
+
+
+def _fresh(peer: Peer) -> bool:
+    ttl = timedelta(seconds=float(get_settings().peer_cache_ttl_s))
+    return peer.access_hash is not None and peer.resolved_at >= datetime.now(timezone.utc) - ttl
+
+
+async def _lookup(session: AsyncSession, target: str) -> Optional[Peer]:
+    if target.isdigit():
+        return await get_peer_by_tg_id(session, int(target))
+    return await get_peer_by_username(session, target)
+
+
+async def _fetch(client: Any, target: str) -> Any:
+    if target.isdigit():
+        # first try as channel id, then as user id
+        try:
+            return await client.get_entity(PeerChannel(int(target)))
+        except Exception:
+            return await client.get_entity(PeerUser(int(target)))
+    return await client.get_entity(target)
+
+
+async def resolve_peer(session: AsyncSession, client: Any, target: str) -> PeerInfo:
+    """Resolve ``@username`` or a numeric id, consulting the ``peers`` table first.
+
+    A cached row younger than ``peer_cache_ttl_s`` is used as is (no Telegram call).
+    Stale rows are refreshed; if Telegram answers with FloodWait the stale access hash is
+    used anyway since hashes do not expire for the account that obtained them.
+    Raises :class:`PeerUnavailable` for forbidden/unsupported peers and lets Telethon's
+    not-found errors propagate.
+    """
+    cached = await _lookup(session, target)
+    if cached is not None and _fresh(cached):
+        return _from_row(cached)
+    try:
+        entity = await _fetch(client, target)
+    except FloodWaitError:
+        if cached is not None and cached.access_hash is not None:
+            logger.warning("peers:stale_on_flood", extra={"target": target})
+            return _from_row(cached)
+        raise
+    if isinstance(entity, ChannelForbidden):
+        raise PeerUnavailable("forbidden")
+    info = peer_from_entity(entity)
+    if info is None:
+        raise PeerUnavailable("unsupported_peer")
+    await upsert_peers(session, [info.row()])
+    return info
+
+
+async def remember_entities(session: AsyncSession, entities: list[Any]) -> None:
+    """Store peers Telethon already handed us (e.g. message senders, dialogs) for free."""
+    rows = [info.row() for info in map(peer_from_entity, entities) if info is not None]
+    await upsert_peers(session, [r for r in rows if r["access_hash"] is not None])
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import mimetypes
+import shutil
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterable, Optional
+
+from telethon.sessions import MemorySession
+from telethon.tl.types import (
+    Channel as TlChannel,
+    ChatPhotoEmpty,
+    DocumentAttributeAnimated,
+    MessageFwdHeader,
+    PeerChannel,
+    PeerUser,
+)
+
+
+# Offline stand-in for the Telethon client: replays dump_channel.py JSONL dumps (or
+# synthetic channels) through the same calls ingest makes, so the ingest hot loop can be
+# benchmarked without a Telegram account.
+
+# GetHistory returns at most this many messages per request
+_HISTORY_PAGE = 100
+
+
+def _stable_id(*parts: Any) -> int:
+    digest = hashlib.sha1(":".join(map(str, parts)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:7], "big")
+
+
+@dataclass
+class ReplayChannel:
+    id: int
+    username: Optional[str]
+    title: str
+    messages: list[Any] = field(default_factory=list)  # ascending msg id
+
+    @property
+    def entity(self) -> TlChannel:
+        return TlChannel(
+            id=self.id,
+            title=self.title,
+            photo=ChatPhotoEmpty(),
+            date=None,
+            broadcast=True,
+            access_hash=_stable_id("hash", self.id),
+            username=self.username,
+        )
+
+
+def _media_attrs(
+    channel_id: int,
+    msg_id: int,
+    *,
+    kind: Optional[str],
+    mime: Optional[str],
+    media_id: Optional[str],
+    size: Optional[int],
+    source: Optional[str],
+) -> dict[str, Any]:
+    """photo/document/file attributes as read by classify_media/media_content_key."""
+    if kind is None:
+        return {"photo": None, "document": None, "file": None, "media": None}
+    file_id = _stable_id("media", channel_id, msg_id)
+    if media_id and "-" in media_id and media_id.rsplit("-", 1)[1].isdigit():
+        file_id = int(media_id.rsplit("-", 1)[1])
+    file = SimpleNamespace(size=size, mime_type=mime, source=source)
+    if kind == "photo":
+        photo = SimpleNamespace(id=file_id)
+        return {"photo": photo, "document": None, "file": file, "media": photo}
+    attrs = [DocumentAttributeAnimated()] if kind == "gif" else []
+    doc = SimpleNamespace(id=file_id, mime_type=mime, attributes=attrs)
+    return {"photo": None, "document": doc, "file": file, "media": doc}
+
+
+def replay_message(
+    channel_id: int,
+    msg_id: int,
+    date: datetime,
+    text: str,
+    *,
+    kind: Optional[str] = None,
+    mime: Optional[str] = None,
+    media_id: Optional[str] = None,
+    size: Optional[int] = None,
+    source: Optional[str] = None,
+    fwd_type: Optional[str] = None,
+    fwd_id: Optional[int] = None,
+    fwd_name: Optional[str] = None,
+) -> SimpleNamespace:
+    fwd_from = None
+    if fwd_type or fwd_name:
+        peer = None
+        if fwd_type == "channel" and fwd_id:
+            peer = PeerChannel(int(fwd_id))
+        elif fwd_type == "user" and fwd_id:
+            peer = PeerUser(int(fwd_id))
+        fwd_from = MessageFwdHeader(date=date, from_id=peer, from_name=fwd_name)
+    return SimpleNamespace(
+        id=msg_id,
+        date=date,
+        message=text,
+        peer_id=PeerChannel(channel_id),
+        fwd_from=fwd_from,
+        forward=None,
+        **_media_attrs(
+            channel_id, msg_id, kind=kind, mime=mime, media_id=media_id, size=size, source=source
+        ),
+    )
+
+
+def _post_kind(post: dict[str, Any]) -> tuple[Optional[str], Optional[str]]:
+    """(kind, mime) of a dumped post, guessing from the file for older dumps."""
+    media_kind = post.get("media_kind")
+    paths = post.get("media_paths") or []
+    mime = post.get("media_mime") or (mimetypes.guess_type(paths[0])[0] if paths else None)
+    if media_kind == "MessageMediaPhoto":
+        return "photo", mime or "image/jpeg"
+    if media_kind == "MessageMediaDocument" and isinstance(mime, str):
+        if mime.startswith("image/"):
+            return "photo", mime
+        if mime.startswith("video/"):
+            return "video", mime
+    return None, None
+
+
+class ReplayClient:
+    """Answers ``get_entity``/``iter_messages``/``download_media`` from recorded channels.
+
+    ``latency_s`` is slept per history page and per download to approximate network
+    round trips; ``stats`` counts what a live client would have requested.
+    """
+
+    def __init__(self, channels: Iterable[ReplayChannel], *, latency_s: float = 0.0) -> None:
+        self.channels = {c.id: c for c in channels}
+        self.latency_s = float(latency_s)
+        self.session = MemorySession()
+        self.stats = {"history_requests": 0, "entity_requests": 0, "downloads": 0, "bytes": 0}
+
+    @classmethod
+    def from_jsonl(cls, paths: Iterable[Path], *, latency_s: float = 0.0) -> "ReplayClient":
+        """One channel per ``dump_channel.py --jsonl`` file."""
+        channels: dict[int, ReplayChannel] = {}
+        for path in paths:
+            with Path(path).open(encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    post = json.loads(line)
+                    cid = int(post.get("channel_id") or _stable_id("chan", path))
+                    ch = channels.setdefault(
+                        cid,
+                        ReplayChannel(
+                            id=cid,
+                            username=post.get("username"),
+                            title=post.get("channel_title") or str(cid),
+                        ),
+                    )
+                    kind, mime = _post_kind(post)
+                    paths_ = post.get("media_paths") or []
+                    date = datetime.fromisoformat(post["date"])
+                    if date.tzinfo is None:
+                        date = date.replace(tzinfo=timezone.utc)
+                    ch.messages.append(
+                        replay_message(
+                            cid,
+                            int(post["id"]),
+                            date,
+                            post.get("text") or "",
+                            kind=kind,
+                            mime=mime,
+                            media_id=post.get("media_id"),
+                            size=post.get("media_size"),
+                            source=paths_[0] if paths_ else None,
+                            fwd_type=post.get("fwd_from_type"),
+                            fwd_id=post.get("fwd_from_id"),
+                            fwd_name=post.get("fwd_from_name"),
+                        )
+                    )
+        for ch in channels.values():
+            ch.messages.sort(key=lambda m: m.id)
+        return cls(channels.values(), latency_s=latency_s)
+
+    @classmethod
+    def synthetic(
+        cls,
+        *,
+        channels: int,
+        messages: int,
+        media_ratio: float = 0.3,
+        media_bytes: int = 64 * 1024,
+        forward_ratio: float = 0.1,
+        latency_s: float = 0.0,
+        prefix: str = "bench",
+    ) -> "ReplayClient":
+        """``channels`` generated channels with ``messages`` posts each."""
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        out = []
+        for c in range(channels):
+            cid = _stable_id(prefix, c) % 10**12
+            ch = ReplayChannel(id=cid, username=f"{prefix}_{c}", title=f"{prefix} {c}")
+            for i in range(1, messages + 1):
+                # deterministic spread of media/forwards over the history
+                roll = (_stable_id(cid, i) % 1000) / 1000.0
+                with_media = roll < media_ratio
+                fwd = roll > 1.0 - forward_ratio
+                ch.messages.append(
+                    replay_message(
+                        cid,
+                        i,
+                        start + timedelta(minutes=i),
+                        f"{prefix} post {i} of channel {c} " + "lorem ipsum " * (i % 20),
+                        kind="photo" if with_media else None,
+                        mime="image/jpeg" if with_media else None,
+                        size=media_bytes if with_media else None,
+                        fwd_type="channel" if fwd else None,
+                        fwd_id=(_stable_id("src", i % 50) % 10**12) if fwd else None,
+                    )
+                )
+            out.append(ch)
+        return cls(out, latency_s=latency_s)
+
+    # --- the subset of TelegramClient used by ingest ---
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    def _channel(self, target: Any) -> ReplayChannel:
+        cid = getattr(target, "channel_id", None)
+        if isinstance(target, TlChannel):
+            cid = target.id
+        if cid is None and isinstance(target, (int, str)) and str(target).isdigit():
+            cid = int(target)
+        if cid is not None and int(cid) in self.channels:
+            return self.channels[int(cid)]
+        if isinstance(target, str):
+            name = target.lstrip("@").lower()
+            for ch in self.channels.values():
+                if (ch.username or "").lower() == name:
+                    return ch
+        raise ValueError(f"Cannot find any entity corresponding to {target!r}")
+
+    async def get_entity(self, target: Any) -> Any:
+        self.stats["entity_requests"] += 1
+        return self._channel(target).entity
+
+    async def iter_messages(
+        self,
+        entity: Any,
+        limit: Optional[int] = None,
+        *,
+        min_id: int = 0,
+        offset_id: int = 0,
+        offset_date: Optional[datetime] = None,
+        reverse: bool = False,
+        **_: Any,
+    ) -> AsyncIterator[Any]:
+        msgs = self._channel(entity).messages
+        if reverse:
+            lo = max(min_id, offset_id)
+            selected = [m for m in msgs if m.id > lo]
+        else:
+            selected = [
+                m
+                for m in reversed(msgs)
+                if m.id > min_id
+                and (not offset_id or m.id < offset_id)
+                and (offset_date is None or m.date < offset_date)
+            ]
+        if limit is not None:
+            selected = selected[:limit]
+        for i, msg in enumerate(selected):
+            if i % _HISTORY_PAGE == 0:
+                self.stats["history_requests"] += 1
+                if self.latency_s:
+                    await asyncio.sleep(self.latency_s)
+            yield msg
+
+    async def get_messages(self, entity: Any, ids: Iterable[int]) -> list[Any]:
+        self.stats["history_requests"] += 1
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        by_id = {m.id: m for m in self._channel(entity).messages}
+        return [by_id.get(int(i)) for i in ids]
+
+    async def download_media(self, message: Any, file: Optional[str] = None) -> Optional[str]:
+        info = getattr(message, "file", None)
+        if info is None or file is None:
+            return None
+        ext = ".jpg"
+        if getattr(message, "photo", None) is None:
+            ext = mimetypes.guess_extension(info.mime_type or "") or ".bin"
+        target = Path(file + ext)
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        source = Path(info.source) if info.source else None
+        if source is not None and source.is_file():
+            await asyncio.to_thread(shutil.copyfile, source, target)
+        else:
+            await asyncio.to_thread(target.write_bytes, b"\0" * int(info.size or 0))
+        self.stats["downloads"] += 1
+        self.stats["bytes"] += target.stat().st_size
+        return str(target)
+
+    async def __call__(self, request: Any) -> Any:
+        # batched peer lookups (forward enrichment): nothing is known offline
+        if type(request).__name__ == "GetUsersRequest":
+            return []
+        return SimpleNamespace(chats=[], users=[])
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import select
+from telethon.errors import FloodWaitError
+
+from tg_events.config import get_settings
+from tg_events.db import SessionLocal
+from tg_events.ingest.service import ingest_channels
+from tg_events.ingest.telethon_client import get_limiter
+from tg_events.models import Channel
+from tg_events.repositories.channels import due_channels, next_due_at, set_schedule
+
+
+logger = logging.getLogger("tg_events.ingest.scheduler")
+
+# weight of the latest observation in the posting-rate average
+_RATE_ALPHA = 0.3
+
+
+def poll_interval_s(post_rate: Optional[float]) -> float:
+    """Seconds until the next poll: aim for ~``scheduler_target_batch`` new posts per poll."""
+    s = get_settings()
+    lo, hi = float(s.scheduler_min_interval_s), float(s.scheduler_max_interval_s)
+    if not post_rate or post_rate <= 0:
+        return hi
+    return min(hi, max(lo, float(s.scheduler_target_batch) / post_rate * 3600.0))
+
+
+def _ewma(previous: Optional[float], observed: float) -> float:
+    if previous is None:
+        return observed
+    return _RATE_ALPHA * observed + (1 - _RATE_ALPHA) * previous
+
+
+class IngestScheduler:
+    """Continuously ingest every channel of the ``channels`` table.
+
+    Up to ``concurrency`` channels are polled at once. Each due channel gets one bounded
+    slice (``scheduler_slice_limit`` messages above its watermark) at a time, so a channel
+    with a large backlog is interleaved with the rest instead of monopolizing a client; it
+    is simply due again right away and goes to the back of the queue. Quiet channels are
+    polled less often: the interval follows the observed posting rate. Requests are paced
+    by the shared :class:`TelegramLimiter`, and a FloodWait pauses all channels; the
+    affected channel is rescheduled after it.
+    State lives on the channel row (``polling_status``, ``next_poll_at``, ``post_rate``,
+    ``ingest_rate``).
+    """
+
+    def __init__(self, *, concurrency: Optional[int] = None, slice_limit: Optional[int] = None):
+        s = get_settings()
+        self.concurrency = max(1, int(concurrency or s.ingest_concurrency))
+        self.slice_limit = max(1, int(slice_limit or s.scheduler_slice_limit))
+        self.polls = 0
+        self.messages = 0
+        # channel ids being polled right now
+        self._active: set[int] = set()
+
+    async def _poll(self, ch: Channel) -> None:
+        target = ch.username or str(ch.tg_id)
+        now = datetime.now(timezone.utc)
+        started = time.monotonic()
+        values: dict[str, Any] = {"last_polled_at": now}
+        try:
+            async with SessionLocal() as ses:
+                results = await ingest_channels(ses, [target], limit=self.slice_limit)
+            result = results.get(target, "error")
+        except FloodWaitError as e:
+            values.update(
+                polling_status="flood_wait", next_poll_at=now + timedelta(seconds=e.seconds)
+            )
+            result = "flood_wait"
+        except Exception as e:
+            logger.warning("scheduler:poll_failed", extra={"channel": target, "error": str(e)})
+            values.update(
+                polling_status="error",
+                next_poll_at=now + timedelta(seconds=poll_interval_s(None)),
+            )
+            result = "error"
+        if result.startswith("ok:"):
+            stored = int(result.split(":", 1)[1])
+            elapsed = max(time.monotonic() - started, 1e-6)
+            backlog = stored >= self.slice_limit
+            post_rate = ch.post_rate
+            # backlog slices are re-polled at once and count catch-up, not posting frequency
+            catching_up = backlog or ch.polling_status == "backlog"
+            if ch.last_polled_at is not None and not catching_up:
+                hours = max((now - ch.last_polled_at).total_seconds() / 3600.0, 1e-6)
+                post_rate = _ewma(ch.post_rate, stored / hours)
+            delay = 0.0 if backlog else poll_interval_s(post_rate)
+            values.update(
+                polling_status="backlog" if backlog else "ok",
+                next_poll_at=now + timedelta(seconds=delay),
+                post_rate=post_rate,
+                ingest_rate=round(stored / elapsed, 3),
+            )
+            self.messages += stored
+        elif result not in ("flood_wait", "error"):
+            # not_found / forbidden / unsupported_peer: retry rarely
+            values.update(
+                polling_status=result[:32],
+                next_poll_at=now + timedelta(seconds=poll_interval_s(None)),
+            )
+        async with SessionLocal() as ses:
+            await set_schedule(ses, ch.id, **values)
+            await ses.commit()
+        self.polls += 1
+
+    def _start(self, ch: Channel, running: set[asyncio.Task]) -> None:
+        self._active.add(ch.id)
+        task = asyncio.create_task(self._poll(ch))
+        task.add_done_callback(lambda t, channel_id=ch.id: self._finished(t, channel_id))
+        running.add(task)
+
+    def _finished(self, task: asyncio.Task, channel_id: int) -> None:
+        self._active.discard(channel_id)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "scheduler:poll_crashed",
+                exc_info=task.exception(),
+                extra={"channel_id": channel_id},
+            )
+
+    async def run_once(self) -> int:
+        """Poll every channel due now, ``concurrency`` at a time; returns how many."""
+        async with SessionLocal() as ses:
+            due = await due_channels(ses)
+        pending = iter(due)
+        running: set[asyncio.Task] = set()
+        while True:
+            for ch in pending:
+                self._start(ch, running)
+                if len(running) >= self.concurrency:
+                    break
+            if not running:
+                return len(due)
+            _, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+    async def run(self) -> None:
+        """Poll forever with ``concurrency`` workers; a free worker takes the next due channel.
+
+        A slow channel only holds its own worker. When nothing is due, the idle workers
+        sleep until the next channel is (or a running poll ends).
+        """
+        s = get_settings()
+        running: set[asyncio.Task] = set()
+        try:
+            while True:
+                free = self.concurrency - len(running)
+                if free > 0:
+                    try:
+                        async with SessionLocal() as ses:
+                            due = await due_channels(ses, limit=free, exclude=self._active)
+                            nxt = None if due else await next_due_at(ses, exclude=self._active)
+                    except Exception:
+                        logger.exception("scheduler:tick_failed")
+                        due, nxt = [], None
+                    for ch in due:
+                        self._start(ch, running)
+                    if due:
+                        continue
+                    wait = float(s.scheduler_idle_s)
+                    if nxt is not None:
+                        until = (nxt - datetime.now(timezone.utc)).total_seconds()
+                        wait = min(wait, max(0.0, until))
+                    wait = max(wait, get_limiter().paused_for, 0.5)
+                else:
+                    wait = None
+                if running:
+                    _, running = await asyncio.wait(
+                        running, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+                    )
+                else:
+                    await asyncio.sleep(wait)
+        finally:
+            for task in running:
+                task.cancel()
+
+
+async def schedule_view() -> dict[str, Any]:
+    """Per-channel schedule and achieved rates plus the Telegram limiter state."""
+    async with SessionLocal() as ses:
+        rows = (
+            await ses.execute(
+                select(Channel)
+                .where(Channel.tg_id.isnot(None))
+                .order_by(Channel.next_poll_at.asc().nulls_first())
+            )
+        ).scalars().all()
+    channels = [
+        {
+            "id": ch.id,
+            "tg_id": ch.tg_id,
+            "username": ch.username,
+            "title": ch.title,
+            "polling_status": ch.polling_status,
+            "next_poll_at": ch.next_poll_at.isoformat() if ch.next_poll_at else None,
+            "last_polled_at": ch.last_polled_at.isoformat() if ch.last_polled_at else None,
+            "post_rate_per_h": round(ch.post_rate, 3) if ch.post_rate is not None else None,
+            "msgs_per_s": ch.ingest_rate,
+        }
+        for ch in rows
+    ]
+    return {"limiter": get_limiter().stats(), "channels": channels}
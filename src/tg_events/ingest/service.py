@@ -1,266 +1,527 @@
 from __future__ import annotations
 
-from typing import Iterable, Optional
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Iterable, Optional
 
-from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
-from telethon.errors import ChannelInvalidError, UsernameInvalidError
-from telethon.tl.types import (
-    Channel as TlChannel,
-    ChannelForbidden,
-    PeerChannel,
-    PeerUser,
-    User as TlUser,
-    DocumentAttributeAnimated,
-)
-from telethon.utils import get_display_name
+from telethon.errors import ChannelInvalidError, ChannelPrivateError, UsernameInvalidError
 
 from pathlib import Path
 from tg_events.ingest.telethon_client import build_client, open_client
 from tg_events.config import get_settings
+from tg_events.db import SessionLocal
+from tg_events.ingest.forwards import enrich_forwards
+from tg_events.ingest.peers import PeerInfo, PeerUnavailable, remember_entities, resolve_peer
+from tg_events.ingest.media import (
+    MediaJob,
+    MediaPipeline,
+    classify_media,
+    has_media,
+    media_size,
+    pending_attachments,
+)
+from tg_events.media_store import channel_key, content_base, media_base, media_content_key
 from tg_events.models import MessageRaw
 from tg_events.models import Channel
-from tg_events.repositories.channels import upsert_channel
-from tg_events.repositories.messages import create_message, get_message
+from tg_events.repositories.checkpoints import clear_checkpoint, get_checkpoint, save_checkpoint
+from tg_events.repositories.channels import advance_watermark, upsert_channel
+from tg_events.repositories.media import get_media_by_content_keys, get_media_manifest, record_media
+from tg_events.repositories.messages import (
+    get_messages_by_msg_ids,
+    clear_pending_media,
+    list_pending_media,
+    upsert_messages,
+)
+from tg_events.repositories.peers import forget_peer
+
+
+logger = logging.getLogger("tg_events.ingest.service")
+
+# called as progress(channel, counters) after every stored page and when a channel ends
+ProgressCallback = Callable[[str, dict[str, Any]], None]
+
+
+def backfill_scope(date_from: Optional[datetime], date_to: Optional[datetime]) -> str:
+    """Checkpoint scope of a date-bounded backfill."""
+    bounds = [d.isoformat() if d is not None else "" for d in (date_from, date_to)]
+    return "backfill:" + ":".join(bounds)
+
+
+def _plan_media(
+    entity: Any,
+    channel_id: int,
+    msg: Any,
+    *,
+    known: list[dict] | None,
+    shared: dict | None,
+    media_root: Path,
+) -> tuple[dict | None, MediaJob | None, dict | None]:
+    """Decide how a message's media gets into ``attachments``.
+
+    Returns the attachments to store now, a download job when the file is not stored
+    yet, and a manifest row when an already stored file (same Telegram file id, e.g. a
+    forward) is referenced instead of downloaded again.
+    """
+    classified = classify_media(msg)
+    if classified is None:
+        return None, None, None
+    kind, mime = classified
+    if known:
+        return {"media": known}, None, None
+    content_key = media_content_key(msg) if get_settings().media_dedupe else None
+    if shared and (media_root / shared["path"]).is_file():
+        ref = {**shared, "channel_id": channel_id, "msg_id": int(msg.id)}
+        ref["content_key"] = content_key
+        item = {"path": shared["path"], "kind": shared["kind"], "mime": shared["mime"]}
+        return {"media": [item]}, None, ref
+    if content_key:
+        base = content_base(content_key)
+    else:
+        key = channel_key(getattr(entity, "username", None), getattr(entity, "id", None))
+        base = media_base(key, msg.id)
+    job = MediaJob(
+        channel_id=channel_id,
+        msg_id=int(msg.id),
+        message=msg,
+        base=base,
+        kind=kind,
+        mime=mime,
+        size=media_size(msg),
+        content_key=content_key,
+    )
+    return pending_attachments(job), job, None
+
+
+def _forward_features(msg: Any) -> dict | None:
+    """Build ``features.forward`` for a forwarded message from its header only.
+
+    The source's title/username are not resolved here: ``from_peer_id``/``from_type`` are
+    stored as is and :func:`tg_events.ingest.forwards.enrich_forwards` fills in the rest
+    later, in batches, from the ``peers`` cache.
+    """
+    fwd = getattr(msg, "fwd_from", None)
+    if fwd is None:
+        return None
+    f_from_name = getattr(fwd, "from_name", None)
+    f_from = getattr(fwd, "from_id", None)
+    f_username: str | None = None
+    f_type: str | None = None
+    f_peer_id: int | None = None
+    if f_from is not None:
+        # PeerChannel / PeerUser
+        f_peer_id = getattr(f_from, "channel_id", None) or getattr(f_from, "user_id", None)
+        if getattr(f_from, "channel_id", None) is not None:
+            f_type = "channel"
+        elif getattr(f_from, "user_id", None) is not None:
+            f_type = "user"
+    # Heuristic: hidden forward without from_id but with name like '@user'
+    if f_type is None and isinstance(f_from_name, str) and f_from_name.startswith("@"):
+        f_type = "user"
+        f_username = f_from_name.lstrip("@")
+    # Telethon не всегда даёт username в fwd header; оставим только name/id/type
+    return {
+        "forward": {
+            "from_name": f_from_name,
+            "from_title": None,
+            "from_username": f_username,
+            "from_type": f_type,
+            "from_peer_id": f_peer_id,
+        }
+    }
+
+
+def _forward_entities(page: list[Any]) -> list[Any]:
+    """Forward sources Telethon already received along with the page (no extra calls)."""
+    out = []
+    for m in page:
+        fwd = getattr(m, "forward", None)
+        if fwd is None:
+            continue
+        entity = getattr(fwd, "chat", None) or getattr(fwd, "sender", None)
+        if entity is not None:
+            out.append(entity)
+    return out
+
+
+def _existing_updates(
+    exists: MessageRaw, attachments: dict | None, features: dict | None
+) -> dict[str, object]:
+    """Decide which fields of an already stored message should be refreshed."""
+    update_values: dict[str, object] = {}
+    if attachments and not has_media(exists.attachments):
+        update_values["attachments"] = attachments
+    if features:
+        # update forward info if absent or can be enriched with title/username
+        existing_features = exists.features or {}
+        ef = existing_features.get("forward") if isinstance(existing_features, dict) else None
+        nf = features.get("forward")
+        should_update_forward = False
+        if not ef:
+            should_update_forward = True
+        else:
+            # enrich when missing title/username
+            missing_title = not bool(ef.get("from_title"))
+            missing_username = not bool(ef.get("from_username"))
+            have_new_title = bool(nf and nf.get("from_title"))
+            have_new_username = bool(nf and nf.get("from_username"))
+            if (missing_title and have_new_title) or (missing_username and have_new_username):
+                should_update_forward = True
+                # merge existing with new
+                merged = dict(ef)
+                merged.update({k: v for k, v in (nf or {}).items() if v is not None})
+                features = dict(existing_features)
+                features["forward"] = merged
+        if should_update_forward:
+            update_values["features"] = features
+    return update_values
+
+
+async def _store_page(
+    session: AsyncSession,
+    entity: Any,
+    db_channel: Channel,
+    page: list[Any],
+    *,
+    media: MediaPipeline,
+    update_existing_media: bool,
+    advance: bool = True,
+) -> int:
+    """Normalize a page of Telegram messages and write it with one lookup and one upsert.
+
+    Media is not downloaded here: rows are stored with a ``media_pending`` marker and the
+    downloads are handed to ``media`` once the page is committed. ``advance=False`` leaves
+    the channel watermark alone, for pages that may sit above not yet fetched history.
+    """
+    msg_ids = [m.id for m in page]
+    existing = await get_messages_by_msg_ids(session, channel_id=db_channel.id, msg_ids=msg_ids)
+    manifest = await get_media_manifest(session, channel_id=db_channel.id, msg_ids=msg_ids)
+    shared_files: dict[str, dict[str, Any]] = {}
+    if get_settings().media_dedupe:
+        shared_files = await get_media_by_content_keys(
+            session, [media_content_key(m) or "" for m in page if m.id not in manifest]
+        )
+    rows: list[dict[str, Any]] = []
+    jobs: list[MediaJob] = []
+    refs: list[dict[str, Any]] = []
+    for msg in page:
+        exists = existing.get(msg.id)
+        if exists is not None and not update_existing_media:
+            # skip already stored message
+            continue
+        attachments, job, ref = _plan_media(
+            entity,
+            db_channel.id,
+            msg,
+            known=manifest.get(msg.id),
+            shared=shared_files.get(media_content_key(msg) or ""),
+            media_root=media.media_root,
+        )
+        features = _forward_features(msg)
+        if exists is not None:
+            update_values = _existing_updates(exists, attachments, features)
+            if "attachments" not in update_values:
+                job, ref = None, None
+            if not update_values:
+                continue
+            attachments = update_values.get("attachments", exists.attachments)  # type: ignore[assignment]
+            features = update_values.get("features", exists.features)  # type: ignore[assignment]
+        if job is not None:
+            jobs.append(job)
+        if ref is not None:
+            refs.append(ref)
+        rows.append(
+            {
+                "channel_id": db_channel.id,
+                "msg_id": msg.id,
+                "date": msg.date,
+                "text": msg.message or None,
+                "attachments": attachments,
+                "features": features,
+            }
+        )
+    await upsert_messages(session, rows)
+    await record_media(session, refs)
+    await remember_entities(session, _forward_entities(page))
+    if advance:
+        # every message of the page is stored now (new or pre-existing)
+        await advance_watermark(session, db_channel.id, max(int(m.id) for m in page))
+    await session.commit()
+    for job in jobs:
+        await media.submit(job)
+    return len(rows)
+
+
+async def _requeue_pending_media(
+    session: AsyncSession,
+    client: Any,
+    entity: PeerInfo,
+    db_channel: Channel,
+    media: MediaPipeline,
+    *,
+    limit: int,
+) -> int:
+    """Resubmit downloads left ``media_pending`` by an earlier run that crashed, failed to
+    write back or failed to download (up to ``limit`` per call, oldest first)."""
+    pending = {
+        m: attempts
+        for m, attempts in await list_pending_media(
+            session, channel_id=db_channel.id, limit=limit
+        )
+        if not media.is_open(db_channel.id, m)
+    }
+    if not pending:
+        return 0
+    msg_ids = list(pending)
+    resubmitted = 0
+    gone: list[int] = []
+    for msg_id, msg in zip(msg_ids, await client.get_messages(entity.input_peer(), ids=msg_ids)):
+        if msg is None:
+            gone.append(msg_id)
+            continue
+        _, job, _ = _plan_media(
+            entity,
+            db_channel.id,
+            msg,
+            known=None,
+            shared=None,
+            media_root=media.media_root,
+        )
+        if job is None:
+            gone.append(msg_id)
+            continue
+        job.attempts = pending[msg_id]
+        await media.submit(job)
+        resubmitted += 1
+    if gone:
+        # deleted on Telegram (or no longer carrying media): nothing left to download
+        await clear_pending_media(session, channel_id=db_channel.id, msg_ids=gone)
+        await session.commit()
+    logger.info(
+        "ingest:media_requeued",
+        extra={"channel_id": db_channel.id, "pending": len(msg_ids), "resubmitted": resubmitted},
+    )
+    return resubmitted
+
+
+async def _ingest_one(
+    session: AsyncSession,
+    client: Any,
+    media: MediaPipeline,
+    ch: str,
+    *,
+    limit: Optional[int],
+    update_existing_media: bool,
+    page_size: int,
+    full: bool,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> str:
+    """Ingest a single channel/user; returns the per-channel result string."""
+    try:
+        entity: PeerInfo = await resolve_peer(session, client, ch)
+    except (UsernameInvalidError, ChannelInvalidError, ValueError):
+        return "not_found"
+    except PeerUnavailable as e:
+        return e.reason
+
+    db_channel: Channel = await upsert_channel(
+        session,
+        tg_id=entity.id,
+        username=entity.username,
+        title=entity.title if entity.peer_type == "channel" else None,
+        is_private=not entity.is_broadcast,
+    )
+    await session.commit()
+
+    processed = 0
+    scanned = 0
+    started = time.monotonic()
+    downloaded_before = media.stats.downloaded
+
+    async def store(batch: list[Any]) -> None:
+        nonlocal processed
+        if walk:
+            # committed by _store_page together with the rows it points past
+            await save_checkpoint(
+                session,
+                channel_id=db_channel.id,
+                scope=scope,
+                offset_id=min(int(m.id) for m in batch),
+                scanned=resumed + scanned,
+            )
+        processed += await _store_page(
+            session,
+            entity,
+            db_channel,
+            batch,
+            media=media,
+            update_existing_media=update_existing_media,
+        )
+        if progress is not None:
+            elapsed = max(time.monotonic() - started, 1e-6)
+            progress(
+                ch,
+                {
+                    "status": "running",
+                    "scanned": scanned,
+                    "stored": processed,
+                    "media_downloaded": media.stats.downloaded - downloaded_before,
+                    "elapsed_s": round(elapsed, 3),
+                    "msgs_per_s": round(scanned / elapsed, 2),
+                },
+            )
+
+    page: list[Any] = []
+    backfill = date_from is not None or date_to is not None
+    scope = backfill_scope(date_from, date_to) if backfill else "history"
+    checkpoint = await get_checkpoint(session, channel_id=db_channel.id, scope=scope)
+    watermark = db_channel.last_message_id
+    # newest-first walks are checkpointed; an unfinished one is resumed before anything else
+    walk = backfill or full or not watermark or checkpoint is not None
+    if walk:
+        offset_id = checkpoint.offset_id if checkpoint is not None else 0
+        resumed = checkpoint.scanned if checkpoint is not None else 0
+        remaining = None if limit is None else max(0, limit - resumed)
+        if checkpoint is not None:
+            logger.info(
+                "ingest:resume",
+                extra={"channel": ch, "scope": scope, "offset_id": offset_id, "scanned": resumed},
+            )
+        history = client.iter_messages(
+            entity.input_peer(),
+            limit=remaining,
+            offset_id=offset_id,
+            offset_date=date_to if checkpoint is None else None,
+        )
+    else:
+        # catch up from the watermark oldest first, so a capped run leaves no gap
+        history = client.iter_messages(
+            entity.input_peer(), limit=limit, min_id=int(watermark), reverse=True
+        )
+    finished = True
+    try:
+        async for msg in history:
+            if msg.id is None or msg.date is None:
+                continue
+            if date_from is not None and msg.date < date_from:
+                break
+            scanned += 1
+            page.append(msg)
+            if len(page) >= page_size:
+                await store(page)
+                page = []
+    except (ChannelInvalidError, ChannelPrivateError):
+        # cached access hash no longer valid (or access lost): resolve again next run
+        await forget_peer(session, peer_type=entity.peer_type, tg_id=entity.id)
+        await session.commit()
+        if scanned == 0:
+            return "forbidden"
+        finished = False
+    if page:
+        await store(page)
+    if walk and finished:
+        await clear_checkpoint(session, channel_id=db_channel.id, scope=scope)
+        await session.commit()
+    await _requeue_pending_media(session, client, entity, db_channel, media, limit=page_size)
+    if get_settings().forward_enrich_on_ingest:
+        await enrich_forwards(client, channel_ids=[db_channel.id])
+    return f"ok:{processed}"
+
+
+async def _ensure_authorized(client: Any) -> None:
+    if not await client.is_user_authorized():
+        raise RuntimeError("Telegram session not authorized. Run tg_events.scripts.tg_auth first.")
 
 
 async def ingest_channels(
     session: AsyncSession,
     channels: Iterable[str],
     *,
-    limit: int = 1000,
+    limit: Optional[int] = 1000,
     update_existing_media: bool = False,
+    page_size: Optional[int] = None,
+    full: bool = False,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    concurrency: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    client: Any = None,
 ) -> dict[str, str]:
-    """Fetch recent history for provided channels/usernames and store messages."""
-    async with open_client() as client:
-        if not await client.is_user_authorized():
-            raise RuntimeError("Telegram session not authorized. Run tg_events.scripts.tg_auth first.")
+    """Fetch recent history for provided channels/usernames and store messages.
 
-        results: dict[str, str] = {}
-        forward_cache: dict[tuple[str, int], dict[str, str | int | None]] = {}
-        for ch in channels:
-            key = ch
-            try:
-                target = ch
-                if isinstance(ch, str) and ch.isdigit():
-                    # first try as channel id, then as user id
-                    try:
-                        target = PeerChannel(int(ch))
-                        entity = await client.get_entity(target)
-                    except Exception:
-                        target = PeerUser(int(ch))
-                        entity = await client.get_entity(target)
-                else:
-                    entity = await client.get_entity(target)
-            except (UsernameInvalidError, ChannelInvalidError):
-                results[key] = "not_found"
-                continue
-            if isinstance(entity, ChannelForbidden):
-                results[key] = "forbidden"
-                continue
-            # accept channels and users (private chats)
-            if not isinstance(entity, (TlChannel, TlUser)):
-                results[key] = "unsupported_peer"
-                continue
+    Messages are buffered in pages of ``page_size`` (``INGEST_PAGE_SIZE`` by default);
+    each page costs one existence lookup, one upsert and one commit. Media downloads run
+    concurrently in a :class:`MediaPipeline` and are awaited before returning.
 
-            db_channel: Channel = await upsert_channel(
-                session,
-                tg_id=entity.id,
-                username=getattr(entity, "username", None),
-                title=getattr(entity, "title", None),
-                is_private=bool(getattr(entity, "broadcast", False) is False),
-            )
-            await session.commit()
-
-            processed = 0
-            s = get_settings()
-            media_root = Path(s.media_root)
-            media_root.mkdir(parents=True, exist_ok=True)
-            # helper: find already downloaded media for this message prefix to avoid duplicates
-            def existing_media_items(prefix: str) -> list[dict]:
-                found: list[dict] = []
-                for p in sorted(media_root.glob(f"{prefix}*")):
-                    if not p.is_file():
-                        continue
-                    ext = p.suffix.lower()
-                    if ext in {".jpg", ".jpeg", ".png", ".webp", ".gif"}:
-                        kind = "photo" if ext != ".gif" else "gif"
-                        if ext in {".jpg", ".jpeg"}:
-                            mime = "image/jpeg"
-                        elif ext == ".png":
-                            mime = "image/png"
-                        elif ext == ".webp":
-                            mime = "image/webp"
-                        elif ext == ".gif":
-                            mime = "image/gif"
-                        else:
-                            mime = None
-                    elif ext in {".mp4", ".mov", ".webm"}:
-                        kind = "video"
-                        mime = "video/mp4" if ext == ".mp4" else ("video/webm" if ext == ".webm" else None)
-                    else:
-                        kind = "file"
-                        mime = None
-                    found.append({"path": p.name, "kind": kind, "mime": mime})
-                return found
-            # fetch newest first
-            async for msg in client.iter_messages(entity, limit=limit):
-                if msg.id is None or msg.date is None:
-                    continue
-                exists = await get_message(session, channel_id=db_channel.id, msg_id=msg.id)
-                attachments: dict | None = None
-                features: dict | None = None
-                media_items: list[dict] = []
-                # Images
-                if getattr(msg, "photo", None) is not None:
-                    base = f"{getattr(entity, 'username', getattr(entity, 'id', 'chan'))}_{msg.id}"
-                    already = existing_media_items(base)
-                    if already:
-                        media_items.extend(already)
-                    else:
-                        out = await client.download_media(msg, file=str(media_root / base))
-                        if out:
-                            media_items.append({"path": Path(out).name, "kind": "photo", "mime": "image/jpeg"})
-                else:
-                    doc = getattr(msg, "document", None)
-                    mime = getattr(doc, "mime_type", None) if doc is not None else None
-                    if isinstance(mime, str):
-                        if mime.startswith("image/"):
-                            base = f"{getattr(entity, 'username', getattr(entity, 'id', 'chan'))}_{msg.id}"
-                            already = existing_media_items(base)
-                            if already:
-                                media_items.extend(already)
-                            else:
-                                out = await client.download_media(msg, file=str(media_root / base))
-                                if out:
-                                    media_items.append({"path": Path(out).name, "kind": "photo", "mime": mime})
-                        elif mime.startswith("video/"):
-                            # detect animated gif-as-video
-                            attrs = getattr(doc, "attributes", []) or []
-                            is_gif = any(isinstance(a, DocumentAttributeAnimated) for a in attrs)
-                            base = f"{getattr(entity, 'username', getattr(entity, 'id', 'chan'))}_{msg.id}"
-                            already = existing_media_items(base)
-                            if already:
-                                media_items.extend(already)
-                            else:
-                                out = await client.download_media(msg, file=str(media_root / base))
-                                if out:
-                                    media_items.append(
-                                        {"path": Path(out).name, "kind": "gif" if is_gif else "video", "mime": mime}
-                                    )
-                if media_items:
-                    attachments = {"media": media_items}
-                # forward metadata
-                fwd = getattr(msg, "fwd_from", None)
-                if fwd is not None:
-                    f_from_name = getattr(fwd, "from_name", None)
-                    f_from = getattr(fwd, "from_id", None)
-                    f_username: str | None = None
-                    f_title: str | None = None
-                    f_type: str | None = None
-                    f_peer_id: int | None = None
-                    if f_from is not None:
-                        # PeerChannel / PeerUser
-                        f_peer_id = getattr(f_from, "channel_id", None) or getattr(
-                            f_from, "user_id", None
-                        )
-                        if getattr(f_from, "channel_id", None) is not None:
-                            f_type = "channel"
-                        elif getattr(f_from, "user_id", None) is not None:
-                            f_type = "user"
-                        # try resolve human-readable title/username via cache
-                        if f_type and f_peer_id:
-                            cache_key = (f_type, int(f_peer_id))
-                            info = forward_cache.get(cache_key)
-                            if info is None:
-                                try:
-                                    entity = (
-                                        await client.get_entity(PeerChannel(int(f_peer_id)))
-                                        if f_type == "channel"
-                                        else await client.get_entity(PeerUser(int(f_peer_id)))
-                                    )
-                                    info = {
-                                        "title": get_display_name(entity) or None,
-                                        "username": getattr(entity, "username", None),
-                                    }
-                                except Exception:
-                                    info = {"title": None, "username": None}
-                                forward_cache[cache_key] = info
-                            f_title = info.get("title") if info else None
-                            f_username = info.get("username") if info else None
-                    # Heuristic: hidden forward without from_id but with name like '@user'
-                    if f_type is None and f_username is None and isinstance(f_from_name, str) and f_from_name.startswith("@"):
-                        f_type = "user"
-                        f_username = f_from_name.lstrip("@")
-                    # Telethon не всегда даёт username в fwd header; оставим только name/id/type
-                    features = {
-                        "forward": {
-                            "from_name": f_from_name,
-                            "from_title": f_title,
-                            "from_username": f_username,
-                            "from_type": f_type,
-                            "from_peer_id": f_peer_id,
-                        }
-                    }
-                if exists is not None:
-                    if update_existing_media:
-                        update_values: dict[str, object] = {}
-                        if attachments and not exists.attachments:
-                            update_values["attachments"] = attachments
-                        if features:
-                            # update forward info if absent or can be enriched with title/username
-                            existing_features = exists.features or {}
-                            ef = existing_features.get("forward") if isinstance(existing_features, dict) else None
-                            nf = features.get("forward")
-                            should_update_forward = False
-                            if not ef:
-                                should_update_forward = True
-                            else:
-                                # enrich when missing title/username
-                                missing_title = not bool(ef.get("from_title"))
-                                missing_username = not bool(ef.get("from_username"))
-                                have_new_title = bool(nf and nf.get("from_title"))
-                                have_new_username = bool(nf and nf.get("from_username"))
-                                if (missing_title and have_new_title) or (missing_username and have_new_username):
-                                    should_update_forward = True
-                                    # merge existing with new
-                                    merged = dict(ef)
-                                    merged.update({k: v for k, v in (nf or {}).items() if v is not None})
-                                    features = dict(existing_features)
-                                    features["forward"] = merged
-                            if should_update_forward:
-                                update_values["features"] = features
-                        if update_values:
-                            await session.execute(
-                                update(MessageRaw).where(MessageRaw.id == exists.id).values(**update_values)
-                            )
-                            processed += 1
-                    # else skip already stored message
-                else:
-                    await create_message(
-                        session,
-                        channel_id=db_channel.id,
-                        msg_id=msg.id,
-                        date=msg.date,
-                        text=msg.message or None,
-                        attachments=attachments,
-                        features=features,
-                    )
-                    processed += 1
-                if processed % 200 == 0:
-                    await session.commit()
-
-            # update last_message_id only for channels that expose it
-            if isinstance(entity, TlChannel):
-                await session.execute(
-                    update(Channel)
-                    .where(Channel.id == db_channel.id)
-                    .values(last_message_id=getattr(entity, "max_read_msg_id", None))
-                )
-            await session.commit()
-            results[key] = f"ok:{processed}"
+    By default ingest is incremental: once a channel has a watermark
+    (``Channel.last_message_id``, the highest stored ``msg_id``) only messages above it
+    are fetched, oldest first, at most ``limit`` per run. ``full=True`` re-walks the
+    newest ``limit`` messages instead.
+
+    ``date_from``/``date_to`` switch to a backfill: messages older than ``date_to`` are
+    walked newest first down to ``date_from`` (``limit=None`` for no cap).
+
+    Newest-first walks (full, first ingest, backfill) save their ``offset_id`` in
+    ``ingest_checkpoints`` in the same transaction as every page, so a run that dies
+    midway resumes where it stopped instead of re-reading from the newest message.
+
+    With ``concurrency`` > 1 (``INGEST_CONCURRENCY``) channels are ingested in parallel,
+    each on its own pooled Telegram client and DB session; ``session`` is then only used
+    by the sequential path.
+
+    ``progress`` receives per-channel counters (scanned, stored, media_downloaded, rate)
+    after every page and ``{"status": "done", "result": ...}`` when a channel finishes.
+
+    ``client`` replaces the pooled Telegram clients (shared by all channels), e.g. a
+    :class:`~tg_events.ingest.replay.ReplayClient` for offline benchmarks.
+    """
+    s = get_settings()
+    page_size = max(1, int(page_size or s.ingest_page_size))
+    concurrency = max(1, int(concurrency or s.ingest_concurrency))
+    media_root = Path(s.media_root)
+    media_root.mkdir(parents=True, exist_ok=True)
+    targets = list(dict.fromkeys(channels))
+    opts: dict[str, Any] = {
+        "limit": limit,
+        "update_existing_media": update_existing_media,
+        "page_size": page_size,
+        "full": full,
+        "date_from": date_from,
+        "date_to": date_to,
+        "progress": progress,
+    }
+
+    def lease() -> Any:
+        return contextlib.nullcontext(client) if client is not None else open_client()
+
+    def finished(ch: str, result: str) -> str:
+        if progress is not None:
+            progress(ch, {"status": "done", "result": result})
+        return result
+
+    if concurrency == 1 or len(targets) <= 1:
+        results: dict[str, str] = {}
+        async with lease() as tg:
+            await _ensure_authorized(tg)
+            async with MediaPipeline(tg, media_root) as media:
+                for ch in targets:
+                    r = await _ingest_one(session, tg, media, ch, **opts)
+                    results[ch] = finished(ch, r)
         return results
 
-    # unreachable
+    sem = asyncio.Semaphore(concurrency)
 
+    async def _run(ch: str) -> str:
+        async with sem, lease() as tg, SessionLocal() as ses:
+            await _ensure_authorized(tg)
+            async with MediaPipeline(tg, media_root) as media:
+                r = await _ingest_one(ses, tg, media, ch, **opts)
+        return finished(ch, r)
 
+    outcomes = await asyncio.gather(*(_run(ch) for ch in targets))
+    return dict(zip(targets, outcomes))
@@ -1,13 +1,22 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
 import asyncio
-from contextlib import asynccontextmanager
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
 
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
+from telethon.sessions import SQLiteSession, StringSession
+from telethon.utils import is_list_like
 
 from tg_events.config import get_settings
+from tg_events.ratelimit import TokenBucket
+
+
+logger = logging.getLogger("tg_events.ingest.telethon_client")
 
 
 def build_client(session_path: Optional[str] = None) -> TelegramClient:
@@ -20,21 +29,301 @@ def build_client(session_path: Optional[str] = None) -> TelegramClient:
     return TelegramClient(str(session_file), s.telegram_api_id, s.telegram_api_hash)
 
 
-_TELETHON_SESSION_LOCK: asyncio.Lock = asyncio.Lock()
+# Telegram method classes with their own request budget (see TelegramLimiter)
+_METHOD_CLASSES = {
+    "GetHistoryRequest": "history",
+    "GetMessagesRequest": "history",
+    "SearchRequest": "history",
+    "ResolveUsernameRequest": "resolve",
+    "GetChannelsRequest": "resolve",
+    "GetUsersRequest": "resolve",
+    "GetFullChannelRequest": "resolve",
+    "GetDialogsRequest": "resolve",
+    "GetFileRequest": "file",
+    "GetCdnFileRequest": "file",
+}
 
 
-@asynccontextmanager
-async def open_client(session_path: Optional[str] = None):
-    """Serialize access to the Telethon SQLite session to avoid 'database is locked'."""
-    client = build_client(session_path)
-    await _TELETHON_SESSION_LOCK.acquire()
-    try:
-        await client.connect()
+def method_class(request: Any) -> str:
+    return _METHOD_CLASSES.get(type(request).__name__, "default")
+
+
+class TelegramLimiter:
+    """Process-wide request budget shared by all pooled clients.
+
+    One token bucket per method class (history, resolve, file, default) and a global
+    pause: a FloodWait on any client stops every request until it expires, instead of
+    each client discovering the flood on its own.
+    """
+
+    def __init__(self) -> None:
+        s = get_settings()
+        self.buckets = {
+            "history": TokenBucket(s.telegram_rps_history, s.telegram_burst),
+            "resolve": TokenBucket(s.telegram_rps_resolve, s.telegram_burst),
+            "file": TokenBucket(s.telegram_rps_file, s.telegram_burst),
+            "default": TokenBucket(s.telegram_rps_default, s.telegram_burst),
+        }
+        self.flood_waits = 0
+        self.last_flood: Optional[dict[str, Any]] = None
+
+    async def acquire(self, request: Any) -> None:
+        await self.buckets[method_class(request)].acquire()
+
+    def flood(self, request: Any, seconds: int, *, slept: bool = True) -> None:
+        """Pause for a FloodWait: every bucket when it is slept out, else only the
+        bucket of the request's method class (the error goes to the caller)."""
+        if slept:
+            paused = list(self.buckets.values())
+        else:
+            paused = [self.buckets[method_class(request)]]
+        for bucket in paused:
+            bucket.pause(seconds)
+        self.flood_waits += 1
+        self.last_flood = {
+            "method": type(request).__name__,
+            "seconds": seconds,
+            "slept": slept,
+            "at": time.time(),
+        }
+        logger.warning("telegram.limiter:flood_wait", extra=self.last_flood)
+
+    @property
+    def paused_for(self) -> float:
+        return max(b.paused_for for b in self.buckets.values())
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "paused_s": round(self.paused_for, 1),
+            "flood_waits": self.flood_waits,
+            "last_flood": self.last_flood,
+            "buckets": {k: b.snapshot() for k, b in self.buckets.items()},
+        }
+
+
+_limiter: Optional[TelegramLimiter] = None
+
+
+def get_limiter() -> TelegramLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = TelegramLimiter()
+    return _limiter
+
+
+class LimitedTelegramClient(TelegramClient):
+    """TelegramClient whose every request goes through the shared :class:`TelegramLimiter`.
+
+    FloodWaits up to ``telegram_flood_sleep_max_s`` are slept out (globally) and the
+    request retried once; longer ones are raised to the caller and only hold back
+    requests of the same method class.
+    """
+
+    async def _call(  # type: ignore[override]
+        self, sender, request, ordered=False, flood_sleep_threshold=None
+    ):
+        limiter = get_limiter()
+        first = request[0] if is_list_like(request) else request
+        await limiter.acquire(first)
         try:
-            yield client
-        finally:
-            await client.disconnect()
-    finally:
-        _TELETHON_SESSION_LOCK.release()
+            return await super()._call(sender, request, ordered, flood_sleep_threshold=0)
+        except FloodWaitError as e:
+            slept = e.seconds <= get_settings().telegram_flood_sleep_max_s
+            limiter.flood(first, e.seconds, slept=slept)
+            if not slept:
+                raise
+        await limiter.acquire(first)
+        return await super()._call(sender, request, ordered, flood_sleep_threshold=0)
+
+
+class _SharedEntitySession(StringSession):
+    """StringSession whose entity cache (ids, access hashes, usernames) is shared.
+
+    ``MemorySession`` keeps resolved entities in ``_entities``; pointing every pooled
+    client at the same set means a peer resolved by one lease is known to all of them.
+    """
 
+    def __init__(self, string: str, entities: set) -> None:
+        super().__init__(string)
+        self._entities = entities
 
+
+class ClientPool:
+    """Pool of long-lived Telethon clients backed by in-memory copies of one session.
+
+    The SQLite session file is read once and turned into a ``StringSession``; every pooled
+    client gets its own copy, so leases never contend on the SQLite file and up to
+    ``size`` Telegram operations (ingest, dialog listing, ...) run concurrently.
+
+    Clients stay connected between leases. :meth:`start` (called from the API lifespan)
+    connects them up front and runs a watchdog that reconnects dropped clients with
+    exponential backoff; :meth:`close` disconnects everything.
+    """
+
+    def __init__(self, size: int, session_path: Optional[str] = None) -> None:
+        self.size = max(1, int(size))
+        self.session_path = session_path
+        self._sem = asyncio.Semaphore(self.size)
+        self._idle: list[TelegramClient] = []
+        self._clients: list[TelegramClient] = []
+        self._leased = 0
+        self._auth: Optional[str] = None
+        self._entities: set = set()
+        self._watchdog: Optional[asyncio.Task] = None
+        self._reconnects = 0
+        self._last_error: Optional[str] = None
+        self._last_connected_at: Optional[float] = None
+        self._authorized: Optional[bool] = None
+        self._ever_connected: set[int] = set()
+        # bumped by reload(); clients of an older generation are not returned to the pool
+        self._generation = 0
+
+    def _string_session(self) -> str:
+        # re-read while unauthorized, so a later tg_auth run is picked up
+        if not self._auth:
+            s = get_settings()
+            session_file = Path(self.session_path or s.telegram_session_path)
+            session_file.parent.mkdir(parents=True, exist_ok=True)
+            sqlite = SQLiteSession(str(session_file))
+            try:
+                # empty string when the file holds no auth key (not authorized yet)
+                self._auth = StringSession.save(sqlite)  # type: ignore[arg-type]
+            finally:
+                sqlite.close()
+        return self._auth or ""
+
+    def _new_client(self) -> TelegramClient:
+        s = get_settings()
+        if s.telegram_api_id is None or s.telegram_api_hash is None:
+            raise RuntimeError("TELEGRAM_API_ID/TELEGRAM_API_HASH must be set")
+        session = _SharedEntitySession(self._string_session(), self._entities)
+        client = LimitedTelegramClient(session, s.telegram_api_id, s.telegram_api_hash)
+        client._pool_generation = self._generation  # type: ignore[attr-defined]
+        self._clients.append(client)
+        return client
+
+    async def _ensure_connected(self, client: TelegramClient) -> None:
+        """Connect (or reconnect) with exponential backoff up to ``telegram_connect_attempts``."""
+        if client.is_connected():
+            return
+        s = get_settings()
+        delay = 0.5
+        attempts = max(1, int(s.telegram_connect_attempts))
+        for attempt in range(1, attempts + 1):
+            try:
+                await client.connect()
+                self._last_connected_at = time.time()
+                self._last_error = None
+                if id(client) in self._ever_connected:
+                    self._reconnects += 1
+                self._ever_connected.add(id(client))
+                if self._authorized is None:
+                    self._authorized = bool(await client.is_user_authorized())
+                return
+            except Exception as e:
+                self._last_error = f"{type(e).__name__}: {e}"
+                logger.warning(
+                    "telegram.pool:connect_failed",
+                    extra={"attempt": attempt, "delay_s": delay, "error": self._last_error},
+                )
+                if attempt == attempts:
+                    raise
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, float(s.telegram_reconnect_max_delay_s))
+
+    async def start(self) -> None:
+        """Connect all clients and start the reconnect watchdog."""
+        while len(self._clients) < self.size:
+            self._idle.append(self._new_client())
+        await asyncio.gather(*(self._ensure_connected(c) for c in list(self._idle)))
+        if self._watchdog is None or self._watchdog.done():
+            self._watchdog = asyncio.create_task(self._watch())
+
+    async def _watch(self) -> None:
+        interval = float(get_settings().telegram_watchdog_interval_s)
+        while True:
+            await asyncio.sleep(interval)
+            for client in list(self._idle):
+                if client.is_connected():
+                    continue
+                try:
+                    await self._ensure_connected(client)
+                except Exception:
+                    # keep the watchdog alive; the next lease retries as well
+                    pass
+
+    async def close(self) -> None:
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            try:
+                await self._watchdog
+            except asyncio.CancelledError:
+                pass
+            self._watchdog = None
+        await asyncio.gather(*(c.disconnect() for c in self._clients), return_exceptions=True)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[TelegramClient]:
+        """Borrow a connected client; waits while all ``size`` clients are leased."""
+        async with self._sem:
+            client = self._idle.pop() if self._idle else self._new_client()
+            self._leased += 1
+            try:
+                await self._ensure_connected(client)
+                yield client
+            finally:
+                self._leased -= 1
+                if getattr(client, "_pool_generation", None) == self._generation:
+                    self._idle.append(client)
+                else:
+                    # leased before a reload: built from the old session/settings
+                    with suppress(Exception):
+                        await client.disconnect()
+
+    async def reload(self) -> None:
+        """Re-read the session file (e.g. after re-running tg_auth) and reconnect.
+
+        Idle clients are replaced right away; leased ones keep working and are
+        disconnected when they are returned.
+        """
+        self._generation += 1
+        stale, self._idle = self._idle, []
+        # leased clients are dropped from the pool here and disconnected by lease()
+        self._clients = []
+        self._auth = None
+        self._authorized = None
+        self._ever_connected.clear()
+        await asyncio.gather(*(c.disconnect() for c in stale), return_exceptions=True)
+        await self.start()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": self.size,
+            "created": len(self._clients),
+            "connected": sum(1 for c in self._clients if c.is_connected()),
+            "leased": self._leased,
+            "idle": len(self._idle),
+            "authorized": self._authorized,
+            "reconnects": self._reconnects,
+            "cached_entities": len(self._entities),
+            "last_connected_at": self._last_connected_at,
+            "last_error": self._last_error,
+        }
+
+
+_pools: dict[str, ClientPool] = {}
+
+
+def get_pool(session_path: Optional[str] = None) -> ClientPool:
+    key = session_path or get_settings().telegram_session_path
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = ClientPool(get_settings().telegram_pool_size, session_path)
+    return pool
+
+
+@asynccontextmanager
+async def open_client(session_path: Optional[str] = None) -> AsyncIterator[TelegramClient]:
+    """Lease a client from the process-wide pool for ``session_path``."""
+    async with get_pool(session_path).lease() as client:
+        yield client
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path, PurePosixPath
+from typing import Any, Iterable, Optional
+from urllib.parse import quote
+
+from tg_events.config import get_settings
+
+
+# Layout of files under settings.media_root. Paths stored in attachments/media_files
+# are always relative to media_root and served under the /media mount. With
+# settings.media_dedupe (the default) downloads are content-addressed (content_base) and
+# already sharded by hash; media_base and media_layout cover the per-message files.
+
+
+def channel_key(username: Optional[str], tg_id: Optional[int]) -> str:
+    """Directory/file prefix for a channel: username when public, else numeric id."""
+    return username or str(tg_id if tg_id is not None else "chan")
+
+
+def shard_dir(channel: str, stem: str) -> str:
+    """``{channel}/{xx}`` where ``xx`` is a hash prefix of the file stem (256 buckets)."""
+    digest = hashlib.sha1(stem.encode("utf-8")).hexdigest()
+    return f"{channel}/{digest[:2]}"
+
+
+def media_base(channel: str, msg_id: int) -> str:
+    """Relative path (without extension) for a message's media under the configured layout."""
+    stem = f"{channel}_{msg_id}"
+    if get_settings().media_layout == "flat":
+        return stem
+    return f"{shard_dir(channel, stem)}/{stem}"
+
+
+def media_content_key(msg: Any) -> Optional[str]:
+    """Stable id of the underlying Telegram file, shared by forwards and cross-posts."""
+    photo = getattr(msg, "photo", None)
+    if photo is not None and getattr(photo, "id", None) is not None:
+        return f"photo-{photo.id}"
+    doc = getattr(msg, "document", None)
+    if doc is not None and getattr(doc, "id", None) is not None:
+        return f"doc-{doc.id}"
+    return None
+
+
+def content_base(content_key: str) -> str:
+    """Relative path (without extension) of a content-addressed file: ``by-id/{xx}/{key}``."""
+    return f"by-id/{hashlib.sha1(content_key.encode('utf-8')).hexdigest()[:2]}/{content_key}"
+
+
+def sharded_relpath(channel: str, path: str) -> str:
+    """Where a flat ``path`` lives in the sharded layout (unchanged if already nested)."""
+    p = PurePosixPath(path)
+    if len(p.parts) > 1:
+        return path
+    return f"{shard_dir(channel, p.stem)}/{p.name}"
+
+
+def media_url(path: str) -> str:
+    return "/media/" + quote(path.lstrip("/"))
+
+
+def unlink_media(paths: Iterable[str]) -> int:
+    """Remove files (relative to media_root); returns how many were deleted."""
+    root = Path(get_settings().media_root)
+    deleted = 0
+    for p in paths:
+        try:
+            f = root / p
+            if f.is_file():
+                f.unlink(missing_ok=True)
+                deleted += 1
+        except Exception:
+            pass
+    return deleted
@@ -54,7 +54,18 @@
   const topicsEl = document.getElementById("topics");
   const boardEl = document.getElementById("board");
   let lastItems = [];
+  // Feed paging: posts come FEED_PAGE at a time; older pages load on scroll (keyset cursor)
+  const FEED_PAGE = 50;
+  let feedCursor = null;
+  let feedLoading = false;
+  let feedGen = 0;
+  let feedShown = 0;
+  let feedSeenKeys = new Set();
+  let feedObserver = null;
   let autoTimer = null;
+  // delta sync: token from the first feed page, advanced by every /miniapp/api/changes poll
+  let syncToken = null;
+  let changesBusy = false;
   let channelsCache = [];
   let topicsBoardListenerAttached = false;
   // topic name -> id index from server
@@ -189,7 +200,7 @@
     return `color:${color};border-color:${border}`;
   }
 
-  function buildParams() {
+  function buildParams(limit = FEED_PAGE) {
     const params = new URLSearchParams();
     const selected = channelSelect.value ? channelSelect.value.trim() : "";
     const u = userFilter.value.trim();
@@ -207,43 +218,155 @@
     if (fwd) params.set("fwd_username", fwd.startsWith("@") ? fwd.slice(1) : fwd);
     const mdl = modelSelect && modelSelect.value ? modelSelect.value.trim() : "";
     if (mdl) params.set("model", mdl);
-    params.set("limit", "500");
+    params.set("limit", String(limit));
     return params;
   }
 
+  function renderCommentCard(it) {
+    const el = document.getElementById(`comment-${it.id}`);
+    if (!el) return;
+    const numEl = el.querySelector(".num");
+    const num = numEl ? numEl.outerHTML + " " : "";
+    const t = it.channel_title || it.channel_username || "Channel";
+    const isEmpty = !(it.ai_comment && String(it.ai_comment).trim().length > 0);
+    const content = isEmpty ? "Комментарий отсутствует" : escapeHtml(it.ai_comment);
+    el.innerHTML = `<div class="title">${num}Comment: ${escapeHtml(t)} <button class="action fix-comment" data-id="${it.id}">Fix</button> <button class="action del-comment" data-id="${it.id}">Delete</button></div><div class="content${isEmpty ? " empty" : ""}">${content}</div>`;
+  }
+
+  // Fetch and apply everything changed since syncToken (new/edited posts, comments,
+  // deletions); returns the changed posts, or null when nothing could be applied.
+  async function pollChanges() {
+    if (!syncToken) return null;
+    const gen = feedGen;
+    const params = buildParams();
+    params.delete("limit");
+    params.set("since", syncToken);
+    const r = await fetch(`/miniapp/api/changes?${params.toString()}`);
+    if (!r.ok) return null;
+    const d = await r.json();
+    if (gen !== feedGen) return null; // reloaded meanwhile; load() issued a fresh token
+    syncToken = d.sync_token || syncToken;
+    if (d.reset) {
+      await load();
+      return null;
+    }
+    const items = d.items || [];
+    const index = new Map(lastItems.map((x, i) => [x.id, i]));
+    const newest = lastItems.length ? new Date(lastItems[0].date) : null;
+    let fresh = 0;
+    for (const it of items) {
+      if (index.has(it.id)) {
+        lastItems[index.get(it.id)] = it;
+        renderCommentCard(it);
+      } else if (!newest || new Date(it.date) > newest) {
+        fresh += 1;
+      }
+    }
+    for (const id of d.deleted_comments || []) {
+      const it = index.has(id) ? lastItems[index.get(id)] : null;
+      if (it && !items.some((x) => x.id === id)) {
+        it.ai_comment = null;
+        renderCommentCard(it);
+      }
+    }
+    const gone = new Set(d.deleted_messages || []);
+    if (gone.size) {
+      lastItems = lastItems.filter((x) => !gone.has(x.id));
+      for (const id of gone) {
+        const row = listEl.querySelector(`.row[data-id="${id}"]`);
+        if (!row) continue;
+        const child = row.nextElementSibling;
+        if (child && child.classList.contains("child")) child.remove();
+        row.remove();
+      }
+      renumberRows();
+    }
+    // new posts go on top; only re-render when the reader is at the top of the feed
+    if (fresh && window.scrollY < 200) await load();
+    return items;
+  }
+
+  // Follow a comment generation job over Server-Sent Events until its `done` event;
+  // `onProgress(stored)` runs after every finished item. Resolves with the stored count.
+  function followGeneration(jobId, onProgress) {
+    return new Promise((resolve) => {
+      let stored = 0;
+      let finished = 0;
+      const es = new EventSource(`/miniapp/api/comments/jobs/${jobId}/events`);
+      const finish = () => { es.close(); resolve({ stored, finished }); };
+      es.addEventListener("stored", (e) => {
+        const ev = JSON.parse(e.data);
+        stored += 1;
+        finished += 1;
+        const it = lastItems.find((x) => x.id === ev.message_id);
+        if (it) {
+          it.ai_comment = ev.comment;
+          renderCommentCard(it);
+        }
+        if (onProgress) onProgress(stored);
+      });
+      for (const name of ["failed", "skipped", "cancelled"]) {
+        es.addEventListener(name, () => {
+          finished += 1;
+          if (onProgress) onProgress(stored);
+        });
+      }
+      es.addEventListener("done", finish);
+      // EventSource reconnects by itself (with Last-Event-ID); give up once the job is gone
+      es.onerror = () => { if (es.readyState === EventSource.CLOSED) finish(); };
+    });
+  }
+
+  // POST /miniapp/api/comments/stream and read its event stream (EventSource is GET-only);
+  // `onDelta(text)` gets each chunk. Resolves with the `stored` event, rejects on `error`.
+  async function streamComment(body, onDelta) {
+    const r = await fetch(`/miniapp/api/comments/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(body),
+    });
+    if (!r.ok || !r.body) throw new Error(await r.text());
+    const reader = r.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, { stream: true });
+      let sep;
+      while ((sep = buf.indexOf("\n\n")) >= 0) {
+        const frame = buf.slice(0, sep);
+        buf = buf.slice(sep + 2);
+        let name = "message";
+        const data = [];
+        for (const line of frame.split("\n")) {
+          if (line.startsWith("event: ")) name = line.slice(7);
+          else if (line.startsWith("data: ")) data.push(line.slice(6));
+        }
+        if (!data.length) continue;
+        const payload = JSON.parse(data.join("\n"));
+        if (name === "delta") onDelta(payload.text || "");
+        else if (name === "stored") return payload;
+        else if (name === "error") throw new Error(payload.error || "generation failed");
+      }
+    }
+    throw new Error("stream ended before the comment was stored");
+  }
+
   function scheduleAutoRefresh() {
     if (autoTimer) {
       clearInterval(autoTimer);
       autoTimer = null;
     }
     autoTimer = setInterval(async () => {
+      if (changesBusy) return;
+      changesBusy = true;
       try {
-        const cards = Array.from(document.querySelectorAll(".comment-card"));
-        const needIds = [];
-        for (const el of cards) {
-          const idStr = el.id && el.id.startsWith("comment-") ? el.id.slice("comment-".length) : "";
-          const content = el.querySelector(".content");
-          if (idStr && content && content.textContent === "Комментарий отсутствует") {
-            const idNum = parseInt(idStr, 10);
-            if (!Number.isNaN(idNum)) needIds.push(idNum);
-          }
-        }
-        if (!needIds.length) return;
-        const r = await fetch(`/miniapp/api/posts?${buildParams().toString()}`);
-        const d = await r.json();
-        const items = d.items || [];
-        const byId = new Map(items.map((x) => [x.id, x]));
-        for (const id of needIds) {
-          const it = byId.get(id);
-          if (it && it.ai_comment) {
-            const el = document.getElementById(`comment-${id}`);
-            if (el) {
-              const t = it.channel_title || it.channel_username || "Channel";
-              el.innerHTML = `<div class="title">Comment: ${escapeHtml(t)} <button class="action fix-comment" data-id="${it.id}">Fix</button> <button class="action del-comment" data-id="${it.id}">Delete</button></div><div class="content">${escapeHtml(it.ai_comment)}</div>`;
-            }
-          }
-        }
-      } catch {}
+        await pollChanges();
+      } catch {
+      } finally {
+        changesBusy = false;
+      }
     }, 2000);
   }
 
@@ -507,34 +630,101 @@
     return wrap;
   }
 
+  function applyTopicFilter(items) {
+    // Apply client-side topic filter if selected in Tools
+    const topicSel = document.getElementById("topicFilter");
+    const selectedTopic = topicSel && "value" in topicSel ? (topicSel.value || "") : "";
+    if (!selectedTopic) return items;
+    return items.filter((x) => {
+      const names = topicMembership.get(Number(x.id)) || [];
+      if (selectedTopic === "__none__") return names.length === 0;
+      return names.includes(selectedTopic);
+    });
+  }
+
+  function attachFeedSentinel() {
+    const old = document.getElementById("feedSentinel");
+    if (old) old.remove();
+    if (feedObserver) feedObserver.disconnect();
+    if (!feedCursor) return;
+    const sentinel = document.createElement("div");
+    sentinel.id = "feedSentinel";
+    sentinel.className = "feed-sentinel";
+    sentinel.textContent = "Loading more...";
+    listEl.appendChild(sentinel);
+    if (!("IntersectionObserver" in window)) {
+      sentinel.textContent = "Load more";
+      sentinel.addEventListener("click", loadMore);
+      return;
+    }
+    if (!feedObserver) {
+      feedObserver = new IntersectionObserver((entries) => {
+        if (entries.some((e) => e.isIntersecting)) loadMore();
+      }, { rootMargin: "800px 0px" });
+    }
+    feedObserver.observe(sentinel);
+  }
+
+  async function loadMore() {
+    if (feedLoading || !feedCursor) return;
+    feedLoading = true;
+    const gen = feedGen;
+    try {
+      const params = buildParams();
+      params.set("cursor", feedCursor);
+      const res = await fetch(`/miniapp/api/posts?${params.toString()}`);
+      const data = await res.json();
+      if (gen !== feedGen) return; // reloaded meanwhile
+      const page = data.items || [];
+      feedCursor = data.next_cursor || null;
+      lastItems = lastItems.concat(page);
+      const items = applyTopicFilter(page);
+      const sentinel = document.getElementById("feedSentinel");
+      if (sentinel) sentinel.remove();
+      renderItems(items, feedShown);
+      feedShown += items.length;
+    } catch {
+      // keep the cursor; the next intersection retries
+    } finally {
+      feedLoading = false;
+      if (gen === feedGen) attachFeedSentinel();
+    }
+  }
+
   async function load() {
     if (pickerEl) pickerEl.classList.add("hidden");
     listEl.classList.remove("hidden");
     if (boardEl) { boardEl.classList.add("hidden"); boardEl.style.display = "none"; }
     listEl.innerHTML = "Loading...";
+    feedGen += 1;
+    feedLoading = false;
+    if (feedObserver) feedObserver.disconnect();
     const res = await fetch(`/miniapp/api/posts?${buildParams().toString()}`);
     const data = await res.json();
     let items = data.items || [];
     lastItems = items;
+    feedCursor = data.next_cursor || null;
+    syncToken = data.sync_token || null;
     const topicsData = await fetchTopicsFromServer();
-    // Apply client-side topic filter if selected in Tools
-    const topicSel = document.getElementById("topicFilter");
-    const selectedTopic = topicSel && "value" in topicSel ? (topicSel.value || "") : "";
-    if (selectedTopic) {
-      items = items.filter((x) => {
-        const names = topicMembership.get(Number(x.id)) || [];
-        if (selectedTopic === "__none__") return names.length === 0;
-        return names.includes(selectedTopic);
-      });
-    }
-    if (!items.length) {
+    items = applyTopicFilter(items);
+    if (!items.length && !feedCursor) {
       listEl.innerHTML = "<p>No posts.</p>";
       await renderTopicsSidebar(topicsData);
       return;
     }
     listEl.innerHTML = "";
+    feedSeenKeys = new Set();
+    renderItems(items, 0);
+    feedShown = items.length;
+    attachFeedSentinel();
+    scheduleAutoRefresh();
+    await renderTopicsSidebar(topicsData);
+  }
+
+  // Append rows for `items`; `base` offsets the displayed numbering (posts already shown)
+  function renderItems(items, base) {
     const rendered = new Set();
-    const seenKeys = new Set();
+    const seenKeys = feedSeenKeys;
     for (let i = 0; i < items.length; i++) {
       if (rendered.has(i)) continue;
       const curr = items[i];
@@ -694,17 +884,15 @@
         return row;
       }
       // Render main row
-      const mainRow = buildRow(items[mainIdx], mainIdx, false);
+      const mainRow = buildRow(items[mainIdx], base + mainIdx, false);
       listEl.appendChild(mainRow);
       rendered.add(mainIdx);
       if (childIdx >= 0 && childIdx !== mainIdx) {
-        const childRow = buildRow(items[childIdx], childIdx, true);
+        const childRow = buildRow(items[childIdx], base + childIdx, true);
         mainRow.insertAdjacentElement("afterend", childRow);
         rendered.add(childIdx);
       }
     }
-    scheduleAutoRefresh();
-    await renderTopicsSidebar(topicsData);
   }
 
   function renderPicker(items) {
@@ -1105,42 +1293,24 @@
       genBtn.textContent = `Generating ${overrides.length}…`;
       const stopBtn = document.getElementById("stopGenBtn");
       if (stopBtn) { stopBtn.disabled = false; stopBtn.classList.remove("hidden"); }
+      let jobId = null;
       try {
         const mdl = modelSelect && modelSelect.value ? modelSelect.value.trim() : "";
-        await fetch(`/miniapp/api/comments/generate_override`, {
+        const r = await fetch(`/miniapp/api/comments/generate_override`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ items: overrides, model: mdl || undefined }),
         });
+        const d = await r.json().catch(() => ({}));
+        jobId = d && d.job_id ? d.job_id : null;
       } catch {}
-      // Polling same as before
-      const params = buildParams();
+      // Cards update from the job's event stream as each comment is stored
       let remaining = overrides.length;
-      const maxRounds = Math.min(60, Math.ceil((overrides.length * 1.2 + 5) / 1.5));
-      for (let round = 0; round < maxRounds; round++) {
-        await sleep(1500);
-        const r = await fetch(`/miniapp/api/posts?${params.toString()}`);
-        const d = await r.json();
-        const items2 = d.items || [];
-        const byId = new Map(items2.map((x) => [x.id, x]));
-        remaining = 0;
-        for (const it of overrides) {
-          const it2 = byId.get(it.message_id);
-          if (it2 && it2.ai_comment) {
-            const el = document.getElementById(`comment-${it.message_id}`);
-            if (el) {
-              const t = it2.channel_title || it2.channel_username || "Channel";
-              el.innerHTML = `<div class="title"><span class="num"></span> Comment: ${escapeHtml(t)} <button class="action fix-comment" data-id="${it2.id}">Fix</button> <button class="action del-comment" data-id="${it2.id}">Delete</button></div><div class="content">${escapeHtml(it2.ai_comment)}</div>`;
-            }
-          } else {
-            remaining++;
-          }
-        }
-        if (genStatus) {
-          const done = overrides.length - remaining;
-          genStatus.textContent = `Generating… ${done}/${overrides.length}`;
-        }
-        if (!remaining) break;
+      if (jobId) {
+        const res = await followGeneration(jobId, (done) => {
+          if (genStatus) genStatus.textContent = `Generating… ${done}/${overrides.length}`;
+        });
+        remaining = overrides.length - res.stored;
       }
       genBtn.disabled = false;
       genBtn.textContent = oldLabel;
@@ -1252,12 +1422,16 @@
       const save = document.createElement("button");
       save.className = "action";
       save.textContent = "Save";
+      const regen = document.createElement("button");
+      regen.className = "action";
+      regen.textContent = "Regenerate";
       const cancel = document.createElement("button");
       cancel.className = "action";
       cancel.textContent = "Cancel";
       const actions = document.createElement("div");
       actions.style.marginTop = "6px";
       actions.appendChild(save);
+      actions.appendChild(regen);
       actions.appendChild(cancel);
       contentEl.replaceWith(ta);
       el.appendChild(actions);
@@ -1265,6 +1439,32 @@
         ta.replaceWith(contentEl);
         actions.remove();
       });
+      // stream a new comment into the editor; the server stores it when complete
+      regen.addEventListener("click", async () => {
+        const before = ta.value;
+        save.disabled = regen.disabled = true;
+        ta.readOnly = true;
+        ta.value = "";
+        const it = lastItems.find((x) => x.id === id);
+        const mdl = modelSelect && modelSelect.value ? modelSelect.value.trim() : "";
+        try {
+          const stored = await streamComment(
+            { message_id: id, text: it ? it.text || undefined : undefined, model: mdl || undefined },
+            (delta) => { ta.value += delta; ta.scrollTop = ta.scrollHeight; },
+          );
+          if (it) it.ai_comment = stored.comment;
+          const newDiv = document.createElement("div");
+          newDiv.className = "content";
+          newDiv.textContent = stored.comment;
+          ta.replaceWith(newDiv);
+          actions.remove();
+        } catch (err) {
+          console.error(err);
+          ta.value = before;
+          ta.readOnly = false;
+          save.disabled = regen.disabled = false;
+        }
+      });
       save.addEventListener("click", async () => {
         const text = ta.value.trim();
         try {
@@ -1367,6 +1567,23 @@
       }
     });
   }
+  // ingest runs as a background job; poll its status and show per-channel progress
+  async function waitIngestJob(jobId) {
+    for (;;) {
+      await new Promise((res) => setTimeout(res, 1000));
+      const r = await fetch(`/miniapp/api/ingest/${jobId}`);
+      if (!r.ok) return null;
+      const job = await r.json().catch(() => null);
+      if (!job) return null;
+      if (job.status === "done" || job.status === "failed") return job;
+      const p = Object.values(job.progress || {})[0] || {};
+      if (job.status === "queued") {
+        ingestBtn.textContent = "Queued…";
+      } else if (p.stored !== undefined) {
+        ingestBtn.textContent = `Ingesting… ${p.stored} stored, ${p.media_downloaded || 0} media`;
+      }
+    }
+  }
   ingestBtn.addEventListener("click", async () => {
     const sel = channelSelect.value.trim() || userFilter.value.trim();
     if (!sel) {
@@ -1383,7 +1600,8 @@
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(body),
       });
-      await r.json().catch(() => ({}));
+      const job = await r.json().catch(() => ({}));
+      if (job && job.job_id) await waitIngestJob(job.job_id);
       await load();
     } catch (e) {
       console.error(e);
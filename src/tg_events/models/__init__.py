@@ -1,6 +1,33 @@
 from tg_events.models.base import Base
-from tg_events.models.models import AiComment, Channel, Event, MessageRaw, Topic, TopicItem, Project, ProjectIdea
-
-__all__ = ["Base", "Channel", "Event", "MessageRaw", "AiComment", "Topic", "TopicItem", "Project", "ProjectIdea"]
-
+from tg_events.models.models import (
+    AiComment,
+    ChangeTombstone,
+    Channel,
+    Event,
+    IngestCheckpoint,
+    IngestJob,
+    MediaFile,
+    MessageRaw,
+    Peer,
+    Topic,
+    TopicItem,
+    Project,
+    ProjectIdea,
+)
 
+__all__ = [
+    "Base",
+    "Channel",
+    "Event",
+    "MessageRaw",
+    "AiComment",
+    "Topic",
+    "TopicItem",
+    "Project",
+    "ProjectIdea",
+    "MediaFile",
+    "IngestJob",
+    "IngestCheckpoint",
+    "Peer",
+    "ChangeTombstone",
+]
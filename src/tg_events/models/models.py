@@ -3,7 +3,9 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import BigInteger, DateTime, ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy import (
+    BigInteger, DateTime, ForeignKey, Index, String, Text, UniqueConstraint, text,
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -18,6 +20,8 @@ class AiComment(TimestampMixin, Base):
     message_id: Mapped[int] = mapped_column(ForeignKey("messages_raw.id", ondelete="CASCADE"), index=True)
     model: Mapped[str] = mapped_column(String(64), nullable=False)
     comment_text: Mapped[str] = mapped_column(Text, nullable=False)
+    # id of the last writing transaction, set by trigger (see ChangeTombstone)
+    change_txid: Mapped[int] = mapped_column(BigInteger, server_default="0", index=True)
 
     message: Mapped["MessageRaw"] = relationship()
 
@@ -86,6 +90,81 @@ class ProjectIdea(TimestampMixin, Base):
     topic: Mapped[Optional["Topic"]] = relationship()
     topic_item: Mapped[Optional["TopicItem"]] = relationship()
 
+
+class Peer(TimestampMixin, Base):
+    """Resolved Telegram peer (channel or user) with the access hash needed to address it."""
+
+    __tablename__ = "peers"
+    __table_args__ = (UniqueConstraint("peer_type", "tg_id", name="uq_peers_type_tg_id"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # channel | user
+    peer_type: Mapped[str] = mapped_column(String(16), nullable=False)
+    # same id space as Channel.tg_id
+    tg_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    access_hash: Mapped[Optional[int]] = mapped_column(BigInteger)
+    username: Mapped[Optional[str]] = mapped_column(String(255), index=True)
+    title: Mapped[Optional[str]] = mapped_column(Text)
+    is_broadcast: Mapped[bool] = mapped_column(default=False, nullable=False)
+    resolved_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class IngestCheckpoint(TimestampMixin, Base):
+    """Resume point of a newest-first history walk or date-bounded backfill of a channel."""
+
+    __tablename__ = "ingest_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("channel_id", "scope", name="uq_ingest_checkpoints_channel_scope"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    channel_id: Mapped[int] = mapped_column(ForeignKey("channels.id", ondelete="CASCADE"))
+    # "history" or "backfill:<from>:<to>"
+    scope: Mapped[str] = mapped_column(String(128), nullable=False)
+    # next iter_messages offset_id: every message newer than it is stored
+    offset_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    scanned: Mapped[int] = mapped_column(default=0, nullable=False)
+
+
+class ChangeTombstone(Base):
+    """Deleted post or AI comment, for the miniapp delta sync.
+
+    Triggers stamp ``messages_raw``/``ai_comments`` rows with the writing transaction id
+    (``change_txid``) and record deletions here. Clients pass back the snapshot xmin they
+    were given; every transaction at or above it may be new to them.
+    """
+
+    __tablename__ = "change_tombstones"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    # message | ai_comment
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    model: Mapped[Optional[str]] = mapped_column(String(64))  # ai_comment only
+    change_txid: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=text("now()"), nullable=False
+    )
+
+
+class IngestJob(TimestampMixin, Base):
+    """Queued/background ingest run; ``progress`` and ``result`` are keyed by channel."""
+
+    __tablename__ = "ingest_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # queued | running | done | failed
+    status: Mapped[str] = mapped_column(String(16), default="queued", nullable=False, index=True)
+    channels: Mapped[list] = mapped_column(JSONB, nullable=False)
+    # ingest_channels keyword arguments (limit, update_existing_media, full)
+    params: Mapped[Optional[dict]] = mapped_column(JSONB)
+    progress: Mapped[Optional[dict]] = mapped_column(JSONB)
+    result: Mapped[Optional[dict]] = mapped_column(JSONB)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+
 class Channel(TimestampMixin, Base):
     __tablename__ = "channels"
 
@@ -96,14 +175,41 @@ class Channel(TimestampMixin, Base):
     title: Mapped[Optional[str]] = mapped_column(Text)
     is_private: Mapped[bool] = mapped_column(default=False, nullable=False)
     last_message_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    # scheduler state: ok | backlog | flood_wait | error | not_found | forbidden | disabled
     polling_status: Mapped[Optional[str]] = mapped_column(String(32))
+    next_poll_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), index=True)
+    last_polled_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    # observed posting frequency (messages/hour, EWMA) and last achieved ingest speed
+    post_rate: Mapped[Optional[float]] = mapped_column()
+    ingest_rate: Mapped[Optional[float]] = mapped_column()
 
     messages: Mapped[list["MessageRaw"]] = relationship(back_populates="channel")
 
 
+# forwards whose source title is unknown and not looked up yet (enrich_forwards); the
+# query repeats this exact predicate so the planner can use the partial index
+UNRESOLVED_FORWARD = (
+    "(features -> 'forward' ->> 'from_peer_id') IS NOT NULL"
+    " AND (features -> 'forward' ->> 'from_type') IN ('channel', 'user')"
+    " AND (features -> 'forward' ->> 'from_title') IS NULL"
+    " AND (features -> 'forward' ->> 'resolve_attempted') IS NULL"
+)
+
+
 class MessageRaw(TimestampMixin, Base):
     __tablename__ = "messages_raw"
-    __table_args__ = (UniqueConstraint("channel_id", "msg_id", name="uq_messages_channel_msg"),)
+    __table_args__ = (
+        UniqueConstraint("channel_id", "msg_id", name="uq_messages_channel_msg"),
+        # keyset pagination of the feed on (date, id), per channel and across channels
+        Index("ix_messages_raw_channel_date_id", "channel_id", text("date DESC"), text("id DESC")),
+        Index("ix_messages_raw_date_id", text("date DESC"), text("id DESC")),
+        Index(
+            "ix_messages_raw_unresolved_forwards",
+            "channel_id",
+            "id",
+            postgresql_where=text(UNRESOLVED_FORWARD),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     channel_id: Mapped[int] = mapped_column(ForeignKey("channels.id", ondelete="CASCADE"))
@@ -113,11 +219,37 @@ class MessageRaw(TimestampMixin, Base):
     attachments: Mapped[Optional[dict]] = mapped_column(JSONB)
     features: Mapped[Optional[dict]] = mapped_column(JSONB)
     hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    # id of the last writing transaction, set by trigger (see ChangeTombstone)
+    change_txid: Mapped[int] = mapped_column(BigInteger, server_default="0", index=True)
 
     channel: Mapped["Channel"] = relationship(back_populates="messages")
     events: Mapped[list["Event"]] = relationship(back_populates="source_message")
 
 
+class MediaFile(TimestampMixin, Base):
+    """Manifest of downloaded media files, keyed by (channel_id, msg_id)."""
+
+    __tablename__ = "media_files"
+    __table_args__ = (
+        UniqueConstraint("channel_id", "msg_id", "path", name="uq_media_files_channel_msg_path"),
+        Index("ix_media_files_channel_msg", "channel_id", "msg_id"),
+        # reference checks by path before a file is deleted (unreferenced_paths)
+        Index("ix_media_files_path", "path"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    channel_id: Mapped[int] = mapped_column(ForeignKey("channels.id", ondelete="CASCADE"))
+    msg_id: Mapped[int] = mapped_column(BigInteger)
+    # relative to settings.media_root
+    path: Mapped[str] = mapped_column(Text)
+    kind: Mapped[str] = mapped_column(String(16))
+    mime: Mapped[Optional[str]] = mapped_column(String(128))
+    size: Mapped[Optional[int]] = mapped_column(BigInteger)
+    checksum: Mapped[Optional[str]] = mapped_column(String(64))  # sha256 hex
+    # Telegram photo/document id ("photo-<id>" / "doc-<id>"); rows sharing it share the file
+    content_key: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+
+
 class Event(TimestampMixin, Base):
     __tablename__ = "events"
 
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Optional
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursts up to ``capacity``.
+
+    ``acquire`` waits until enough tokens are available. :meth:`pause` blocks every
+    acquirer until a deadline (e.g. a FloodWait or HTTP 429 ``Retry-After``).
+    A ``rate`` of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.waited_s = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, seconds))
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` (capped at ``capacity``); returns the seconds spent waiting."""
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self.rate <= 0:
+                    break
+                self._refill(now)
+                need = min(tokens, self.capacity)
+                if self._tokens >= need:
+                    self._tokens -= need
+                    break
+                await asyncio.sleep((need - self._tokens) / self.rate)
+        waited = time.monotonic() - started
+        self.waited_s += waited
+        return waited
+
+    def refund(self, tokens: float) -> None:
+        """Return unused tokens (e.g. an estimate that turned out too high)."""
+        self._tokens = min(self.capacity, self._tokens + max(0.0, tokens))
+
+    def debit(self, tokens: float) -> None:
+        """Take tokens without waiting (usage above an estimate); the balance may go
+        negative, which later acquirers wait out."""
+        self._refill(time.monotonic())
+        self._tokens -= max(0.0, tokens)
+
+    def snapshot(self) -> dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self._tokens, 2),
+            "paused_s": round(self.paused_for, 1),
+            "waited_s": round(self.waited_s, 1),
+        }
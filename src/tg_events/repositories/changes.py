@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tg_events.models import ChangeTombstone
+
+
+async def sync_token(session: AsyncSession) -> int:
+    """Current snapshot xmin: every transaction with a lower id has finished.
+
+    Read it before the data it goes with; rows stamped with a ``change_txid`` at or
+    above it may still appear later and are included in the next delta.
+    """
+    stmt = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+    return int((await session.execute(stmt)).scalar_one())
+
+
+async def list_tombstones(
+    session: AsyncSession, *, since: int, limit: int
+) -> list[ChangeTombstone]:
+    stmt = (
+        select(ChangeTombstone)
+        .where(ChangeTombstone.change_txid >= since)
+        .order_by(ChangeTombstone.id)
+        .limit(limit)
+    )
+    return list((await session.execute(stmt)).scalars().all())
+
+
+async def prune_tombstones(session: AsyncSession, *, older_than_s: float) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than_s)
+    res = await session.execute(delete(ChangeTombstone).where(ChangeTombstone.created_at < cutoff))
+    return int(res.rowcount or 0)
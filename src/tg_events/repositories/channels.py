@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import Optional
+from datetime import datetime
+from typing import Any, Iterable, Optional
 
-from sqlalchemy import select, update
+from sqlalchemy import func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from tg_events.models import Channel
@@ -59,3 +60,54 @@ async def upsert_channel(
         return existing
 
 
+async def advance_watermark(session: AsyncSession, channel_id: int, msg_id: int) -> None:
+    """Move the channel's stored high-water mark forward (never backwards)."""
+    await session.execute(
+        update(Channel)
+        .where(Channel.id == channel_id)
+        .values(last_message_id=func.greatest(func.coalesce(Channel.last_message_id, 0), msg_id))
+    )
+
+
+async def due_channels(
+    session: AsyncSession, *, limit: Optional[int] = None, exclude: Iterable[int] = ()
+) -> list[Channel]:
+    """Channels whose next poll is due, oldest due first, busier channels first on ties.
+
+    ``exclude`` skips channel ids that are being polled right now.
+    """
+    stmt = (
+        select(Channel)
+        .where(
+            Channel.tg_id.isnot(None),
+            or_(Channel.polling_status.is_(None), Channel.polling_status != "disabled"),
+            or_(Channel.next_poll_at.is_(None), Channel.next_poll_at <= func.now()),
+        )
+        .order_by(
+            Channel.next_poll_at.asc().nulls_first(),
+            Channel.post_rate.desc().nulls_last(),
+        )
+    )
+    skip = list(exclude)
+    if skip:
+        stmt = stmt.where(Channel.id.notin_(skip))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return list((await session.execute(stmt)).scalars().all())
+
+
+async def next_due_at(session: AsyncSession, *, exclude: Iterable[int] = ()) -> Optional[datetime]:
+    stmt = select(func.min(Channel.next_poll_at)).where(
+        Channel.tg_id.isnot(None),
+        or_(Channel.polling_status.is_(None), Channel.polling_status != "disabled"),
+    )
+    skip = list(exclude)
+    if skip:
+        stmt = stmt.where(Channel.id.notin_(skip))
+    return (await session.execute(stmt)).scalar_one_or_none()
+
+
+async def set_schedule(session: AsyncSession, channel_id: int, **values: Any) -> None:
+    """Update scheduler columns (polling_status, next_poll_at, post_rate, ...)."""
+    await session.execute(update(Channel).where(Channel.id == channel_id).values(**values))
+
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from tg_events.models import IngestCheckpoint
+
+
+async def get_checkpoint(
+    session: AsyncSession, *, channel_id: int, scope: str
+) -> Optional[IngestCheckpoint]:
+    stmt = select(IngestCheckpoint).where(
+        IngestCheckpoint.channel_id == channel_id, IngestCheckpoint.scope == scope
+    )
+    return (await session.execute(stmt)).scalar_one_or_none()
+
+
+async def save_checkpoint(
+    session: AsyncSession, *, channel_id: int, scope: str, offset_id: int, scanned: int
+) -> None:
+    """Upsert the resume point; not committed here, so it lands with the page it describes."""
+    stmt = pg_insert(IngestCheckpoint).values(
+        channel_id=channel_id, scope=scope, offset_id=offset_id, scanned=scanned
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_ingest_checkpoints_channel_scope",
+        set_={
+            "offset_id": stmt.excluded.offset_id,
+            "scanned": stmt.excluded.scanned,
+            "updated_at": func.now(),
+        },
+    )
+    await session.execute(stmt)
+
+
+async def clear_checkpoint(session: AsyncSession, *, channel_id: int, scope: str) -> None:
+    await session.execute(
+        delete(IngestCheckpoint).where(
+            IngestCheckpoint.channel_id == channel_id, IngestCheckpoint.scope == scope
+        )
+    )
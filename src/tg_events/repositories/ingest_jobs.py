@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from tg_events.models import IngestJob
+
+
+async def create_job(
+    session: AsyncSession, *, channels: list[str], params: dict[str, Any]
+) -> IngestJob:
+    job = IngestJob(status="queued", channels=list(dict.fromkeys(channels)), params=params)
+    session.add(job)
+    await session.flush()
+    return job
+
+
+async def get_job(session: AsyncSession, job_id: int) -> Optional[IngestJob]:
+    return await session.get(IngestJob, job_id)
+
+
+async def list_jobs(session: AsyncSession, *, limit: int = 20) -> list[IngestJob]:
+    stmt = select(IngestJob).order_by(IngestJob.id.desc()).limit(limit)
+    return list((await session.execute(stmt)).scalars().all())
+
+
+async def claim_next_job(session: AsyncSession) -> Optional[IngestJob]:
+    """Mark the oldest queued job as running and return it (``None`` when idle).
+
+    ``FOR UPDATE SKIP LOCKED`` lets several API processes poll the same table without
+    picking up the same job twice.
+    """
+    stmt = (
+        select(IngestJob)
+        .where(IngestJob.status == "queued")
+        .order_by(IngestJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    job = (await session.execute(stmt)).scalar_one_or_none()
+    if job is None:
+        return None
+    job.status = "running"
+    job.started_at = func.now()
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+async def set_progress(session: AsyncSession, job_id: int, progress: dict[str, Any]) -> None:
+    await session.execute(
+        update(IngestJob)
+        .where(IngestJob.id == job_id)
+        .values(progress=progress, updated_at=func.now())
+    )
+
+
+async def finish_job(
+    session: AsyncSession,
+    job_id: int,
+    *,
+    result: Optional[dict[str, Any]] = None,
+    progress: Optional[dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> None:
+    values: dict[str, Any] = {
+        "status": "failed" if error else "done",
+        "result": result,
+        "error": error,
+        "finished_at": func.now(),
+    }
+    if progress is not None:
+        values["progress"] = progress
+    await session.execute(update(IngestJob).where(IngestJob.id == job_id).values(**values))
+
+
+async def requeue_stale(session: AsyncSession, *, older_than_s: float) -> int:
+    """Put ``running`` jobs whose worker stopped heartbeating back in the queue."""
+    cutoff = func.now() - func.make_interval(0, 0, 0, 0, 0, 0, older_than_s)
+    res = await session.execute(
+        update(IngestJob)
+        .where(IngestJob.status == "running", IngestJob.updated_at < cutoff)
+        .values(status="queued", started_at=None)
+    )
+    return int(res.rowcount or 0)
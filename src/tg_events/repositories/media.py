@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.sql import func
+
+from tg_events.models import MediaFile, MessageRaw
+
+
+async def get_media_manifest(
+    session: AsyncSession, *, channel_id: int, msg_ids: Iterable[int]
+) -> dict[int, list[dict]]:
+    """Manifest entries for a page of messages, as ``msg_id -> attachments.media items``."""
+    ids = [int(m) for m in dict.fromkeys(msg_ids)]
+    if not ids:
+        return {}
+    stmt = (
+        select(MediaFile.msg_id, MediaFile.path, MediaFile.kind, MediaFile.mime)
+        .where(MediaFile.channel_id == channel_id, MediaFile.msg_id.in_(ids))
+        .order_by(MediaFile.msg_id, MediaFile.path)
+    )
+    out: dict[int, list[dict]] = {}
+    for msg_id, path, kind, mime in (await session.execute(stmt)).all():
+        out.setdefault(int(msg_id), []).append({"path": path, "kind": kind, "mime": mime})
+    return out
+
+
+async def get_media_by_content_keys(
+    session: AsyncSession, content_keys: Iterable[str]
+) -> dict[str, dict[str, Any]]:
+    """One stored file per content key (path, kind, mime, size, checksum)."""
+    keys = [k for k in dict.fromkeys(content_keys) if k]
+    if not keys:
+        return {}
+    stmt = (
+        select(
+            MediaFile.content_key,
+            MediaFile.path,
+            MediaFile.kind,
+            MediaFile.mime,
+            MediaFile.size,
+            MediaFile.checksum,
+        )
+        .where(MediaFile.content_key.in_(keys))
+        .distinct(MediaFile.content_key)
+        .order_by(MediaFile.content_key, MediaFile.id)
+    )
+    out: dict[str, dict[str, Any]] = {}
+    for key, path, kind, mime, size, checksum in (await session.execute(stmt)).all():
+        out[key] = {"path": path, "kind": kind, "mime": mime, "size": size, "checksum": checksum}
+    return out
+
+
+async def record_media(conn: AsyncSession | AsyncConnection, rows: list[dict[str, Any]]) -> None:
+    """Upsert manifest rows (channel_id, msg_id, path, kind, mime, size, checksum)."""
+    if not rows:
+        return
+    stmt = pg_insert(MediaFile).values(
+        [
+            {
+                "channel_id": r["channel_id"],
+                "msg_id": r["msg_id"],
+                "path": r["path"],
+                "kind": r["kind"],
+                "mime": r.get("mime"),
+                "size": r.get("size"),
+                "checksum": r.get("checksum"),
+                "content_key": r.get("content_key"),
+            }
+            for r in rows
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_media_files_channel_msg_path",
+        set_={
+            "kind": stmt.excluded.kind,
+            "mime": stmt.excluded.mime,
+            "size": stmt.excluded.size,
+            "checksum": stmt.excluded.checksum,
+            "content_key": stmt.excluded.content_key,
+            "updated_at": func.now(),
+        },
+    )
+    await conn.execute(stmt)
+
+
+async def pop_media_for_messages(session: AsyncSession, message_ids: list[int]) -> list[str]:
+    """Delete manifest rows of the given ``messages_raw.id`` values and return their paths."""
+    if not message_ids:
+        return []
+    keys = (
+        await session.execute(
+            select(MessageRaw.channel_id, MessageRaw.msg_id).where(MessageRaw.id.in_(message_ids))
+        )
+    ).all()
+    if not keys:
+        return []
+    cond = tuple_(MediaFile.channel_id, MediaFile.msg_id).in_([(int(c), int(m)) for c, m in keys])
+    stmt = delete(MediaFile).where(cond).returning(MediaFile.path)
+    res = await session.execute(stmt.execution_options(synchronize_session=False))
+    paths = res.scalars().all()
+    return list(dict.fromkeys(paths))
+
+
+async def unreferenced_paths(session: AsyncSession, paths: Iterable[str]) -> list[str]:
+    """Subset of ``paths`` no manifest row points to any more (safe to unlink)."""
+    candidates = list(dict.fromkeys(p for p in paths if p))
+    if not candidates:
+        return []
+    stmt = select(MediaFile.path).where(MediaFile.path.in_(candidates)).distinct()
+    still = set((await session.execute(stmt)).scalars().all())
+    return [p for p in candidates if p not in still]
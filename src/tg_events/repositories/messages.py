@@ -1,12 +1,20 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable
 
-from sqlalchemy import select
+from sqlalchemy import Text, and_, bindparam, delete, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
 
-from tg_events.models import MessageRaw
+from tg_events.models import Event, MessageRaw
+from tg_events.models.models import UNRESOLVED_FORWARD
+from tg_events.repositories.media import pop_media_for_messages, unreferenced_paths
+
+
+# asyncpg allows 32767 bind parameters per statement; upsert_messages binds 7 per row
+_UPSERT_CHUNK_ROWS = 32767 // 7
 
 
 async def get_message(
@@ -19,6 +27,18 @@ async def get_message(
     return res.scalar_one_or_none()
 
 
+async def get_messages_by_msg_ids(
+    session: AsyncSession, *, channel_id: int, msg_ids: Iterable[int]
+) -> dict[int, MessageRaw]:
+    """Resolve a page of (channel_id, msg_id) keys with a single round trip."""
+    keys = [(channel_id, int(m)) for m in dict.fromkeys(msg_ids)]
+    if not keys:
+        return {}
+    stmt = select(MessageRaw).where(tuple_(MessageRaw.channel_id, MessageRaw.msg_id).in_(keys))
+    res = await session.execute(stmt)
+    return {int(m.msg_id): m for m in res.scalars().all()}
+
+
 async def create_message(
     session: AsyncSession,
     *,
@@ -43,3 +63,211 @@ async def create_message(
     return msg
 
 
+async def upsert_messages(session: AsyncSession, rows: list[dict[str, Any]]) -> int:
+    """Insert a batch of messages, one statement per ``_UPSERT_CHUNK_ROWS`` rows.
+
+    Rows that already exist (by ``uq_messages_channel_msg``) only get their
+    ``attachments``/``features`` replaced; text and date are left untouched.
+    """
+    if not rows:
+        return 0
+    # the same key twice in one statement is an error for ON CONFLICT DO UPDATE
+    unique_rows = list({(r["channel_id"], r["msg_id"]): r for r in rows}.values())
+    count = 0
+    for start in range(0, len(unique_rows), _UPSERT_CHUNK_ROWS):
+        stmt = pg_insert(MessageRaw).values(
+            [
+                {
+                    "channel_id": r["channel_id"],
+                    "msg_id": r["msg_id"],
+                    "date": r["date"],
+                    "text": r.get("text"),
+                    "attachments": r.get("attachments"),
+                    "features": r.get("features"),
+                    "hash": r.get("hash"),
+                }
+                for r in unique_rows[start : start + _UPSERT_CHUNK_ROWS]
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_messages_channel_msg",
+            set_={
+                "attachments": stmt.excluded.attachments,
+                "features": stmt.excluded.features,
+                "updated_at": func.now(),
+            },
+        )
+        res = await session.execute(stmt)
+        count += int(res.rowcount or 0)
+    return count
+
+
+async def list_pending_media(
+    session: AsyncSession, *, channel_id: int, limit: int
+) -> list[tuple[int, int]]:
+    """``(msg_id, failed attempts)`` of messages whose ``attachments`` still carry a
+    ``media_pending`` marker (oldest first)."""
+    attempts = MessageRaw.attachments["media_pending"][0]["attempts"].astext
+    stmt = (
+        select(MessageRaw.msg_id, attempts)
+        .where(
+            MessageRaw.channel_id == channel_id,
+            MessageRaw.attachments.has_key("media_pending"),
+        )
+        .order_by(MessageRaw.msg_id)
+        .limit(limit)
+    )
+    rows = (await session.execute(stmt)).all()
+    return [(int(m), int(a or 0)) for m, a in rows]
+
+
+async def clear_pending_media(
+    session: AsyncSession, *, channel_id: int, msg_ids: Iterable[int]
+) -> None:
+    """Drop the ``media_pending`` marker of messages whose media is gone from Telegram."""
+    ids = [int(m) for m in msg_ids]
+    if not ids:
+        return
+    await session.execute(
+        update(MessageRaw)
+        .where(MessageRaw.channel_id == channel_id, MessageRaw.msg_id.in_(ids))
+        .values(attachments=MessageRaw.attachments.op("-")("media_pending"), updated_at=func.now())
+    )
+
+
+async def update_message_texts(session: AsyncSession, rows: list[dict[str, Any]]) -> None:
+    """Replace ``text`` of edited messages (rows of channel_id, msg_id, text) in one executemany."""
+    if not rows:
+        return
+    table = MessageRaw.__table__
+    stmt = (
+        update(table)
+        .where(table.c.channel_id == bindparam("c_id"), table.c.msg_id == bindparam("m_id"))
+        .values(text=bindparam("txt"), updated_at=func.now())
+    )
+    batch = [{"c_id": r["channel_id"], "m_id": r["msg_id"], "txt": r.get("text")} for r in rows]
+    conn = await session.connection()
+    await conn.execute(stmt, batch)
+
+
+async def delete_messages(
+    session: AsyncSession, message_ids: Iterable[int], *, with_media: bool = True
+) -> tuple[int, list[str]]:
+    """Delete messages and the events extracted from them.
+
+    Returns the number of deleted rows and, with ``with_media``, the media paths that no
+    message references any more (the caller unlinks them after committing).
+    """
+    ids = [int(i) for i in dict.fromkeys(message_ids)]
+    if not ids:
+        return 0, []
+    # delete dependent events first to avoid FK restriction
+    await session.execute(delete(Event).where(Event.source_message_id.in_(ids)))
+    orphaned: list[str] = []
+    if with_media:
+        # manifest rows first, then attachments paths for rows stored before the manifest;
+        # files still referenced by other messages (shared forwards) are kept
+        paths: list[str] = await pop_media_for_messages(session, ids)
+        rows = await session.execute(
+            select(MessageRaw.attachments).where(MessageRaw.id.in_(ids))
+        )
+        for atts in rows.scalars().all():
+            media = atts.get("media") if isinstance(atts, dict) else None
+            for it in media if isinstance(media, list) else []:
+                if isinstance(it, dict) and it.get("path"):
+                    paths.append(it["path"])
+                elif isinstance(it, str) and it:
+                    paths.append(it)
+        orphaned = await unreferenced_paths(session, paths)
+    res = await session.execute(delete(MessageRaw).where(MessageRaw.id.in_(ids)))
+    return int(res.rowcount or 0), orphaned
+
+
+def _forward_field(name: str) -> Any:
+    return MessageRaw.features["forward"][name].astext
+
+
+async def list_unresolved_forwards(
+    session: AsyncSession,
+    *,
+    after_id: int = 0,
+    limit: int = 1000,
+    channel_ids: Optional[Iterable[int]] = None,
+    retry_attempted: bool = False,
+) -> list[tuple[int, str, int]]:
+    """``(id, from_type, from_peer_id)`` of forwards whose source title is still unknown.
+
+    Forwards marked by :func:`mark_forwards_attempted` are skipped unless
+    ``retry_attempted``. Keyset-paginated by ``messages_raw.id`` (pass the last id seen
+    as ``after_id``); the default query is served by ``ix_messages_raw_unresolved_forwards``.
+    """
+    if retry_attempted:
+        cond = and_(
+            _forward_field("from_peer_id").isnot(None),
+            _forward_field("from_type").in_(["channel", "user"]),
+            _forward_field("from_title").is_(None),
+        )
+    else:
+        cond = text(UNRESOLVED_FORWARD)
+    stmt = (
+        select(MessageRaw.id, _forward_field("from_type"), _forward_field("from_peer_id"))
+        .where(MessageRaw.id > after_id, cond)
+        .order_by(MessageRaw.id)
+        .limit(limit)
+    )
+    if channel_ids is not None:
+        stmt = stmt.where(MessageRaw.channel_id.in_(list(channel_ids)))
+    rows = (await session.execute(stmt)).all()
+    return [(int(i), str(t), int(p)) for i, t, p in rows]
+
+
+async def mark_forwards_attempted(session: AsyncSession, message_ids: Iterable[int]) -> None:
+    """Flag forwards whose source could not be resolved, so ingest does not rescan them."""
+    ids = [int(i) for i in message_ids]
+    if not ids:
+        return
+    forward = MessageRaw.features["forward"]
+    marked = forward.op("||")(func.jsonb_build_object("resolve_attempted", True))
+    await session.execute(
+        update(MessageRaw)
+        .where(MessageRaw.id.in_(ids))
+        .values(
+            features=MessageRaw.features.op("||")(func.jsonb_build_object("forward", marked)),
+            updated_at=func.now(),
+        )
+    )
+
+
+async def backfill_forward_sources(session: AsyncSession, rows: list[dict[str, Any]]) -> None:
+    """Set ``features.forward.from_title/from_username`` by message id in one executemany.
+
+    Rows are ``{"id", "title", "username"}``; ``None`` values leave the stored field as is.
+    """
+    if not rows:
+        return
+    table = MessageRaw.__table__
+    forward = table.c.features["forward"]
+    enriched = forward.op("||")(
+        func.jsonb_strip_nulls(
+            func.jsonb_build_object(
+                "from_title",
+                bindparam("f_title", type_=Text),
+                "from_username",
+                bindparam("f_username", type_=Text),
+            )
+        )
+    )
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("m_id"))
+        .values(
+            features=table.c.features.op("||")(func.jsonb_build_object("forward", enriched)),
+            updated_at=func.now(),
+        )
+    )
+    batch = [
+        {"m_id": r["id"], "f_title": r.get("title"), "f_username": r.get("username")}
+        for r in rows
+    ]
+    conn = await session.connection()
+    await conn.execute(stmt, batch)
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import base64
+from datetime import datetime
 from typing import Any, List, Optional, TypedDict
 
-from sqlalchemy import Select, and_, desc, select
+from sqlalchemy import Select, and_, desc, select, tuple_, union
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from tg_events.models import AiComment, Channel, MessageRaw
 from tg_events.config import get_settings
+from tg_events.media_store import media_url
 
 
 class MiniappPost(TypedDict, total=False):
@@ -19,6 +22,22 @@ class MiniappPost(TypedDict, total=False):
     source_url: str | None
 
 
+def encode_cursor(date: datetime, message_id: int) -> str:
+    """Opaque feed cursor for the (date, id) position of the last returned post."""
+    raw = f"{date.isoformat()}|{int(message_id)}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` on malformed input."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        date_s, id_s = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date_s), int(id_s)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+
 async def list_recent_messages(
     session: AsyncSession,
     *,
@@ -27,7 +46,18 @@ async def list_recent_messages(
     channel_tg_id: Optional[int] = None,
     fwd_username: Optional[str] = None,
     model: Optional[str] = None,
+    before: Optional[tuple[datetime, int]] = None,
+    changed_since: Optional[int] = None,
 ) -> List[MiniappPost]:
+    """Newest posts first, ordered by (date, id).
+
+    ``before`` is the (date, id) of the last post of the previous page (keyset
+    pagination): the next page is read straight off the ``(channel_id, date, id)``
+    index, so its cost does not grow with the scroll depth.
+
+    ``changed_since`` (a sync token) keeps only posts written, or whose ``model``
+    comment was written, by a transaction at or above it.
+    """
     settings = get_settings()
     stmt: Select[Any] = select(
         MessageRaw.id,
@@ -47,7 +77,18 @@ async def list_recent_messages(
             AiComment.model == (model or settings.ai_model),
         ),
         isouter=True,
-    ).order_by(desc(MessageRaw.date)).limit(limit)
+    ).order_by(desc(MessageRaw.date), desc(MessageRaw.id)).limit(limit)
+    if before is not None:
+        stmt = stmt.where(tuple_(MessageRaw.date, MessageRaw.id) < tuple_(*before))
+    if changed_since is not None:
+        changed = union(
+            select(MessageRaw.id).where(MessageRaw.change_txid >= changed_since),
+            select(AiComment.message_id).where(
+                AiComment.change_txid >= changed_since,
+                AiComment.model == (model or settings.ai_model),
+            ),
+        )
+        stmt = stmt.where(MessageRaw.id.in_(changed))
     if fwd_username:
         # filter by forward username (if features->forward->from_username matches)
         stmt = stmt.where(
@@ -70,7 +111,7 @@ async def list_recent_messages(
             if isinstance(media, list):
                 # backward compatibility: list[str]
                 if media and isinstance(media[0], str):
-                    media_urls = [f"/media/{m}" for m in media]
+                    media_urls = [media_url(m) for m in media]
                 else:
                     # list[dict] with path/kind/mime
                     media_items_fmt = []
@@ -80,10 +121,11 @@ async def list_recent_messages(
                         path = it.get("path")
                         if not path:
                             continue
-                        url = f"/media/{path}"
+                        url = media_url(path)
                         kind = it.get("kind") or "photo"
                         mime = it.get("mime")
                         media_items_fmt.append({"url": url, "kind": kind, "mime": mime})
+        media_pending = bool(isinstance(attachments, dict) and attachments.get("media_pending"))
         item: MiniappPost = {
             "id": int(rid),
             "msg_id": int(msg_id),
@@ -110,6 +152,9 @@ async def list_recent_messages(
             item["media_urls"] = media_urls
         if media_items_fmt:
             item["media"] = media_items_fmt
+        if media_pending:
+            # download still queued in the ingest media pipeline
+            item["media_pending"] = True
         items.append(item)
     return items
 
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tg_events.models import Channel, Peer
+
+
+async def get_peer_by_username(session: AsyncSession, username: str) -> Optional[Peer]:
+    """Cached peer for ``@username``; falls back to the ``channels`` row's tg_id."""
+    name = username.lstrip("@").lower()
+    stmt = (
+        select(Peer)
+        .where(func.lower(Peer.username) == name)
+        .order_by(Peer.resolved_at.desc())
+        .limit(1)
+    )
+    peer = (await session.execute(stmt)).scalar_one_or_none()
+    if peer is not None:
+        return peer
+    stmt = (
+        select(Peer)
+        .join(Channel, Channel.tg_id == Peer.tg_id)
+        .where(func.lower(Channel.username) == name)
+        .order_by(Peer.peer_type)  # "channel" before "user"
+        .limit(1)
+    )
+    return (await session.execute(stmt)).scalar_one_or_none()
+
+
+async def get_peer_by_tg_id(
+    session: AsyncSession, tg_id: int, *, peer_types: tuple[str, ...] = ("channel", "user")
+) -> Optional[Peer]:
+    """Cached peer by numeric id, trying ``peer_types`` in order."""
+    stmt = select(Peer).where(Peer.tg_id == tg_id, Peer.peer_type.in_(peer_types))
+    found = {p.peer_type: p for p in (await session.execute(stmt)).scalars().all()}
+    for t in peer_types:
+        if t in found:
+            return found[t]
+    return None
+
+
+async def get_peers(
+    session: AsyncSession, keys: Iterable[tuple[str, int]]
+) -> dict[tuple[str, int], Peer]:
+    """Batch lookup by ``(peer_type, tg_id)``."""
+    wanted = list(dict.fromkeys((t, int(i)) for t, i in keys))
+    if not wanted:
+        return {}
+    stmt = select(Peer).where(tuple_(Peer.peer_type, Peer.tg_id).in_(wanted))
+    return {(p.peer_type, int(p.tg_id)): p for p in (await session.execute(stmt)).scalars().all()}
+
+
+async def upsert_peers(session: AsyncSession, rows: list[dict[str, Any]]) -> None:
+    """Insert/refresh peers (peer_type, tg_id, access_hash, username, title, is_broadcast)."""
+    if not rows:
+        return
+    unique_rows = list({(r["peer_type"], int(r["tg_id"])): r for r in rows}.values())
+    stmt = pg_insert(Peer).values(
+        [
+            {
+                "peer_type": r["peer_type"],
+                "tg_id": int(r["tg_id"]),
+                "access_hash": r.get("access_hash"),
+                "username": r.get("username"),
+                "title": r.get("title"),
+                "is_broadcast": bool(r.get("is_broadcast")),
+                "resolved_at": func.now(),
+            }
+            for r in unique_rows
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_peers_type_tg_id",
+        set_={
+            # keep known values when the new row has none (min constructors, failed lookups)
+            "access_hash": func.coalesce(stmt.excluded.access_hash, Peer.access_hash),
+            "username": func.coalesce(stmt.excluded.username, Peer.username),
+            "title": func.coalesce(stmt.excluded.title, Peer.title),
+            "is_broadcast": stmt.excluded.is_broadcast,
+            "resolved_at": func.now(),
+            "updated_at": func.now(),
+        },
+    )
+    await session.execute(stmt)
+
+
+async def forget_peer(session: AsyncSession, *, peer_type: str, tg_id: int) -> None:
+    await session.execute(delete(Peer).where(Peer.peer_type == peer_type, Peer.tg_id == tg_id))
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional
+
+from tg_events.db import SessionLocal
+from tg_events.ingest.service import ingest_channels
+
+
+def _fit_date(s: Optional[str]) -> Optional[datetime]:
+    if not s:
+        return None
+    for fmt in ("%Y-%m-%d", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(s, fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date format: {s}")
+
+
+def _print_progress(channel: str, counters: dict) -> None:
+    if counters.get("status") == "running":
+        print(
+            f"{channel}: scanned={counters['scanned']} stored={counters['stored']}"
+            f" {counters['msgs_per_s']} msg/s"
+        )
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Backfill history into messages_raw, newest first, resuming an interrupted run."""
+    date_from = _fit_date(args.from_dt)
+    date_to = _fit_date(args.to_dt)
+    if date_from is None and date_to is None:
+        print("Give --from and/or --to")
+        return 2
+    async with SessionLocal() as ses:
+        results = await ingest_channels(
+            ses,
+            args.channels,
+            limit=args.limit,
+            update_existing_media=args.force_media,
+            date_from=date_from,
+            date_to=date_to,
+            progress=_print_progress,
+        )
+    for ch, result in results.items():
+        print(f"{ch}: {result}")
+    return 0 if all(r.startswith("ok:") for r in results.values()) else 1
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Resumable date-bounded history backfill")
+    ap.add_argument("channels", nargs="+", help="@username or numeric id")
+    ap.add_argument(
+        "--from", dest="from_dt", type=str, default=None, help="From date (YYYY-MM-DD or ISO, UTC)"
+    )
+    ap.add_argument(
+        "--to", dest="to_dt", type=str, default=None, help="To date (YYYY-MM-DD or ISO, UTC)"
+    )
+    ap.add_argument(
+        "--limit", type=int, default=None, help="Max messages per channel (default: all)"
+    )
+    ap.add_argument("--force-media", action="store_true", help="Also refresh media of stored posts")
+    args = ap.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import delete, event, select
+
+from tg_events.config import get_settings
+from tg_events.db import SessionLocal, engine
+from tg_events.ingest.replay import ReplayClient
+from tg_events.ingest.service import ingest_channels
+from tg_events.models import Channel, MessageRaw
+from tg_events.repositories.messages import delete_messages
+
+
+def _client(args: argparse.Namespace) -> ReplayClient:
+    if args.jsonl:
+        return ReplayClient.from_jsonl([Path(p) for p in args.jsonl], latency_s=args.latency)
+    return ReplayClient.synthetic(
+        channels=args.channels,
+        messages=args.messages,
+        media_ratio=args.media_ratio,
+        media_bytes=int(args.media_kb * 1024),
+        latency_s=args.latency,
+        prefix=args.prefix,
+    )
+
+
+async def _cleanup(usernames: list[str]) -> int:
+    async with SessionLocal() as ses:
+        ids = list(
+            (await ses.execute(select(Channel.id).where(Channel.username.in_(usernames))))
+            .scalars()
+            .all()
+        )
+        if not ids:
+            return 0
+        msg_ids = (
+            await ses.execute(select(MessageRaw.id).where(MessageRaw.channel_id.in_(ids)))
+        ).scalars().all()
+        count, _ = await delete_messages(ses, msg_ids, with_media=False)
+        await ses.execute(delete(Channel).where(Channel.id.in_(ids)))
+        await ses.commit()
+    return count
+
+
+async def run(args: argparse.Namespace, media_root: str) -> int:
+    """Ingest replayed channels into the configured database and report throughput."""
+    os.environ["MEDIA_ROOT"] = media_root
+    get_settings.cache_clear()
+    client = _client(args)
+    targets = [c.username or str(c.id) for c in client.channels.values()]
+    total = sum(len(c.messages) for c in client.channels.values())
+    if args.cleanup:
+        await _cleanup(targets)
+
+    round_trips = 0
+
+    def _count(*_args: object) -> None:
+        nonlocal round_trips
+        round_trips += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    started = time.perf_counter()
+    try:
+        async with SessionLocal() as ses:
+            results = await ingest_channels(
+                ses,
+                targets,
+                limit=None,
+                full=True,
+                page_size=args.page_size,
+                concurrency=args.concurrency,
+                client=client,
+            )
+    finally:
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        event.remove(engine.sync_engine, "before_cursor_execute", _count)
+
+    stats = client.stats
+    print(f"channels={len(targets)} messages={total} elapsed={elapsed:.2f}s")
+    print(f"msgs/s={total / elapsed:.1f}")
+    print(f"db_round_trips={round_trips} per_100_msgs={round_trips * 100 / max(total, 1):.1f}")
+    print(
+        f"history_requests={stats['history_requests']} media_files={stats['downloads']}"
+        f" media_bytes={stats['bytes']} media_MB/s={stats['bytes'] / elapsed / 2**20:.2f}"
+    )
+    failed = {ch: r for ch, r in results.items() if not r.startswith("ok:")}
+    for ch, r in failed.items():
+        print(f"{ch}: {r}")
+    if args.cleanup:
+        print(f"cleanup: deleted {await _cleanup(targets)} messages")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Benchmark ingest offline: replay JSONL dumps or synthetic channels"
+    )
+    ap.add_argument("--jsonl", nargs="*", help="dump_channel.py --jsonl files (one per channel)")
+    ap.add_argument("--channels", type=int, default=2, help="Synthetic channels")
+    ap.add_argument("--messages", type=int, default=2000, help="Synthetic messages per channel")
+    ap.add_argument("--media-ratio", type=float, default=0.3, help="Share of posts with media")
+    ap.add_argument("--media-kb", type=float, default=64, help="Synthetic media file size")
+    ap.add_argument("--prefix", type=str, default="bench", help="Synthetic channel usernames")
+    ap.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per request")
+    ap.add_argument("--page-size", type=int, default=None, help="Default: INGEST_PAGE_SIZE")
+    ap.add_argument("--concurrency", type=int, default=None, help="Default: INGEST_CONCURRENCY")
+    ap.add_argument("--media-root", type=str, default=None, help="Default: a temp directory")
+    ap.add_argument(
+        "--cleanup", action="store_true", help="Delete the synthetic channels before and after"
+    )
+    args = ap.parse_args()
+    if args.cleanup and args.jsonl:
+        # replayed dumps carry real usernames; never delete those channels
+        print("--cleanup only applies to synthetic channels")
+        return 2
+    if args.media_root:
+        return asyncio.run(run(args, args.media_root))
+    with tempfile.TemporaryDirectory(prefix="tg_bench_") as tmp:
+        return asyncio.run(run(args, tmp))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
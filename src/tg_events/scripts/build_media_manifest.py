@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import select
+
+from tg_events.config import get_settings
+from tg_events.db import SessionLocal
+from tg_events.ingest.media import file_checksum
+from tg_events.models import MessageRaw
+from tg_events.repositories.media import record_media
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Backfill media_files from attachments.media of already stored messages."""
+    media_root = Path(get_settings().media_root)
+    last_id = 0
+    scanned = 0
+    recorded = 0
+    missing = 0
+    while True:
+        async with SessionLocal() as ses:
+            rows = (
+                await ses.execute(
+                    select(
+                        MessageRaw.id,
+                        MessageRaw.channel_id,
+                        MessageRaw.msg_id,
+                        MessageRaw.attachments,
+                    )
+                    .where(MessageRaw.id > last_id, MessageRaw.attachments.isnot(None))
+                    .order_by(MessageRaw.id)
+                    .limit(args.batch)
+                )
+            ).all()
+            if not rows:
+                break
+            manifest: list[dict[str, Any]] = []
+            for rid, channel_id, msg_id, atts in rows:
+                last_id = int(rid)
+                scanned += 1
+                media = atts.get("media") if isinstance(atts, dict) else None
+                if not isinstance(media, list):
+                    continue
+                for it in media:
+                    if not isinstance(it, dict) or not it.get("path"):
+                        continue
+                    f = media_root / it["path"]
+                    if not f.is_file():
+                        missing += 1
+                        continue
+                    checksum = None
+                    if not args.no_checksum:
+                        checksum = await asyncio.to_thread(file_checksum, f)
+                    manifest.append(
+                        {
+                            "channel_id": channel_id,
+                            "msg_id": msg_id,
+                            "path": it["path"],
+                            "kind": it.get("kind") or "photo",
+                            "mime": it.get("mime"),
+                            "size": f.stat().st_size,
+                            "checksum": checksum,
+                        }
+                    )
+            await record_media(ses, manifest)
+            await ses.commit()
+            recorded += len(manifest)
+        print(f"scanned={scanned} recorded={recorded} missing_files={missing}")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Build the media_files manifest from stored attachments"
+    )
+    ap.add_argument("--batch", type=int, default=1000, help="Messages per round")
+    ap.add_argument("--no-checksum", action="store_true", help="Skip sha256 of each file")
+    args = ap.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,15 +4,19 @@ import argparse
 import asyncio
 import csv
 import json
-from dataclasses import asdict, dataclass
+import sys
+from collections import deque
+from dataclasses import asdict, dataclass, fields
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, Literal, Optional, Sequence
+from typing import Any, AsyncIterator, Literal, Optional, Sequence
 
 from telethon.tl import types as tl
 from telethon.utils import get_display_name
 
+from tg_events.config import get_settings
 from tg_events.ingest.telethon_client import build_client
+from tg_events.media_store import media_content_key
 
 
 @dataclass
@@ -28,6 +32,13 @@ class Post:
     channel_title: Optional[str]
     media_kind: Optional[str]
     media_paths: Optional[Sequence[str]] = None
+    # enough of the original message to replay it through ingest (see ingest.replay)
+    media_mime: Optional[str] = None
+    media_id: Optional[str] = None
+    media_size: Optional[int] = None
+    fwd_from_type: Optional[str] = None
+    fwd_from_id: Optional[int] = None
+    fwd_from_name: Optional[str] = None
 
 
 def _coerce_channel_arg(arg: str) -> object:
@@ -50,6 +61,46 @@ def _fit_date(s: Optional[str]) -> Optional[datetime]:
     raise ValueError(f"Invalid date format: {s}")
 
 
+class _MediaManifest:
+    """Completed downloads of a media dir, one JSON line per file, appended as they finish.
+
+    Only files listed here (and still of the recorded size) count as fetched, so a file
+    left half-written by an interrupted run is downloaded again. Directories filled before
+    the manifest existed are adopted by file stem once.
+    """
+
+    NAME = ".manifest.jsonl"
+
+    def __init__(self, media_dir: Path) -> None:
+        self.path = media_dir / self.NAME
+        self.done: dict[str, Path] = {}
+        legacy = not self.path.exists()
+        if not legacy:
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        p = Path(rec["path"])
+                        if p.is_file() and p.stat().st_size == rec["size"]:
+                            self.done[rec["key"]] = p
+                    except (ValueError, KeyError, TypeError, OSError):
+                        continue  # torn last line of a killed run
+        self._f = self.path.open("a", encoding="utf-8")
+        if legacy:
+            for p in media_dir.iterdir():
+                if p.is_file() and p.name != self.NAME:
+                    self.add(p.stem, p)
+
+    def add(self, key: str, path: Path) -> None:
+        self.done[key] = path
+        rec = {"key": key, "path": str(path), "size": path.stat().st_size}
+        self._f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
 async def dump_channel(
     *,
     channel: str,
@@ -58,11 +109,50 @@ async def dump_channel(
     to_dt: Optional[datetime],
     media_dir: Optional[Path] = None,
     media_types: Literal["photos", "all"] = "photos",
-) -> Iterable[Post]:
+    media_workers: int = 4,
+) -> AsyncIterator[Post]:
+    """Yield posts oldest first; media downloads run ``media_workers`` at a time.
+
+    Posts still come out in message order: each waits for its own download, with at most
+    ``media_workers * 8`` posts held back while downloads are in flight.
+    """
     client = build_client()
     await client.connect()
+    manifest: Optional[_MediaManifest] = None
+    sem = asyncio.Semaphore(max(1, media_workers))
+    # by media key: forwards of one file in the same run share the download
+    inflight: dict[str, asyncio.Task] = {}
+    pending: deque[tuple[Post, Optional[asyncio.Task]]] = deque()
+    window = max(1, media_workers) * 8
+
+    async def fetch(m: Any, base: str) -> Optional[Path]:
+        assert media_dir is not None and manifest is not None
+        try:
+            async with sem:
+                out = await client.download_media(m, file=str(media_dir / base))
+        except Exception as e:
+            print(f"media download failed for message {m.id}: {e}", file=sys.stderr)
+            return None
+        finally:
+            inflight.pop(base, None)
+        if not out:
+            return None
+        manifest.add(base, Path(out))
+        return Path(out)
+
+    async def release(post: Post, task: Optional[asyncio.Task]) -> Post:
+        if task is not None:
+            path = await task
+            post.media_paths = [str(path)] if path else None
+        return post
+
     try:
         entity = await client.get_entity(_coerce_channel_arg(channel))
+        if media_dir is not None:
+            media_dir.mkdir(parents=True, exist_ok=True)
+            manifest = _MediaManifest(media_dir)
+        username = getattr(entity, "username", None)
+        title = get_display_name(entity)
         async for m in client.iter_messages(entity, limit=limit, reverse=True):
             if not m or m.id is None or m.date is None:
                 continue
@@ -70,25 +160,14 @@ async def dump_channel(
                 continue
             if to_dt and m.date > to_dt:
                 continue
-            chan = m.peer_id
-            username = getattr(entity, "username", None)
-            title = get_display_name(entity)
             media_kind = type(m.media).__name__ if m.media is not None else None
-            saved_paths: list[str] = []
-            if media_dir is not None:
-                media_dir.mkdir(parents=True, exist_ok=True)
-                should_download = False
-                if getattr(m, "photo", None) is not None:
-                    should_download = True
-                elif media_types == "all" and m.media is not None:
-                    should_download = True
-                if should_download:
-                    # Telethon will choose filename/extension; prefix with channel/id for uniqueness.
-                    base = f"{username or getattr(entity, 'id', 'chan')}_{m.id}"
-                    path = await client.download_media(m, file=str(media_dir / base))
-                    if path:
-                        saved_paths.append(str(path))
-            yield Post(
+            fwd = getattr(m, "fwd_from", None)
+            fwd_peer = getattr(fwd, "from_id", None)
+            fwd_type = "channel" if getattr(fwd_peer, "channel_id", None) else (
+                "user" if getattr(fwd_peer, "user_id", None) else None
+            )
+            fwd_id = getattr(fwd_peer, "channel_id", None) or getattr(fwd_peer, "user_id", None)
+            post = Post(
                 id=int(m.id),
                 date=m.date.isoformat(),
                 text=m.message or "",
@@ -99,28 +178,154 @@ async def dump_channel(
                 channel_id=getattr(entity, "id", None),
                 channel_title=title,
                 media_kind=media_kind,
-                media_paths=saved_paths or None,
+                media_paths=None,
+                media_mime=getattr(getattr(m, "file", None), "mime_type", None),
+                media_id=media_content_key(m),
+                media_size=getattr(getattr(m, "file", None), "size", None),
+                fwd_from_type=fwd_type,
+                fwd_from_id=fwd_id,
+                fwd_from_name=getattr(fwd, "from_name", None),
             )
+            task: Optional[asyncio.Task] = None
+            if manifest is not None and (
+                getattr(m, "photo", None) is not None
+                or (media_types == "all" and m.media is not None)
+            ):
+                # Telethon will choose the extension; name by Telegram file id when known
+                # (shared by forwards), else prefix with channel/id for uniqueness.
+                base = media_content_key(m) or f"{username or getattr(entity, 'id', 'chan')}_{m.id}"
+                if base in manifest.done:
+                    post.media_paths = [str(manifest.done[base])]
+                else:
+                    task = inflight.get(base)
+                    if task is None:
+                        task = inflight[base] = asyncio.create_task(fetch(m, base))
+            pending.append((post, task))
+            while pending and (
+                len(pending) > window or pending[0][1] is None or pending[0][1].done()
+            ):
+                yield await release(*pending.popleft())
+        while pending:
+            yield await release(*pending.popleft())
     finally:
+        for _, task in pending:
+            if task is not None:
+                task.cancel()
+        if manifest is not None:
+            manifest.close()
         await client.disconnect()
 
 
-def _write_jsonl(path: Path, posts: Iterable[Post]) -> None:
-    with path.open("w", encoding="utf-8") as f:
-        for p in posts:
-            f.write(json.dumps(asdict(p), ensure_ascii=False) + "\n")
+# records written between explicit flushes of the output files
+FLUSH_EVERY = 500
+# Parquet rows per row group: big enough for column scans, bounded in memory while dumping
+PARQUET_ROW_GROUP = 50_000
+
+
+class _JsonlWriter:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._f = path.open("w", encoding="utf-8")
+
+    def write(self, post: Post) -> None:
+        self._f.write(json.dumps(asdict(post), ensure_ascii=False) + "\n")
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class _CsvWriter:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._f = path.open("w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._f, fieldnames=[f.name for f in fields(Post)])
+        self._writer.writeheader()
+
+    def write(self, post: Post) -> None:
+        self._writer.writerow(asdict(post))
+
+    def flush(self) -> None:
+        self._f.flush()
 
+    def close(self) -> None:
+        self._f.close()
 
-def _write_csv(path: Path, posts: Iterable[Post]) -> None:
-    rows = list(posts)
-    if not rows:
-        path.write_text("", encoding="utf-8")
-        return
-    with path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=list(asdict(rows[0]).keys()))
-        writer.writeheader()
-        for r in rows:
-            writer.writerow(asdict(r))
+
+class _ParquetWriter:
+    """Buffers posts column-wise and writes one row group per ``row_group`` posts."""
+
+    def __init__(self, path: Path, *, row_group: int = PARQUET_ROW_GROUP) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:  # optional extra
+            raise SystemExit(
+                "Parquet output needs pyarrow: pip install 'tg-events[parquet]'"
+            ) from e
+        self.path = path
+        self._pa = pa
+        self._schema = pa.schema(
+            [
+                ("id", pa.int64()),
+                ("date", pa.timestamp("us", tz="UTC")),
+                ("text", pa.string()),
+                ("views", pa.int64()),
+                ("forwards", pa.int64()),
+                ("replies", pa.int64()),
+                ("username", pa.string()),
+                ("channel_id", pa.int64()),
+                ("channel_title", pa.string()),
+                ("media_kind", pa.string()),
+                ("media_paths", pa.list_(pa.string())),
+                ("media_mime", pa.string()),
+                ("media_id", pa.string()),
+                ("media_size", pa.int64()),
+                ("fwd_from_type", pa.string()),
+                ("fwd_from_id", pa.int64()),
+                ("fwd_from_name", pa.string()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(str(path), self._schema, compression="zstd")
+        self._row_group = max(1, row_group)
+        self._columns: dict[str, list] = {name: [] for name in self._schema.names}
+
+    def write(self, post: Post) -> None:
+        row = asdict(post)
+        row["date"] = datetime.fromisoformat(post.date)
+        row["media_paths"] = list(post.media_paths) if post.media_paths else None
+        for name, values in self._columns.items():
+            values.append(row[name])
+        if len(self._columns["id"]) >= self._row_group:
+            self.flush()
+
+    def flush(self) -> None:
+        # a row group is only cut when full; partial groups wait for more rows or close()
+        if len(self._columns["id"]) >= self._row_group:
+            self._write_group()
+
+    def _write_group(self) -> None:
+        if not self._columns["id"]:
+            return
+        table = self._pa.Table.from_pydict(self._columns, schema=self._schema)
+        self._writer.write_table(table)
+        self._columns = {name: [] for name in self._schema.names}
+
+    def close(self) -> None:
+        self._write_group()
+        self._writer.close()
+
+
+def _print_post(p: Post, *, with_text: bool) -> None:
+    print(
+        f"{p.id} {p.date} views={p.views or 0} text_len={len(p.text)}"
+        f" media={len(p.media_paths or [])}"
+    )
+    if with_text and p.text:
+        print("---")
+        print(p.text)
 
 
 def main() -> None:
@@ -131,6 +336,15 @@ def main() -> None:
     parser.add_argument("--to", dest="to_dt", type=str, default=None, help="To date (YYYY-MM-DD or ISO)")
     parser.add_argument("--jsonl", type=Path, default=None, help="Write JSONL to path")
     parser.add_argument("--csv", type=Path, default=None, help="Write CSV to path")
+    parser.add_argument(
+        "--parquet", type=Path, default=None, help="Write Parquet to path (needs pyarrow)"
+    )
+    parser.add_argument(
+        "--row-group",
+        type=int,
+        default=PARQUET_ROW_GROUP,
+        help=f"Posts per Parquet row group (default {PARQUET_ROW_GROUP})",
+    )
     parser.add_argument("--media-dir", type=Path, default=None, help="Download media to directory")
     parser.add_argument(
         "--media-types",
@@ -139,6 +353,12 @@ def main() -> None:
         default="photos",
         help="What media to download (default: photos only)",
     )
+    parser.add_argument(
+        "--media-workers",
+        type=int,
+        default=None,
+        help="Concurrent media downloads (default: MEDIA_DOWNLOAD_WORKERS)",
+    )
     parser.add_argument(
         "--print-text",
         action="store_true",
@@ -148,32 +368,42 @@ def main() -> None:
 
     from_dt = _fit_date(args.from_dt)
     to_dt = _fit_date(args.to_dt)
-    async def _collect() -> list[Post]:
-        return [
-            p
-            async for p in dump_channel(
-                channel=args.channel,
-                limit=args.limit,
-                from_dt=from_dt,
-                to_dt=to_dt,
-                media_dir=args.media_dir,
-                media_types=args.media_types,  # type: ignore[arg-type]
-            )
-        ]
-    posts = asyncio.run(_collect())
-
+    writers: list = []
     if args.jsonl:
-        _write_jsonl(args.jsonl, posts)
-        print(f"Wrote {len(posts)} posts to {args.jsonl}")
+        writers.append(_JsonlWriter(args.jsonl))
     if args.csv:
-        _write_csv(args.csv, posts)
-        print(f"Wrote {len(posts)} posts to {args.csv}")
-    if not args.jsonl and not args.csv:
-        for p in posts:
-            print(f"{p.id} {p.date} views={p.views or 0} text_len={len(p.text)} media={len(p.media_paths or [])}")
-            if args.print_text and p.text:
-                print("---")
-                print(p.text)
+        writers.append(_CsvWriter(args.csv))
+    if args.parquet:
+        writers.append(_ParquetWriter(args.parquet, row_group=args.row_group))
+
+    async def _stream() -> int:
+        # posts go to the outputs as they arrive; nothing is held beyond a row group
+        count = 0
+        async for p in dump_channel(
+            channel=args.channel,
+            limit=args.limit,
+            from_dt=from_dt,
+            to_dt=to_dt,
+            media_dir=args.media_dir,
+            media_types=args.media_types,  # type: ignore[arg-type]
+            media_workers=args.media_workers or get_settings().media_download_workers,
+        ):
+            count += 1
+            if not writers:
+                _print_post(p, with_text=args.print_text)
+            for w in writers:
+                w.write(p)
+                if count % FLUSH_EVERY == 0:
+                    w.flush()
+        return count
+
+    try:
+        count = asyncio.run(_stream())
+    finally:
+        for w in writers:
+            w.close()
+    for w in writers:
+        print(f"Wrote {count} posts to {w.path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from sqlalchemy import select
+
+from tg_events.db import SessionLocal
+from tg_events.ingest.forwards import enrich_forwards
+from tg_events.ingest.service import _ensure_authorized
+from tg_events.ingest.telethon_client import open_client
+from tg_events.models import Channel
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Resolve forward sources of stored messages and back-fill their title/username."""
+    channel_ids = None
+    if args.username or args.channel_id is not None:
+        async with SessionLocal() as ses:
+            stmt = select(Channel.id)
+            if args.username:
+                stmt = stmt.where(Channel.username == args.username.lstrip("@"))
+            if args.channel_id is not None:
+                stmt = stmt.where(Channel.tg_id == args.channel_id)
+            channel_ids = list((await ses.execute(stmt)).scalars().all())
+        if not channel_ids:
+            print("Channel not found")
+            return 1
+    async with open_client() as client:
+        await _ensure_authorized(client)
+        stats = await enrich_forwards(
+            client,
+            channel_ids=channel_ids,
+            batch_size=args.batch,
+            retry_attempted=args.retry_attempted,
+        )
+    print(" ".join(f"{k}={v}" for k, v in stats.items()))
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Back-fill forward source titles/usernames")
+    ap.add_argument("--username", type=str, default=None, help="Only this channel")
+    ap.add_argument("--channel-id", type=int, default=None, help="Only this channel (tg id)")
+    ap.add_argument("--batch", type=int, default=None, help="Messages per round")
+    ap.add_argument(
+        "--retry-attempted",
+        action="store_true",
+        help="Also retry forwards a previous run could not resolve",
+    )
+    args = ap.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
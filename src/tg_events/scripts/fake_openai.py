@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+# Local stand-in for the OpenAI endpoints the commenter calls (Responses and Chat
+# Completions, plain and streamed). Point OPENAI_BASE_URL at http://127.0.0.1:<port>/v1.
+
+
+def _reply(body: dict[str, Any], words: int) -> str:
+    prompt = json.dumps(body.get("input") or body.get("messages") or "", ensure_ascii=False)
+    return " ".join(f"word{i}" for i in range(words)) + f" ({len(prompt)} prompt chars)."
+
+
+def _usage(body: dict[str, Any], text: str) -> tuple[int, int]:
+    prompt = json.dumps(body.get("input") or body.get("messages") or "", ensure_ascii=False)
+    return len(prompt) // 4 + 1, len(text) // 4 + 1
+
+
+def _sse(data: dict[str, Any], event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+
+def create_app(
+    *, words: int, token_delay_s: float, latency_s: float, throttle_every: int = 0
+) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+    calls = {"n": 0}
+
+    def throttled() -> JSONResponse | None:
+        """Every ``throttle_every``-th call gets a 429 (exercises the client's backoff)."""
+        calls["n"] += 1
+        if not throttle_every or calls["n"] % throttle_every:
+            return None
+        error = {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}
+        return JSONResponse({"error": error}, status_code=429, headers={"retry-after-ms": "500"})
+
+    def chunks(text: str) -> list[str]:
+        parts = text.split(" ")
+        return [p if i == 0 else " " + p for i, p in enumerate(parts)]
+
+    @app.post("/v1/responses")
+    async def responses(request: Request) -> Any:
+        if (limited := throttled()) is not None:
+            return limited
+        body = await request.json()
+        await asyncio.sleep(latency_s)
+        text = _reply(body, words)
+        inp, out = _usage(body, text)
+        usage = {"input_tokens": inp, "output_tokens": out, "total_tokens": inp + out}
+        resp = {
+            "id": "resp_fake",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model"),
+            "status": "completed",
+            "output": [
+                {
+                    "id": "msg_fake",
+                    "type": "message",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }
+            ],
+            "usage": usage,
+        }
+        if not body.get("stream"):
+            return JSONResponse(resp)
+
+        async def stream() -> AsyncIterator[str]:
+            seq = 0
+            for delta in chunks(text):
+                await asyncio.sleep(token_delay_s)
+                seq += 1
+                yield _sse(
+                    {
+                        "type": "response.output_text.delta",
+                        "item_id": "msg_fake",
+                        "output_index": 0,
+                        "content_index": 0,
+                        "delta": delta,
+                        "sequence_number": seq,
+                    },
+                    "response.output_text.delta",
+                )
+            yield _sse(
+                {"type": "response.completed", "response": resp, "sequence_number": seq + 1},
+                "response.completed",
+            )
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request) -> Any:
+        if (limited := throttled()) is not None:
+            return limited
+        body = await request.json()
+        await asyncio.sleep(latency_s)
+        text = _reply(body, words)
+        inp, out = _usage(body, text)
+        usage = {"prompt_tokens": inp, "completion_tokens": out, "total_tokens": inp + out}
+        base = {"id": "chatcmpl_fake", "created": int(time.time()), "model": body.get("model")}
+        if not body.get("stream"):
+            return JSONResponse(
+                {
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        async def stream() -> AsyncIterator[str]:
+            chunk = {**base, "object": "chat.completion.chunk"}
+            for delta in chunks(text):
+                await asyncio.sleep(token_delay_s)
+                choice = {"index": 0, "delta": {"content": delta}, "finish_reason": None}
+                yield _sse({**chunk, "choices": [choice]})
+            done = {"index": 0, "delta": {}, "finish_reason": "stop"}
+            yield _sse({**chunk, "choices": [done]})
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield _sse({**chunk, "choices": [], "usage": usage})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> int:
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="Serve a fake OpenAI API for local testing")
+    ap.add_argument("--host", type=str, default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--words", type=int, default=30, help="Words per generated comment")
+    ap.add_argument("--token-delay", type=float, default=0.05, help="Seconds between deltas")
+    ap.add_argument("--latency", type=float, default=0.3, help="Seconds before the first byte")
+    ap.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth call with 429")
+    args = ap.parse_args()
+    app = create_app(
+        words=args.words,
+        token_delay_s=args.token_delay,
+        latency_s=args.latency,
+        throttle_every=args.throttle_every,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
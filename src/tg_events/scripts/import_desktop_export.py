@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from tg_events.config import get_settings
+from tg_events.db import SessionLocal
+from tg_events.ingest.bulk import DEFAULT_BATCH_ROWS, load_posts
+from tg_events.ingest.desktop_export import DesktopExportImporter
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Import a Telegram Desktop JSON export (result.json) without touching Telegram."""
+    path = Path(args.path)
+    if path.is_dir():
+        path = path / "result.json"
+    if not path.is_file():
+        print(f"Not found: {path}")
+        return 1
+    media_root = Path(get_settings().media_root)
+    try:
+        importer = DesktopExportImporter(
+            path, media_root, username=args.username, copy_media=not args.no_media
+        )
+    except ValueError as e:
+        print(str(e))
+        return 1
+    print(f"Importing {importer.title!r} (tg_id={importer.tg_id})")
+    started = time.perf_counter()
+    async with SessionLocal() as ses:
+        stats = await load_posts(ses, importer.posts(), batch_rows=args.batch_rows)
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    print(" ".join(f"{k}={v}" for k, v in {**stats, **importer.stats}.items()))
+    print(f"elapsed={elapsed:.1f}s rows/min={stats['read'] / elapsed * 60:.0f}")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Import a Telegram Desktop channel export")
+    ap.add_argument("path", help="result.json or the export directory containing it")
+    ap.add_argument("--username", type=str, default=None, help="Channel @username (not exported)")
+    ap.add_argument("--no-media", action="store_true", help="Skip copying media files")
+    ap.add_argument(
+        "--batch-rows",
+        type=int,
+        default=DEFAULT_BATCH_ROWS,
+        help=f"Rows per COPY/merge/commit (default {DEFAULT_BATCH_ROWS})",
+    )
+    args = ap.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import select
+
+from tg_events.db import SessionLocal
+from tg_events.ingest.listener import ChannelListener
+from tg_events.ingest.service import _ensure_authorized, ingest_channels
+from tg_events.ingest.telethon_client import open_client
+from tg_events.models import Channel
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Catch up every known channel above its watermark, then ingest live updates."""
+    async with open_client() as client:
+        await _ensure_authorized(client)
+        listener = ChannelListener(
+            client, batch_size=args.batch_size, flush_interval_s=args.flush_interval
+        )
+        task = asyncio.create_task(listener.run())
+        if not args.no_catch_up:
+            # handlers are already registered, so nothing posted meanwhile is missed;
+            # overlapping writes are idempotent upserts
+            async with SessionLocal() as ses:
+                stmt = select(Channel).where(Channel.tg_id.isnot(None))
+                rows = (await ses.execute(stmt)).scalars().all()
+                targets = [ch.username or str(ch.tg_id) for ch in rows]
+                results = await ingest_channels(ses, targets, limit=args.catch_up_limit)
+            print(f"catch-up: {results}")
+        await task
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Ingest new/edited/deleted posts of known channels")
+    ap.add_argument("--batch-size", type=int, default=None, help="Updates per flush")
+    ap.add_argument("--flush-interval", type=float, default=None, help="Seconds between flushes")
+    ap.add_argument("--catch-up-limit", type=int, default=1000, help="Max messages per channel")
+    ap.add_argument("--no-catch-up", action="store_true", help="Skip the ingest on start")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        return asyncio.run(run(args))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
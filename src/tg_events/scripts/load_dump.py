@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import time
+from pathlib import Path
+
+from tg_events.db import SessionLocal
+from tg_events.ingest.bulk import DEFAULT_BATCH_ROWS, load_posts, read_posts
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Load dump_channel.py JSONL/CSV exports into channels/messages_raw with COPY."""
+    paths = [Path(p) for p in args.paths]
+    missing = [p for p in paths if not p.is_file()]
+    if missing:
+        print("Not found: " + ", ".join(map(str, missing)))
+        return 1
+    started = time.perf_counter()
+    posts = itertools.chain.from_iterable(read_posts(p) for p in paths)
+    async with SessionLocal() as ses:
+        stats = await load_posts(ses, posts, batch_rows=args.batch_rows)
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    print(" ".join(f"{k}={v}" for k, v in stats.items()))
+    print(f"elapsed={elapsed:.1f}s rows/min={stats['read'] / elapsed * 60:.0f}")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Bulk-load channel dumps (JSONL/CSV) into the DB")
+    ap.add_argument("paths", nargs="+", help="dump_channel.py --jsonl/--csv files")
+    ap.add_argument(
+        "--batch-rows",
+        type=int,
+        default=DEFAULT_BATCH_ROWS,
+        help=f"Rows per COPY/merge/commit (default {DEFAULT_BATCH_ROWS})",
+    )
+    args = ap.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
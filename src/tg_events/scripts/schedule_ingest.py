@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+
+from tg_events.ingest.scheduler import IngestScheduler
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Keep every channel of the channels table ingested, paced by posting frequency."""
+    scheduler = IngestScheduler(concurrency=args.concurrency, slice_limit=args.slice_limit)
+    if args.once:
+        polled = await scheduler.run_once()
+        print(f"polled={polled} messages={scheduler.messages}")
+        return 0
+    await scheduler.run()
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Adaptive multi-channel ingest scheduler")
+    ap.add_argument("--concurrency", type=int, default=None, help="Channels polled at once")
+    ap.add_argument("--slice-limit", type=int, default=None, help="Messages per channel turn")
+    ap.add_argument("--once", action="store_true", help="Poll the channels due now and exit")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        return asyncio.run(run(args))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
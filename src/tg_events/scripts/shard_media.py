@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import bindparam, select, update
+
+from tg_events.config import get_settings
+from tg_events.db import SessionLocal
+from tg_events.media_store import channel_key, sharded_relpath
+from tg_events.models import Channel, MediaFile, MessageRaw
+
+
+def _move(media_root: Path, old: str, new: str, *, dry_run: bool) -> bool:
+    """Move one file into its shard; True when ``new`` is (or would be) in place."""
+    src = media_root / old
+    dst = media_root / new
+    if dst.is_file():
+        # already moved (e.g. an interrupted previous run)
+        return True
+    if not src.is_file():
+        return False
+    if not dry_run:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src, dst)
+    return True
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Move flat media files into {channel}/{hash2}/ and rewrite stored paths in bulk.
+
+    Only per-message files are flat; content-addressed ``by-id/`` files (media_dedupe)
+    are already sharded and left in place.
+    """
+    media_root = Path(get_settings().media_root)
+    msg_table = MessageRaw.__table__
+    media_table = MediaFile.__table__
+    update_attachments = (
+        update(msg_table)
+        .where(msg_table.c.id == bindparam("r_id"))
+        .values(attachments=bindparam("att"))
+    )
+    update_manifest = (
+        update(media_table)
+        .where(
+            media_table.c.channel_id == bindparam("c_id"),
+            media_table.c.msg_id == bindparam("m_id"),
+            media_table.c.path == bindparam("old_path"),
+        )
+        .values(path=bindparam("new_path"))
+    )
+    last_id = 0
+    scanned = moved = rewritten = missing = 0
+    while True:
+        async with SessionLocal() as ses:
+            rows = (
+                await ses.execute(
+                    select(
+                        MessageRaw.id,
+                        MessageRaw.channel_id,
+                        MessageRaw.msg_id,
+                        MessageRaw.attachments,
+                        Channel.username,
+                        Channel.tg_id,
+                    )
+                    .join(Channel, Channel.id == MessageRaw.channel_id)
+                    .where(MessageRaw.id > last_id, MessageRaw.attachments.isnot(None))
+                    .order_by(MessageRaw.id)
+                    .limit(args.batch)
+                )
+            ).all()
+            if not rows:
+                break
+            att_updates: list[dict[str, Any]] = []
+            manifest_updates: list[dict[str, Any]] = []
+            for rid, channel_id, msg_id, atts, username, tg_id in rows:
+                last_id = int(rid)
+                scanned += 1
+                media = atts.get("media") if isinstance(atts, dict) else None
+                if not isinstance(media, list):
+                    continue
+                key = channel_key(username, tg_id)
+                new_media: list[Any] = []
+                changed = False
+                for it in media:
+                    old = it.get("path") if isinstance(it, dict) else it
+                    if not isinstance(old, str) or not old:
+                        new_media.append(it)
+                        continue
+                    new = sharded_relpath(key, old)
+                    if new == old:
+                        new_media.append(it)
+                        continue
+                    if not _move(media_root, old, new, dry_run=args.dry_run):
+                        missing += 1
+                        new_media.append(it)
+                        continue
+                    moved += 1
+                    changed = True
+                    new_media.append({**it, "path": new} if isinstance(it, dict) else new)
+                    manifest_updates.append(
+                        {"c_id": channel_id, "m_id": msg_id, "old_path": old, "new_path": new}
+                    )
+                if changed:
+                    att_updates.append({"r_id": rid, "att": {**atts, "media": new_media}})
+            if att_updates and not args.dry_run:
+                conn = await ses.connection()
+                await conn.execute(update_attachments, att_updates)
+                if manifest_updates:
+                    await conn.execute(update_manifest, manifest_updates)
+                await ses.commit()
+            rewritten += len(att_updates)
+        print(f"scanned={scanned} moved={moved} rows_rewritten={rewritten} missing_files={missing}")
+    if args.dry_run:
+        print("dry run: nothing was moved or written")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Migrate flat media_root files into the sharded layout"
+    )
+    ap.add_argument("--batch", type=int, default=1000, help="Messages per round")
+    ap.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = ap.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
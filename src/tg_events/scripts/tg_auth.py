@@ -24,6 +24,7 @@ async def _main(phone: Optional[str] = None) -> None:
                 pw = getpass("Two-step password: ")
                 await client.sign_in(password=pw)
         print("Authorization OK. Session saved.")
+        print("A running API picks it up after POST /telegram/reload.")
     finally:
         await client.disconnect()
 